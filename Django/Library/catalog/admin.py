@@ -8,7 +8,9 @@ para marcar empréstimos como devolvidos.
 from django.contrib import admin
 from django.utils import timezone
 
-from .models import Book, Loan, Category, SearchQuery, Review
+from . import circulation
+from .versioning import bump_catalog_version
+from .models import Book, BookNeighbor, Hold, Loan, LoanNotification, Category, RecommendationRun, SearchQuery, Review
 
 
 @admin.register(Book)
@@ -24,13 +26,13 @@ class BookAdmin(admin.ModelAdmin):
 @admin.register(Loan)
 class LoanAdmin(admin.ModelAdmin):
 	# Listagem com campos úteis e um indicador de atraso
-	list_display = ("book", "user", "borrowed_at", "due_date", "returned_at", "_is_overdue")
+	list_display = ("book", "user", "borrowed_at", "due_date", "renewals", "returned_at", "_is_overdue")
 	# Filtro lateral por devolução
 	list_filter = ("returned_at",)
 	# Busca por título do livro e username do usuário (lookup via relacionamento)
 	search_fields = ("book__title", "user__username")
-	# Ação em massa: marcar registros selecionados como devolvidos
-	actions = ("marcar_como_devolvido",)
+	# Ações em massa: marcar como devolvidos e renovar
+	actions = ("marcar_como_devolvido", "renovar")
 
 	@admin.display(boolean=True, description="Atrasado")
 	def _is_overdue(self, obj: Loan):
@@ -41,11 +43,75 @@ class LoanAdmin(admin.ModelAdmin):
 		# Percorre apenas empréstimos ainda ativos e define returned_at
 		updated = 0
 		now = timezone.now()
+		book_ids = set()
 		for loan in queryset.filter(returned_at__isnull=True):
 			loan.returned_at = now
 			loan.save(update_fields=["returned_at"])
+			book_ids.add(loan.book_id)
 			updated += 1
-		self.message_user(request, f"{updated} empréstimo(s) marcados como devolvidos.")
+		# As cópias devolvidas vão para o próximo da fila de reservas de cada livro
+		promoted = circulation.on_copies_returned(book_ids, now=now)
+		self.message_user(
+			request, f"{updated} empréstimo(s) marcados como devolvidos; {len(promoted)} reserva(s) atendida(s)."
+		)
+
+	@admin.action(description="Renovar (respeitando limite e fila de reservas)")
+	def renovar(self, request, queryset):
+		# Poucos UPDATEs para toda a seleção (ver circulation.renew_loans)
+		summary = circulation.renew_loans(queryset)
+		self.message_user(
+			request,
+			f"{summary['renewed']} empréstimo(s) renovado(s); não renovados: {summary['at_limit']} no limite, "
+			f"{summary['blocked_by_holds']} com fila de reservas.",
+		)
+
+
+@admin.register(Hold)
+class HoldAdmin(admin.ModelAdmin):
+	list_display = ("book", "user", "position", "status", "created_at", "expires_at")
+	list_filter = ("status",)
+	list_select_related = ("book", "user")
+	search_fields = ("book__title", "user__username")
+	raw_id_fields = ("book", "user")
+
+	def save_model(self, request, obj, form, change):
+		super().save_model(request, obj, form, change)
+		# Entrar ou sair de `ready` muda a disponibilidade da lista (ver circulation)
+		if "status" in form.changed_data and Hold.STATUS_READY in (form.initial.get("status"), obj.status):
+			bump_catalog_version()
+
+	def delete_model(self, request, obj):
+		super().delete_model(request, obj)
+		if obj.status == Hold.STATUS_READY:
+			bump_catalog_version()
+
+
+@admin.register(LoanNotification)
+class LoanNotificationAdmin(admin.ModelAdmin):
+	# Somente leitura: os registros são criados pelos comandos de aviso
+	list_display = ("loan", "kind", "due_date", "sent_at")
+	list_filter = ("kind", "sent_at")
+	list_select_related = ("loan__book", "loan__user")
+	search_fields = ("loan__book__title", "loan__user__username")
+	readonly_fields = ("loan", "kind", "due_date", "sent_at")
+
+
+@admin.register(BookNeighbor)
+class BookNeighborAdmin(admin.ModelAdmin):
+	# Somente leitura: a tabela é regravada pelo comando compute_recommendations
+	list_display = ("book", "rank", "neighbor", "kind", "score", "computed_at")
+	list_filter = ("kind",)
+	list_select_related = ("book", "neighbor")
+	search_fields = ("book__title", "neighbor__title")
+	readonly_fields = ("book", "neighbor", "kind", "rank", "score", "computed_at")
+
+
+@admin.register(RecommendationRun)
+class RecommendationRunAdmin(admin.ModelAdmin):
+	# Histórico gravado pelo comando compute_recommendations
+	list_display = ("kind", "started_at", "full", "engine", "books", "neighbors")
+	list_filter = ("kind", "full")
+	readonly_fields = ("kind", "started_at", "full", "engine", "books", "neighbors")
 
 
 @admin.register(Category)
@@ -0,0 +1,245 @@
+"""API JSON (somente leitura) do catálogo para clientes móveis e quiosques.
+
+Rotas (prefixo /api/):
+- books/                 lista paginada de livros (filtros q, categoria, idioma, disponivel)
+- books/<id>/            detalhe de um livro com disponibilidade e nota média
+- books/<id>/reviews/    avaliações do livro, paginadas
+- me/loans/              empréstimos do usuário logado, paginados
+
+Parâmetros comuns:
+- page / page_size (máx. 100): paginação;
+- fields=id,title,available: escolhe os campos devolvidos (padrão: todos).
+
+Desempenho:
+- serialização com `values()`: o banco devolve dicts prontos e nenhum objeto
+  de model é instanciado; só as colunas pedidas em `fields` são lidas;
+- respostas compactadas com gzip quando o cliente aceita;
+- ETag a partir dos carimbos de versão (`versioning.py`): com `If-None-Match`
+  o cliente recebe 304 sem a view consultar o banco.
+
+Autenticação pela sessão (mesmo login do site); sem login, 401 em JSON.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.core.paginator import EmptyPage, Paginator
+from django.db.models import Avg, Count, Q
+from django.db.models.functions import Lower
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.cache import cache_control
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_safe
+from django.views.decorators.vary import vary_on_cookie
+
+from . import circulation
+from .db_routers import reading_from_replica
+from .models import Book, Loan, Review
+from .versioning import get_book_version, get_catalog_version
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Campo público -> caminho no ORM (usado em values()). "available" é anotação.
+BOOK_FIELDS = {
+	"id": "id",
+	"title": "title",
+	"author": "author",
+	"isbn": "isbn",
+	"category": "category__name",
+	"language": "language",
+	"publisher": "publisher",
+	"edition_year": "edition_year",
+	"copies_total": "copies_total",
+	"available": "available",
+}
+BOOK_DETAIL_FIELDS = {
+	**BOOK_FIELDS,
+	"series": "series",
+	"subject": "subject",
+	"material": "material",
+	"average_rating": "average_rating",
+	"reviews_count": "reviews_count",
+}
+REVIEW_FIELDS = {
+	"id": "id",
+	"user": "user__username",
+	"rating": "rating",
+	"comment": "comment",
+	"created_at": "created_at",
+	"updated_at": "updated_at",
+}
+LOAN_FIELDS = {
+	"id": "id",
+	"book_id": "book_id",
+	"book_title": "book__title",
+	"borrowed_at": "borrowed_at",
+	"due_date": "due_date",
+	"returned_at": "returned_at",
+}
+
+
+class ApiError(Exception):
+	def __init__(self, message, status=400):
+		super().__init__(message)
+		self.status = status
+
+
+def _error(message, status):
+	return JsonResponse({"error": message}, status=status)
+
+
+def api_view(view):
+	"""Decorator comum: GET/HEAD, login obrigatório (401 em JSON) e erros em JSON."""
+	@wraps(view)
+	def wrapper(request, *args, **kwargs):
+		if not request.user.is_authenticated:
+			return _error("Autenticação necessária.", 401)
+		try:
+			return view(request, *args, **kwargs)
+		except ApiError as exc:
+			return _error(str(exc), exc.status)
+	return require_safe(wrapper)
+
+
+def _etag(request, *parts):
+	# O JSON não tem token CSRF: basta a versão, a URL completa e (se for o caso) o usuário.
+	# Lido da réplica, o corpo pode estar atrás da versão: sem ETag
+	if not request.user.is_authenticated or reading_from_replica():
+		return None
+	raw = "|".join(str(part) for part in (*parts, request.get_full_path()))
+	return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def selected_fields(request, allowed):
+	"""Campos pedidos em `?fields=` (na ordem pedida), validados contra `allowed`."""
+	raw = request.GET.get("fields", "").strip()
+	if not raw:
+		return list(allowed)
+	names = [name.strip() for name in raw.split(",") if name.strip()]
+	unknown = [name for name in names if name not in allowed]
+	if unknown:
+		raise ApiError(f"Campos desconhecidos: {', '.join(unknown)}. Disponíveis: {', '.join(allowed)}.")
+	return names
+
+
+def serialize(queryset, fields, allowed):
+	"""values() só com as colunas pedidas, renomeadas para os nomes públicos."""
+	paths = [allowed[name] for name in fields]
+	return [
+		{name: row[path] for name, path in zip(fields, paths)}
+		for row in queryset.values(*paths)
+	]
+
+
+def paginate(request, queryset, fields, allowed):
+	"""Página de resultados + metadados de paginação."""
+	try:
+		page_size = min(int(request.GET.get("page_size", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+		page_number = int(request.GET.get("page", 1))
+	except ValueError:
+		raise ApiError("page e page_size devem ser números inteiros.")
+	if page_size < 1:
+		raise ApiError("page_size deve ser positivo.")
+	paginator = Paginator(queryset, page_size)
+	try:
+		page = paginator.page(page_number)
+	except EmptyPage:
+		raise ApiError("Página inexistente.", status=404)
+	return {
+		"count": paginator.count,
+		"page": page.number,
+		"pages": paginator.num_pages,
+		"page_size": page_size,
+		"results": serialize(page.object_list, fields, allowed),
+	}
+
+
+def _books_queryset():
+	"""Livros com a anotação `available` (cópias sem empréstimo nem reserva separada).
+
+	Subquery em vez de JOIN: não multiplica as linhas quando o detalhe também
+	agrega as avaliações.
+	"""
+	return circulation.with_availability(Book.objects.all())
+
+
+def _books_etag(request):
+	return _etag(request, "api_books", get_catalog_version())
+
+
+def _book_etag(request, book_id):
+	return _etag(request, "api_book", book_id, get_book_version(book_id))
+
+
+def _loans_etag(request):
+	# Todo empréstimo/devolução carimba a versão do catálogo (signals.py)
+	return _etag(request, "api_loans", request.user.pk, get_catalog_version())
+
+
+@gzip_page
+@vary_on_cookie
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_books_etag)
+@api_view
+def books(request):
+	"""Lista paginada de livros (ordenada por título)."""
+	fields = selected_fields(request, BOOK_FIELDS)
+	qs = _books_queryset()
+	q = request.GET.get("q", "").strip()
+	if q:
+		qs = qs.filter(Q(title__icontains=q) | Q(author__icontains=q) | Q(isbn__icontains=q))
+	categoria = request.GET.get("categoria", "")
+	if categoria.isdigit():
+		qs = qs.filter(category_id=categoria)
+	idioma = request.GET.get("idioma", "").strip()
+	if idioma:
+		qs = qs.filter(language__iexact=idioma)
+	if request.GET.get("disponivel") == "1":
+		qs = qs.filter(available__gt=0)
+	return JsonResponse(paginate(request, qs.order_by(Lower("title"), "id"), fields, BOOK_FIELDS))
+
+
+@gzip_page
+@vary_on_cookie
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_book_etag)
+@api_view
+def book_detail(request, book_id):
+	"""Detalhe de um livro, com disponibilidade, nota média e total de avaliações."""
+	fields = selected_fields(request, BOOK_DETAIL_FIELDS)
+	qs = _books_queryset().filter(pk=book_id)
+	if "average_rating" in fields or "reviews_count" in fields:
+		qs = qs.annotate(average_rating=Avg("reviews__rating"), reviews_count=Count("reviews", distinct=True))
+	rows = serialize(qs, fields, BOOK_DETAIL_FIELDS)
+	if not rows:
+		raise ApiError("Livro não encontrado.", status=404)
+	return JsonResponse(rows[0])
+
+
+@gzip_page
+@vary_on_cookie
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_book_etag)
+@api_view
+def book_reviews(request, book_id):
+	"""Avaliações de um livro, das mais recentes para as mais antigas."""
+	get_object_or_404(Book.objects.only("id"), pk=book_id)
+	fields = selected_fields(request, REVIEW_FIELDS)
+	qs = Review.objects.filter(book_id=book_id).order_by("-created_at", "-id")
+	return JsonResponse(paginate(request, qs, fields, REVIEW_FIELDS))
+
+
+@gzip_page
+@vary_on_cookie
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_loans_etag)
+@api_view
+def my_loans(request):
+	"""Empréstimos do usuário logado (mais recentes primeiro); ?ativos=1 filtra os em aberto."""
+	fields = selected_fields(request, LOAN_FIELDS)
+	qs = Loan.objects.filter(user=request.user).order_by("-borrowed_at", "-id")
+	if request.GET.get("ativos") == "1":
+		qs = qs.filter(returned_at__isnull=True)
+	return JsonResponse(paginate(request, qs, fields, LOAN_FIELDS))
@@ -5,3 +5,7 @@ class CatalogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'catalog'
     verbose_name = 'Catálogo'  # PT-BR: nome do app no Admin
+
+    def ready(self):
+        # Registra os receptores de sinais (invalidação de cache/versões)
+        from . import signals  # noqa: F401
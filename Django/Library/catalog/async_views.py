@@ -0,0 +1,209 @@
+"""Versões assíncronas (ASGI) das views de leitura mais acessadas.
+
+Rotas com prefixo /async/ e o mesmo resultado (templates, ETag, histórico de
+busca) das views síncronas:
+- async/books/                   lista de livros, com ?suggest=1 (autocomplete);
+- async/books/<id>/              detalhe do livro;
+- async/reports/<relatório>/     relatórios de staff.
+
+Por que existem: num worker WSGI cada request ocupa uma thread do começo ao
+fim, inclusive enquanto espera um cliente lento (rede móvel) receber a
+resposta. Servidas por um servidor ASGI (`uvicorn library.asgi:application`),
+estas views rodam no event loop e um único worker atende muitos clientes
+lentos ao mesmo tempo. Compare com `manage.py benchmark_concurrency`.
+
+Como funcionam:
+- as consultas usam o ORM assíncrono (`aget`, `afirst`, `aexists`, `acount`,
+  `async for`). No Django 5.x ele ainda executa o SQL numa thread por request
+  (sync_to_async), mas sem bloquear o event loop;
+- filtros, paginação e contexto vêm dos mesmos helpers de `views.py`, então
+  as duas versões não se afastam;
+- tudo o que o template exibe é carregado aqui (listas, não querysets); a
+  resposta é um TemplateResponse, que o Django renderiza fora do event loop;
+- código síncrono que acessa banco ou cache (ETag, facetas, versões) é
+  chamado via `sync_to_async`.
+
+Exportações (CSV/XLSX/PDF) continuam nas views síncronas: geram o arquivo
+inteiro em memória e não ganham nada com o event loop.
+"""
+
+import datetime
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.cache import cache_control
+from django.views.decorators.vary import vary_on_cookie
+
+from . import recommendations, views
+from .facets import get_catalog_facets, get_result_facets
+from .models import Book, Hold, SearchQuery
+from .report_utils import abuild_report_dataset
+from .versioning import get_book_version
+
+SUGGESTIONS_LIMIT = 8
+
+
+def async_condition(etag_func=None, last_modified_func=None):
+	"""Equivalente ao `condition` do Django para views assíncronas.
+
+	O `condition` do Django chama as funções de ETag dentro do event loop; as
+	nossas (`views._page_etag`) leem o usuário e as mensagens da sessão, que
+	vêm do banco. Aqui elas rodam via `sync_to_async`; o resto do protocolo
+	(304/412 e cabeçalhos ETag/Last-Modified) é o mesmo.
+	"""
+	def decorator(view):
+		@wraps(view)
+		async def wrapper(request, *args, **kwargs):
+			last_modified = None
+			if last_modified_func:
+				dt = await sync_to_async(last_modified_func)(request, *args, **kwargs)
+				if dt:
+					if not timezone.is_aware(dt):
+						dt = timezone.make_aware(dt, datetime.timezone.utc)
+					last_modified = int(dt.timestamp())
+			etag = await sync_to_async(etag_func)(request, *args, **kwargs) if etag_func else None
+			etag = quote_etag(etag) if etag is not None else None
+
+			response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+			if response is None:
+				response = await view(request, *args, **kwargs)
+			if request.method in ("GET", "HEAD"):
+				if last_modified and not response.has_header("Last-Modified"):
+					response.headers["Last-Modified"] = http_date(last_modified)
+				if etag:
+					response.headers.setdefault("ETag", etag)
+			return response
+		return wrapper
+	return decorator
+
+
+async def _suggestions(qs):
+	return {
+		"titles": [title async for title in qs.values_list("title", flat=True)[:SUGGESTIONS_LIMIT]],
+		"authors": [author async for author in qs.values_list("author", flat=True)[:SUGGESTIONS_LIMIT]],
+		"isbns": [isbn async for isbn in qs.values_list("isbn", flat=True)[:SUGGESTIONS_LIMIT]],
+	}
+
+
+async def _record_search(request, filters, search_params):
+	"""Grava o histórico da busca, como em `views.book_list`."""
+	session_key = request.session.session_key or ""
+	if not session_key:
+		await request.session.acreate()
+		session_key = request.session.session_key
+	user = await request.auser()
+	try:
+		await SearchQuery.objects.acreate(
+			user=user if user.is_authenticated else None,
+			session_key=session_key,
+			q=filters["q"],
+			params={**search_params, "ordenar": filters["ordenar"]},
+		)
+	except Exception:  # pragma: no cover - não falha a página por erro no histórico
+		pass
+
+
+@login_required
+@vary_on_cookie
+@cache_control(private=True, no_cache=True)
+@async_condition(etag_func=views._book_list_etag, last_modified_func=views._book_list_last_modified)
+async def book_list(request):
+	"""Versão assíncrona de `views.book_list` (mesmos parâmetros GET)."""
+	if request.GET.get("export"):
+		return redirect(f"{reverse('catalog:book_list')}?{request.GET.urlencode()}")
+
+	qs, filters = views._filtered_books(request)
+	if request.GET.get("suggest") == "1" and filters["q"]:
+		return JsonResponse(await _suggestions(qs))
+
+	search_params = views._search_params(filters)
+	result_facets = await sync_to_async(get_result_facets)(qs, {**search_params, "q": filters["q"]})
+
+	if request.GET.get("mostrar", "20") == "todos":
+		page_obj = None
+		books = [book async for book in qs]
+	else:
+		paginator = Paginator(qs, 20)
+		paginator.count = result_facets["total"]  # evita um COUNT(*) extra: já sabemos o total
+		page_obj = paginator.get_page(request.GET.get("page"))
+		# Carrega a página aqui: o template não pode consultar o banco depois
+		page_obj.object_list = [book async for book in page_obj.object_list]
+		books = page_obj.object_list
+
+	if any(filters[key] for key in filters if key != "ordenar"):
+		await _record_search(request, filters, search_params)
+
+	facets = await sync_to_async(get_catalog_facets)()
+	reviewable = await sync_to_async(views._reviewable_books)(request, books)
+	context = views._book_list_context(request, filters, books, page_obj, result_facets, facets, reviewable)
+	return TemplateResponse(request, "catalog/book_list.html", context)
+
+
+@vary_on_cookie
+@cache_control(private=True, no_cache=True)
+@async_condition(etag_func=views._book_detail_etag, last_modified_func=views._book_detail_last_modified)
+async def book_detail(request, book_id):
+	"""Versão assíncrona de `views.book_detail`."""
+	user = await request.auser()
+	try:
+		# Do primário, como na versão síncrona (fragmento em cache por versão)
+		book = await views._book_detail_queryset(user).using("default").aget(pk=book_id)
+	except Book.DoesNotExist:
+		raise Http404("Livro não encontrado.")
+
+	reviews, next_cursor = views._review_page([review async for review in views._reviews_after(book.pk, None)])
+
+	user_hold = None
+	if user.is_authenticated:
+		user_hold = await book.holds.filter(user=user, status__in=Hold.OPEN_STATUSES).afirst()
+	also_borrowed = [other async for other in recommendations.also_borrowed(book.pk)]
+
+	context = {
+		"book": book,
+		"book_id": book.pk,
+		"reviews": reviews,
+		"next_cursor": next_cursor,
+		"user_review": book.user_review_id,
+		"can_review": book.pk in await sync_to_async(views._reviewable_books)(request, [book]),
+		"user_hold": user_hold,
+		"holds_waiting": book.holds_waiting,
+		"also_borrowed": also_borrowed,
+		"similar_books": [] if also_borrowed else [other async for other in recommendations.similar_books(book.pk)],
+		"book_version": await sync_to_async(get_book_version)(book.pk),
+	}
+	return TemplateResponse(request, "catalog/book_detail.html", context)
+
+
+async def _report(request, report_type):
+	views._require_staff(await request.auser())
+	dataset = await abuild_report_dataset(report_type)
+	return TemplateResponse(request, f"catalog/reports/{report_type}.html", {"dataset": dataset})
+
+
+@login_required
+async def report_loans(request):
+	return await _report(request, "loans")
+
+
+@login_required
+async def report_popular_books(request):
+	return await _report(request, "popular_books")
+
+
+@login_required
+async def report_active_users(request):
+	return await _report(request, "active_users")
+
+
+@login_required
+async def report_overdue_loans(request):
+	return await _report(request, "overdue_loans")
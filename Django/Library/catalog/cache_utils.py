@@ -0,0 +1,153 @@
+"""Camada de cache do app catalog (dois níveis + proteção contra "stampede").
+
+Níveis (configurados em `CACHES` no settings):
+- `default` ("local"): LocMemCache por processo. É um LRU: cada leitura move a
+  chave para o fim e, ao passar de MAX_ENTRIES, as mais antigas são descartadas.
+  Ideal para objetos "quentes" (categorias, lista de idiomas...).
+- `shared` ("compartilhado"): visto por todos os processos/workers (Redis em
+  produção; arquivo ou tabela no desenvolvimento). Guarda os valores caros.
+- `versions`: os carimbos de versão (`versioning.py`), num backend que não
+  descarta entradas (ver `CACHES` no settings).
+
+`get_or_set()` consulta o nível local, depois o compartilhado e, só então,
+calcula o valor. Para evitar que vários workers recalculem a mesma chave ao
+mesmo tempo quando ela expira (cache stampede), usamos duas técnicas:
+- recálculo antecipado probabilístico (XFetch): perto de expirar, um request
+  "sorteado" recalcula antes enquanto os outros continuam usando o valor atual;
+- trava (lock) com `cache.add()`: só quem conseguir a trava calcula; os demais
+  aguardam um pouco e leem o valor novo.
+
+Como invalidar: inclua um carimbo de versão (`versioning.py`) na chave. Assim a
+chave antiga simplesmente deixa de ser lida em todos os processos. O cálculo
+roda sempre no banco primário: uma réplica atrasada gravaria dados antigos sob
+a versão nova, que só mudaria na próxima escrita (ver `db_routers.py`).
+
+Também contamos acertos/erros por prefixo de chave (`cache_stats()`), para
+acompanhar a taxa de acerto de cada tipo de dado.
+"""
+
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .db_routers import use_replica
+
+LOCAL_ALIAS = "default"
+SHARED_ALIAS = "shared"
+VERSIONS_ALIAS = "versions"
+
+# Tempo máximo (s) que um valor fica no nível local de cada processo
+LOCAL_TIMEOUT = getattr(settings, "CATALOG_LOCAL_CACHE_TIMEOUT", 60)
+
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+
+def local_cache():
+	return caches[LOCAL_ALIAS]
+
+
+def shared_cache():
+	return caches[SHARED_ALIAS]
+
+
+def versions_cache():
+	return caches[VERSIONS_ALIAS]
+
+
+def key_prefix(key: str) -> str:
+	"""Prefixo usado nas estatísticas: as duas primeiras partes ("catalog:categories")."""
+	return ":".join(key.split(":")[:2])
+
+
+def _record(key: str, hit: bool) -> None:
+	with _stats_lock:
+		_stats[key_prefix(key)]["hits" if hit else "misses"] += 1
+
+
+def cache_stats() -> dict:
+	"""Retorna {prefixo: {"hits", "misses", "ratio"}} acumulados neste processo."""
+	with _stats_lock:
+		result = {}
+		for prefix, counts in _stats.items():
+			total = counts["hits"] + counts["misses"]
+			result[prefix] = {**counts, "ratio": counts["hits"] / total if total else 0.0}
+		return result
+
+
+def reset_cache_stats() -> None:
+	with _stats_lock:
+		_stats.clear()
+
+
+def _should_recompute_early(entry, beta: float) -> bool:
+	"""XFetch: quanto mais perto de expirar e mais caro o cálculo, maior a chance."""
+	_value, expires_at, compute_time = entry
+	return time.time() - compute_time * beta * math.log(random.random() or 1e-12) >= expires_at
+
+
+def _compute(compute):
+	"""Executa `compute()` lendo do primário; devolve (valor, segundos gastos)."""
+	start = time.perf_counter()
+	with use_replica(False):
+		value = compute()
+	return value, time.perf_counter() - start
+
+
+def _store(key, value, timeout, compute_time):
+	expires_at = time.time() + timeout
+	entry = (value, expires_at, compute_time)
+	shared_cache().set(key, entry, timeout)
+	local_cache().set(key, entry, min(timeout, LOCAL_TIMEOUT))
+
+
+def get_or_set(key: str, compute, timeout: int = 300, *, lock_timeout: int = 10, beta: float = 1.0):
+	"""Busca `key` nos dois níveis; se faltar, calcula com `compute()` e grava.
+
+	- timeout: validade (s) no nível compartilhado.
+	- lock_timeout: quanto tempo a trava de recálculo vale (e quanto esperamos por ela).
+	- beta: agressividade do recálculo antecipado (0 desliga).
+	"""
+	entry = local_cache().get(key)
+	if entry is None:
+		entry = shared_cache().get(key)
+		if entry is not None:
+			local_cache().set(key, entry, min(timeout, LOCAL_TIMEOUT))
+
+	if entry is not None and not (beta and _should_recompute_early(entry, beta)):
+		_record(key, hit=True)
+		return entry[0]
+
+	lock_key = f"{key}:lock"
+	if shared_cache().add(lock_key, 1, lock_timeout):
+		_record(key, hit=False)
+		try:
+			value, compute_time = _compute(compute)
+			_store(key, value, timeout, compute_time)
+			return value
+		finally:
+			shared_cache().delete(lock_key)
+
+	# Outro processo está recalculando: usamos o valor atual, se houver...
+	if entry is not None:
+		_record(key, hit=True)
+		return entry[0]
+	# ...ou aguardamos o valor novo por até lock_timeout segundos
+	deadline = time.monotonic() + lock_timeout
+	while time.monotonic() < deadline:
+		time.sleep(0.05)
+		entry = shared_cache().get(key)
+		if entry is not None:
+			_record(key, hit=True)
+			local_cache().set(key, entry, min(timeout, LOCAL_TIMEOUT))
+			return entry[0]
+	# A trava expirou sem resultado: calculamos nós mesmos
+	_record(key, hit=False)
+	value, compute_time = _compute(compute)
+	_store(key, value, timeout, compute_time)
+	return value
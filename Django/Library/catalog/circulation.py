@@ -0,0 +1,470 @@
+"""Regras de circulação: empréstimo com reservas (fila de espera por livro).
+
+Quando não há cópias livres, o usuário entra na fila do livro (`Hold`). Cada
+devolução (view do usuário, ação de staff ou ação em massa do admin) chama
+`on_copies_returned`, que separa a cópia para o próximo da fila: a busca é
+"menor posição com status waiting" no índice (book, status, position), então
+custa o mesmo com 3 ou 3 mil reservas no título.
+
+A cópia separada fica reservada por `HOLD_PICKUP_DAYS` dias. Reservas não
+retiradas são expiradas em lote pelo comando `expire_holds`, que já passa a
+cópia para o seguinte da fila.
+
+Cópias livres para novos empréstimos = copies_total − empréstimos ativos −
+reservas separadas (ready) de outros usuários.
+
+Balcão de atendimento: `batch_checkout` empresta uma pilha de livros para um
+usuário de uma vez (staff), com uma única consulta de disponibilidade para
+todos os itens e um único `bulk_create` dos empréstimos.
+
+Elegibilidade para avaliar: só quem já pegou o livro emprestado pode avaliá-lo.
+`borrowed_book_ids` guarda na sessão o conjunto de livros que o usuário já
+pegou, com a versão `get_user_loans_version` (carimbada a cada mudança
+nos empréstimos do usuário); listas, detalhe e formulário de avaliação testam pertinência no
+conjunto em vez de um EXISTS por livro. Os contadores de "Meus empréstimos"
+(`loan_summary`) usam a mesma versão como chave de cache.
+
+Renovação: um empréstimo em aberto pode ser renovado até `LOAN_MAX_RENEWALS`
+vezes, desde que ninguém esteja na fila do livro. As regras viram filtros
+(`renewable`), então renovar 10 mil empréstimos no fim do semestre custa uma
+consulta e um UPDATE por data de devolução distinta, não um POST por empréstimo.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Count, Exists, ExpressionWrapper, F, Max, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .cache_utils import get_or_set
+from .models import Book, Hold, Loan
+from .versioning import bump_book_version, bump_catalog_version, bump_user_loans_version, get_user_loans_version
+
+# Itens aceitos por empréstimo em lote (uma pilha no balcão, não o acervo)
+MAX_BATCH_ITEMS = 50
+
+
+class CirculationError(Exception):
+	"""Operação de circulação não permitida; a mensagem é exibida ao usuário."""
+
+
+def pickup_days() -> int:
+	return getattr(settings, "HOLD_PICKUP_DAYS", 3)
+
+
+def free_copies(book, for_user=None) -> int:
+	"""Cópias que podem ser emprestadas agora (descontando as separadas para a fila).
+
+	A reserva separada para o próprio `for_user` conta como livre para ele.
+	"""
+	active = Loan.objects.filter(book=book, returned_at__isnull=True).count()
+	ready = Hold.objects.filter(book=book, status=Hold.STATUS_READY)
+	if for_user is not None:
+		ready = ready.exclude(user=for_user)
+	return max(book.copies_total - active - ready.count(), 0)
+
+
+def default_due_date():
+	return timezone.localdate() + timedelta(days=14)
+
+
+def max_renewals() -> int:
+	return getattr(settings, "LOAN_MAX_RENEWALS", 2)
+
+
+def renewal_days() -> int:
+	return getattr(settings, "LOAN_RENEWAL_DAYS", 14)
+
+
+def checkout(book, user, due_date=None):
+	"""Cria o empréstimo respeitando a fila; atende a reserva do usuário, se houver.
+
+	Levanta CirculationError quando não há cópia livre para este usuário. A
+	linha do livro fica travada (select_for_update) até o fim da transação,
+	como em `batch_checkout`: dois empréstimos simultâneos não levam a mesma
+	última cópia.
+	"""
+	due_date = due_date or default_due_date()
+	with transaction.atomic():
+		book = Book.objects.select_for_update().get(pk=book.pk)
+		if free_copies(book, for_user=user) <= 0:
+			raise CirculationError("Não há cópias disponíveis para empréstimo.")
+		loan = Loan.objects.create(book=book, user=user, due_date=due_date)
+		# Reserva aberta do usuário para este livro é considerada atendida (a
+		# versão do catálogo já muda com o empréstimo, pelo signal de Loan)
+		hold = Hold.objects.filter(book=book, user=user, status__in=Hold.OPEN_STATUSES).first()
+		if hold is not None:
+			hold.status = Hold.STATUS_FULFILLED
+			hold.save(update_fields=["status"])
+	return loan
+
+
+def _per_book_count(queryset):
+	"""Subquery: quantas linhas de `queryset` há para o livro externo (OuterRef)."""
+	return Coalesce(
+		Subquery(queryset.filter(book=OuterRef("pk")).order_by().values("book").annotate(n=Count("id")).values("n")[:1]),
+		Value(0),
+	)
+
+
+def active_loans_subquery():
+	"""Subquery com a quantidade de empréstimos ativos de cada livro (OuterRef).
+
+	Usada nas listagens, na API e nas exportações: subquery em vez de JOIN
+	para não multiplicar as linhas quando a consulta também agrega outra
+	relação (avaliações, reservas).
+	"""
+	return _per_book_count(Loan.objects.filter(returned_at__isnull=True))
+
+
+def ready_holds_subquery(for_user=None):
+	"""Subquery com as cópias separadas (reservas `ready`) de cada livro (OuterRef).
+
+	A reserva do próprio `for_user` não entra na conta: para ele essa cópia
+	está livre, como em `free_copies`.
+	"""
+	ready = Hold.objects.filter(status=Hold.STATUS_READY)
+	if for_user is not None:
+		ready = ready.exclude(user=for_user)
+	return _per_book_count(ready)
+
+
+def with_availability(books, for_user=None):
+	"""Anota `active_loans`, `ready_for_others` e `available` no queryset de livros.
+
+	`available` é a conta de `free_copies` feita no SQL: cópias menos
+	empréstimos ativos menos cópias separadas para outros leitores, nunca
+	negativa. Sem `for_user`, toda cópia separada conta como ocupada; é a
+	disponibilidade de quem não tem reserva, igual para todos os leitores e
+	por isso usada nas listagens, filtros, facetas e na API (tudo em cache).
+	"""
+	return books.annotate(
+		active_loans=active_loans_subquery(),
+		ready_for_others=ready_holds_subquery(for_user),
+	).annotate(
+		available=Greatest(F("copies_total") - F("active_loans") - F("ready_for_others"), Value(0)),
+	)
+
+
+def _is_book_id(value):
+	return value.isdigit() and len(value) <= 9
+
+
+def _lookup_books(identifiers, user):
+	"""Uma consulta: os livros citados (por id ou ISBN) já com a disponibilidade para `user`.
+
+	Números de até 9 dígitos são ids; o resto é tratado como ISBN (10 ou 13
+	caracteres). As linhas ficam travadas (select_for_update) até o fim da
+	transação, para dois balcões não emprestarem a mesma última cópia.
+	Devolve uma função identificador -> livro (ou None).
+	"""
+	ids = {int(value) for value in identifiers if _is_book_id(value)}
+	isbns = {value for value in identifiers if not _is_book_id(value)}
+	books = with_availability(
+		Book.objects.select_for_update().filter(Q(pk__in=ids) | Q(isbn__in=isbns)), for_user=user
+	).annotate(
+		already_borrowed=Exists(Loan.objects.filter(book=OuterRef("pk"), user=user, returned_at__isnull=True)),
+	)
+	by_id, by_isbn = {}, {}
+	for book in books:
+		by_id[book.pk] = book
+		by_isbn[book.isbn] = book
+	return lambda value: by_id.get(int(value)) if _is_book_id(value) else by_isbn.get(value)
+
+
+def batch_checkout(user, identifiers, due_date=None):
+	"""Empresta vários livros para `user` numa transação; devolve um resultado por item.
+
+	`identifiers` são ids ou ISBNs, na ordem em que foram lidos no balcão.
+	Cada resultado é {"identifier", "book", "loan", "error"}: itens com erro
+	(não encontrado, repetido, já emprestado ao usuário, sem cópia livre) não
+	impedem os demais. Custo fixo, qualquer que seja o tamanho da pilha: uma
+	consulta de disponibilidade, um INSERT em lote e um UPDATE das reservas
+	atendidas.
+	"""
+	identifiers = [str(value).strip() for value in identifiers if str(value).strip()]
+	if len(identifiers) > MAX_BATCH_ITEMS:
+		raise CirculationError(f"Máximo de {MAX_BATCH_ITEMS} livros por vez.")
+	due_date = due_date or default_due_date()
+	results, to_create, seen = [], [], set()
+	with transaction.atomic():
+		find_book = _lookup_books(identifiers, user)
+		for identifier in identifiers:
+			book = find_book(identifier)
+			result = {"identifier": identifier, "book": book, "loan": None, "error": None}
+			results.append(result)
+			if book is None:
+				result["error"] = "Livro não encontrado."
+			elif book.pk in seen:
+				result["error"] = "Livro repetido nesta lista."
+			elif book.already_borrowed:
+				result["error"] = "O usuário já está com este livro."
+			elif book.available <= 0:
+				result["error"] = "Não há cópias disponíveis para empréstimo."
+			else:
+				seen.add(book.pk)
+				result["loan"] = Loan(book=book, user=user, due_date=due_date)
+				to_create.append(result["loan"])
+		if not to_create:
+			return results
+		# bulk_create preenche os ids (SQLite 3.35+/PostgreSQL) e não dispara signals
+		Loan.objects.bulk_create(to_create)
+		Hold.objects.filter(user=user, book_id__in=seen, status__in=Hold.OPEN_STATUSES).update(
+			status=Hold.STATUS_FULFILLED
+		)
+	# Sem signals: invalidamos as versões (ETags/caches) aqui, uma vez por livro
+	for book_id in seen:
+		bump_book_version(book_id)
+	bump_catalog_version()
+	bump_user_loans_version(user.pk)
+	return results
+
+
+def _pending_holds():
+	"""Exists: há outro usuário na fila (ou com cópia separada) do livro do empréstimo externo."""
+	return Exists(
+		Hold.objects.filter(book=OuterRef("book"), status__in=Hold.OPEN_STATUSES).exclude(user=OuterRef("user"))
+	)
+
+
+def renewable(loans):
+	"""Filtra `loans` deixando os que podem ser renovados agora (em aberto, abaixo do limite, sem fila)."""
+	return loans.filter(returned_at__isnull=True, renewals__lt=max_renewals()).exclude(_pending_holds())
+
+
+def annotate_can_renew(loans):
+	"""Anota `can_renew` em cada empréstimo (para o botão "Renovar" sem consulta por linha)."""
+	rule = Q(returned_at__isnull=True, renewals__lt=max_renewals()) & ~Q(_pending_holds())
+	return loans.annotate(can_renew=ExpressionWrapper(rule, output_field=BooleanField()))
+
+
+def renewed_due_date(due_date, today=None):
+	"""Nova data de devolução: `renewal_days` a partir do vencimento (ou de hoje, se já venceu).
+
+	Sempre depois da data atual de devolução, que por sua vez já respeita a
+	constraint `loan_due_after_borrowed` — a renovação nunca a viola.
+	"""
+	today = today or timezone.localdate()
+	return max(due_date, today) + timedelta(days=renewal_days())
+
+
+def renew_loans(loans, today=None, dry_run=False):
+	"""Renova em lote os empréstimos de `loans` que passam nas regras; devolve um resumo.
+
+	1. uma consulta agregada conta, no conjunto pedido, os em aberto, os que
+	   atingiram o limite, os bloqueados por reservas e os renováveis;
+	2. uma consulta traz as datas de devolução distintas (e os livros) dos
+	   renováveis;
+	3. um UPDATE por data futura distinta e um só para todos os vencidos (ou
+	   que vencem hoje), que ganham a mesma data nova (hoje + `renewal_days`):
+	   due_date nova e renewals + 1. O UPDATE repete o filtro `renewable`, então
+	   uma reserva feita no meio do caminho ainda bloqueia a renovação.
+
+	update() não dispara signals: as versões dos livros e dos leitores são
+	invalidadas aqui.
+	"""
+	today = today or timezone.localdate()
+	at_limit = Q(renewals__gte=max_renewals())
+	summary = loans.filter(returned_at__isnull=True).aggregate(
+		open=Count("id"),
+		at_limit=Count("id", filter=at_limit),
+		blocked_by_holds=Count("id", filter=~at_limit & Q(_pending_holds())),
+		renewable=Count("id", filter=~at_limit & ~Q(_pending_holds())),
+	)
+	summary.update(renewed=0, updates=0)
+	if dry_run or not summary["renewable"]:
+		return summary
+	eligible = renewable(loans)
+	rows = set(eligible.order_by().values_list("due_date", "book_id", "user_id"))
+	with transaction.atomic():
+		# Da data mais distante para a mais próxima: a data nova é sempre maior que
+		# as que faltam processar, então nenhum empréstimo é renovado duas vezes
+		for due_date in sorted({due for due, _, _ in rows if due > today}, reverse=True):
+			summary["renewed"] += eligible.filter(due_date=due_date).update(
+				due_date=renewed_due_date(due_date, today), renewals=F("renewals") + 1
+			)
+			summary["updates"] += 1
+		# Vencidos e os que vencem hoje: todos recebem hoje + renewal_days, num
+		# UPDATE só (semanas de atraso não viram uma consulta por dia). As datas
+		# novas acima são posteriores a essa, então ninguém entra duas vezes
+		if any(due <= today for due, _, _ in rows):
+			summary["renewed"] += eligible.filter(due_date__lte=today).update(
+				due_date=renewed_due_date(today, today), renewals=F("renewals") + 1
+			)
+			summary["updates"] += 1
+	for book_id in {book_id for _, book_id, _ in rows}:
+		bump_book_version(book_id)
+	for user_id in {user_id for _, _, user_id in rows}:
+		bump_user_loans_version(user_id)
+	bump_catalog_version()
+	return summary
+
+
+def renew_loan(loan, today=None):
+	"""Renova um empréstimo; levanta CirculationError com o motivo quando não é possível."""
+	if loan.returned_at:
+		raise CirculationError("Este empréstimo já foi devolvido.")
+	if loan.renewals >= max_renewals():
+		raise CirculationError(f"Limite de {max_renewals()} renovações atingido.")
+	if not renew_loans(Loan.objects.filter(pk=loan.pk), today=today)["renewed"]:
+		raise CirculationError("Há outros leitores na fila deste livro; não é possível renovar.")
+	loan.refresh_from_db(fields=["due_date", "renewals"])
+	return loan
+
+
+def place_hold(book, user):
+	"""Coloca o usuário no fim da fila do livro e devolve a reserva criada."""
+	if Loan.objects.filter(book=book, user=user, returned_at__isnull=True).exists():
+		raise CirculationError("Você já está com este livro emprestado.")
+	if Hold.objects.filter(book=book, user=user, status__in=Hold.OPEN_STATUSES).exists():
+		raise CirculationError("Você já tem uma reserva para este livro.")
+	for _attempt in range(3):
+		try:
+			with transaction.atomic():
+				# MAX(position) usa o índice único (book, position): uma busca só
+				last = Hold.objects.filter(book=book).aggregate(last=Max("position"))["last"] or 0
+				hold = Hold.objects.create(book=book, user=user, position=last + 1)
+			break
+		except IntegrityError:
+			# Outra reserva pegou a mesma posição ao mesmo tempo; tenta a seguinte
+			continue
+	else:
+		raise CirculationError("Não foi possível registrar a reserva agora. Tente novamente.")
+	# Se sobrou cópia livre (ex.: devolução simultânea), já separa para a fila
+	promote_next_holds(book.pk)
+	hold.refresh_from_db(fields=["status", "ready_at", "expires_at"])
+	return hold
+
+
+def queue_position(hold) -> int:
+	"""Posição do usuário entre os que ainda esperam (1 = próximo)."""
+	return Hold.objects.filter(book_id=hold.book_id, status=Hold.STATUS_WAITING, position__lt=hold.position).count() + 1
+
+
+def _next_waiting(book_id):
+	return Hold.objects.filter(book_id=book_id, status=Hold.STATUS_WAITING).order_by("position").first()
+
+
+def promote_next_holds(book_id, now=None):
+	"""Separa as cópias livres do livro para os próximos da fila. Devolve as reservas promovidas.
+
+	Caso comum (livro sem fila): uma única busca no índice e nada mais.
+	"""
+	now = now or timezone.now()
+	promoted = []
+	with transaction.atomic():
+		hold = _next_waiting(book_id)
+		if hold is None:
+			return promoted
+		free = free_copies(Book.objects.only("copies_total").get(pk=book_id))
+		while hold is not None and free > 0:
+			hold.status = Hold.STATUS_READY
+			hold.ready_at = now
+			hold.expires_at = now + timedelta(days=pickup_days())
+			hold.save(update_fields=["status", "ready_at", "expires_at"])
+			promoted.append(hold)
+			free -= 1
+			hold = _next_waiting(book_id) if free > 0 else None
+	if promoted:
+		# Cópias separadas saem da disponibilidade exibida na lista
+		bump_catalog_version()
+	return promoted
+
+
+def on_copies_returned(book_ids, now=None):
+	"""Chamado após devoluções: promove a fila de cada livro afetado."""
+	promoted = []
+	for book_id in sorted(set(book_ids)):
+		promoted.extend(promote_next_holds(book_id, now=now))
+	return promoted
+
+
+def cancel_hold(hold):
+	"""Cancela a reserva; se a cópia estava separada, passa para o próximo."""
+	was_ready = hold.status == Hold.STATUS_READY
+	hold.status = Hold.STATUS_CANCELLED
+	hold.save(update_fields=["status"])
+	if was_ready:
+		# A cópia volta a ficar livre (ou é separada para o próximo, que também invalida)
+		bump_catalog_version()
+		promote_next_holds(hold.book_id)
+
+
+def expire_holds(now=None, batch_size=1000):
+	"""Expira reservas separadas e não retiradas, em lotes, e promove as filas.
+
+	Usa o índice parcial de `expires_at` das reservas `ready`. Devolve
+	{"expired": n, "promoted": m}.
+	"""
+	now = now or timezone.now()
+	stats = {"expired": 0, "promoted": 0}
+	while True:
+		batch = list(
+			Hold.objects.filter(status=Hold.STATUS_READY, expires_at__lt=now)
+			.order_by("expires_at")
+			.values_list("id", "book_id")[:batch_size]
+		)
+		if not batch:
+			break
+		# update() em lote não dispara signals: invalidamos as versões abaixo
+		Hold.objects.filter(id__in=[hold_id for hold_id, _ in batch]).update(status=Hold.STATUS_EXPIRED)
+		book_ids = {book_id for _, book_id in batch}
+		stats["expired"] += len(batch)
+		stats["promoted"] += len(on_copies_returned(book_ids, now=now))
+		for book_id in book_ids:
+			bump_book_version(book_id)
+		bump_catalog_version()
+	return stats
+
+
+BORROWED_SESSION_KEY = "catalog_borrowed_books"
+
+
+def borrowed_book_ids(request):
+	"""Ids dos livros que o usuário logado já pegou emprestado (conjunto).
+
+	Guardado na sessão junto com a versão do usuário: enquanto nenhum
+	empréstimo novo for criado, as páginas seguintes não consultam `Loan`.
+	Também fica em `request.user`, onde `Book.users_can_review` o encontra.
+	"""
+	user = request.user
+	if not user.is_authenticated:
+		return set()
+	ids = getattr(user, "_borrowed_book_ids", None)
+	if ids is not None:
+		return ids
+	version = get_user_loans_version(user.pk)
+	cached = request.session.get(BORROWED_SESSION_KEY)
+	if cached and cached["version"] == version:
+		ids = set(cached["ids"])
+	else:
+		# Do primário: o conjunto fica na sessão sob a versão atual
+		borrowed = Loan.objects.using("default").filter(user=user).order_by()
+		ids = set(borrowed.values_list("book_id", flat=True).distinct())
+		request.session[BORROWED_SESSION_KEY] = {"version": version, "ids": sorted(ids)}
+	user._borrowed_book_ids = ids
+	return ids
+
+
+def loan_summary(user, today=None):
+	"""Contadores de "Meus empréstimos": total, em andamento, atrasados e devolvidos.
+
+	Uma consulta agregada, guardada no cache por usuário. A chave leva a
+	versão dos empréstimos do usuário e a data: um empréstimo vira atrasado
+	à meia-noite sem nenhuma escrita no banco.
+	"""
+	today = today or timezone.localdate()
+	key = f"catalog:user:{user.pk}:loan-summary:{get_user_loans_version(user.pk)}:{today.isoformat()}"
+	open_loans = Q(returned_at__isnull=True)
+	return get_or_set(
+		key,
+		lambda: Loan.objects.filter(user=user).aggregate(
+			total=Count("id"),
+			active=Count("id", filter=open_loans & Q(due_date__gte=today)),
+			overdue=Count("id", filter=open_loans & Q(due_date__lt=today)),
+			returned=Count("id", filter=Q(returned_at__isnull=False)),
+		),
+		timeout=24 * 60 * 60,
+	)
@@ -0,0 +1,130 @@
+"""Roteamento de leituras para réplicas do banco (read replicas).
+
+Como funciona:
+- `ReplicaRoutingMiddleware` marca o request como "pode ler da réplica" quando
+  a rota está em `REPLICA_READ_VIEWS` (listas, detalhe, busca, relatórios) e o
+  método é GET/HEAD;
+- `PrimaryReplicaRouter` envia as leituras desse request para uma das
+  réplicas em `DATABASE_REPLICAS`. Escritas e tudo o mais vão para `default`;
+- leia-o-que-escreveu (read-your-writes): depois de qualquer POST (emprestar,
+  devolver, avaliar...) o middleware grava um cookie curto que "prende" as
+  leituras daquele navegador ao primário por `READ_YOUR_WRITES_SECONDS`, para o
+  usuário não ver dados antigos enquanto a réplica ainda não recebeu a mudança.
+
+Sessões, usuários e content types são sempre lidos do primário: um login
+recém-feito ainda pode não existir na réplica.
+
+Carimbos de versão (`versioning.py`) mudam no instante da escrita, antes de a
+réplica recebê-la. Nada lido da réplica pode ficar guardado sob uma versão:
+os cálculos de `cache_utils.get_or_set` e o livro do fragmento em cache do
+detalhe leem do primário, e as páginas lidas da réplica saem sem ETag nem
+Last-Modified (`reading_from_replica()`), senão o navegador revalidaria a
+cópia antiga com 304 até a próxima mudança.
+
+Sem réplicas configuradas, o roteador não interfere (tudo usa `default`).
+"""
+
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+from .middleware import HybridMiddleware
+
+# Apps lidos sempre do primário
+PRIMARY_ONLY_APPS = {"sessions", "auth", "contenttypes", "admin"}
+
+# Cookie que prende as leituras ao primário após uma escrita
+PIN_COOKIE_NAME = "db_pin_primary"
+
+_read_from_replica = contextvars.ContextVar("catalog_read_from_replica", default=False)
+
+
+@contextmanager
+def use_replica(enabled=True):
+	"""Ativa (ou desativa) as leituras em réplica no bloco `with`."""
+	token = _read_from_replica.set(enabled)
+	try:
+		yield
+	finally:
+		_read_from_replica.reset(token)
+
+
+def replica_aliases():
+	return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+def reading_from_replica() -> bool:
+	"""As leituras deste request (contexto) estão indo para uma réplica?"""
+	return _read_from_replica.get() and bool(replica_aliases())
+
+
+class PrimaryReplicaRouter:
+	"""Router do Django: leituras marcadas vão para uma réplica aleatória."""
+
+	def db_for_read(self, model, **hints):
+		if model._meta.app_label in PRIMARY_ONLY_APPS or not _read_from_replica.get():
+			return None
+		replicas = replica_aliases()
+		return random.choice(replicas) if replicas else None
+
+	def db_for_write(self, model, **hints):
+		return "default"
+
+	def allow_relation(self, obj1, obj2, **hints):
+		# Réplicas têm os mesmos dados do primário
+		return True
+
+	def allow_migrate(self, db, app_label, model_name=None, **hints):
+		# Migrações só no primário; as réplicas recebem os dados por replicação
+		return db not in replica_aliases()
+
+
+class ReplicaRoutingMiddleware(HybridMiddleware):
+	"""Decide, por request, se as leituras podem ir para a réplica.
+
+	Funciona em WSGI e ASGI: a marcação é um ContextVar, que o `sync_to_async`
+	do ORM assíncrono copia para a thread onde a consulta roda.
+	"""
+
+	def process(self, request):
+		token = self._mark(request)
+		try:
+			response = self.get_response(request)
+		finally:
+			if token is not None:
+				_read_from_replica.reset(token)
+		return self._pin_after_write(request, response)
+
+	async def aprocess(self, request):
+		token = self._mark(request)
+		try:
+			response = await self.get_response(request)
+		finally:
+			if token is not None:
+				_read_from_replica.reset(token)
+		return self._pin_after_write(request, response)
+
+	def _mark(self, request):
+		if replica_aliases() and self._can_use_replica(request):
+			return _read_from_replica.set(True)
+		return None
+
+	def _pin_after_write(self, request, response):
+		if request.method not in ("GET", "HEAD", "OPTIONS"):
+			# Houve (possivelmente) uma escrita: próximas leituras no primário
+			seconds = getattr(settings, "READ_YOUR_WRITES_SECONDS", 10)
+			response.set_cookie(PIN_COOKIE_NAME, "1", max_age=seconds, httponly=True, samesite="Lax")
+		return response
+
+	def _can_use_replica(self, request):
+		if request.method not in ("GET", "HEAD") or request.COOKIES.get(PIN_COOKIE_NAME):
+			return False
+		# O middleware roda antes da resolução da URL; resolvemos aqui só o nome
+		try:
+			view_name = resolve(request.path_info).view_name
+		except Resolver404:
+			return False
+		return view_name in getattr(settings, "REPLICA_READ_VIEWS", ())
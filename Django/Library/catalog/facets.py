@@ -0,0 +1,143 @@
+"""Serviço de facetas do catálogo (valores dos filtros e suas contagens).
+
+Duas funções principais:
+- `get_catalog_facets()`: facetas do acervo inteiro (para montar os filtros);
+- `get_result_facets()`: contagens para o resultado atual da busca.
+
+Usado pela busca avançada e pela barra de filtros do `book_list`:
+categorias, idiomas e editoras com a quantidade de livros de cada uma, além
+da faixa de anos de edição. As agregações rodam uma vez e ficam no cache
+(`cache_utils.get_or_set`) com a versão de facetas na chave; essa versão só
+muda quando um Book ou Category é gravado/apagado (ver `signals.py`).
+"""
+
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.db.models import Count, F, Max, Min, Q
+
+from .cache_utils import get_or_set
+from .models import Book, Category
+from .versioning import get_catalog_version, get_facets_version
+
+logger = logging.getLogger(__name__)
+
+# Quantas editoras mostrar (as com mais livros)
+PUBLISHERS_LIMIT = 50
+
+# Tamanho das faixas de ano de edição (10 = décadas)
+YEAR_BUCKET_SIZE = 10
+
+
+def _value_counts(field: str, limit=None):
+	"""[{"value": ..., "count": ...}] para um campo texto do Book, ignorando vazios."""
+	qs = (
+		Book.objects.exclude(**{field: ""})
+		.values(field)
+		.annotate(count=Count("id"))
+	)
+	if limit:
+		qs = qs.order_by("-count", field)[:limit]
+	else:
+		qs = qs.order_by(field)
+	return [{"value": row[field], "count": row["count"]} for row in qs]
+
+
+def compute_catalog_facets() -> dict:
+	"""Calcula as facetas direto no banco (4 consultas agregadas)."""
+	categories = list(
+		Category.objects.annotate(book_count=Count("books"))
+		.order_by("name")
+		.values("id", "name", "book_count")
+	)
+	years = Book.objects.aggregate(min=Min("edition_year"), max=Max("edition_year"))
+	return {
+		"categories": categories,
+		"languages": _value_counts("language"),
+		"publishers": _value_counts("publisher", limit=PUBLISHERS_LIMIT),
+		"edition_years": years,
+	}
+
+
+def get_catalog_facets() -> dict:
+	"""Facetas do catálogo vindas do cache (recalculadas só após mudanças no acervo).
+
+	Retorna um dict com:
+	- categories: [{"id", "name", "book_count"}]
+	- languages / publishers: [{"value", "count"}]
+	- edition_years: {"min", "max"}
+	"""
+	key = f"catalog:facets:{get_facets_version()}"
+	return get_or_set(key, compute_catalog_facets, timeout=3600)
+
+
+def compute_result_facets(queryset) -> dict:
+	"""Contagens por categoria, idioma, faixa de ano e disponibilidade do resultado.
+
+	Tudo sai de UMA consulta agrupada: agrupamos por (categoria, idioma, década)
+	e, em cada grupo, contamos o total e quantos têm cópia disponível. As somas
+	por faceta são feitas em Python sobre essas poucas linhas.
+
+	`queryset` deve ser o resultado filtrado do `book_list`, com a anotação
+	`available` de `circulation.with_availability`.
+
+	As contagens refletem o resultado atual: com uma categoria selecionada, as
+	demais categorias aparecem zeradas, mas os idiomas/anos mostram quantos
+	livros daquela categoria há em cada um.
+	"""
+	rows = (
+		queryset.order_by()
+		.annotate(year_bucket=F("edition_year") / YEAR_BUCKET_SIZE * YEAR_BUCKET_SIZE)
+		.values("category_id", "language", "year_bucket")
+		.annotate(
+			total=Count("id"),
+			available=Count("id", filter=Q(available__gt=0)),
+		)
+	)
+	categories, languages, years = {}, {}, {}
+	total = available = 0
+	for row in rows:
+		total += row["total"]
+		available += row["available"]
+		if row["category_id"] is not None:
+			categories[row["category_id"]] = categories.get(row["category_id"], 0) + row["total"]
+		if row["language"]:
+			languages[row["language"]] = languages.get(row["language"], 0) + row["total"]
+		if row["year_bucket"] is not None:
+			years[row["year_bucket"]] = years.get(row["year_bucket"], 0) + row["total"]
+	return {
+		"total": total,
+		"categories": categories,
+		"languages": sorted(languages.items()),
+		"year_buckets": [
+			{"start": start, "end": start + YEAR_BUCKET_SIZE - 1, "count": count}
+			for start, count in sorted(years.items())
+		],
+		"availability": {"available": available, "unavailable": total - available},
+	}
+
+
+def get_result_facets(queryset, params: dict) -> dict:
+	"""Facetas do resultado atual, com cache por (filtros, versão do catálogo).
+
+	`params` são os filtros aplicados (os mesmos gravados no histórico de
+	busca); paginação e ordenação não mudam as contagens e ficam de fora.
+	O tempo de cálculo é medido: acima de `FACETS_BUDGET_MS` registramos um
+	aviso no log `catalog.facets`.
+	"""
+	raw = "|".join(f"{k}={params[k]}" for k in sorted(params))
+	key = f"catalog:result-facets:{get_catalog_version()}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+	def compute():
+		start = time.perf_counter()
+		facets = compute_result_facets(queryset)
+		elapsed_ms = (time.perf_counter() - start) * 1000
+		budget_ms = getattr(settings, "FACETS_BUDGET_MS", 20)
+		if elapsed_ms > budget_ms:
+			logger.warning("Facetas levaram %.1f ms (orçamento: %s ms) para %s", elapsed_ms, budget_ms, raw)
+		facets["duration_ms"] = round(elapsed_ms, 2)
+		return facets
+
+	return get_or_set(key, compute, timeout=600)
@@ -0,0 +1,247 @@
+"""Gerador de dados sintéticos para testes de desempenho.
+
+Cria categorias, livros, usuários, empréstimos, avaliações e histórico de
+buscas com `bulk_create` em lotes. Com a mesma `seed` os dados gerados são
+sempre os mesmos, para que benchmarks possam ser repetidos e comparados.
+
+As distribuições imitam um acervo real:
+- popularidade Zipf: poucos livros concentram a maioria dos empréstimos e
+  avaliações (expoente `popularity`; 0 = uniforme);
+- categorias desbalanceadas (expoente `category_skew`);
+- uma fração dos empréstimos ainda em aberto (`active_ratio`), dos quais
+  parte está atrasada (`overdue_ratio`), sem passar das cópias de cada livro.
+
+Uso em código:
+	from catalog.fake_data import generate_library
+	generate_library(books=2000, users=200, loans=5000, seed=1)
+"""
+
+import bisect
+import itertools
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from .models import Book, Category, Loan, Review, SearchQuery
+
+CATEGORY_NAMES = [
+	"Romance", "Ficção científica", "Fantasia", "Suspense", "Biografia", "História",
+	"Tecnologia", "Didático", "Poesia", "Infantil", "Autoajuda", "Filosofia",
+]
+LANGUAGES = ["Português", "Inglês", "Espanhol", "Francês", "Alemão"]
+PUBLISHERS = ["Companhia das Letras", "Rocco", "Intrínseca", "Novatec", "Saraiva", "Record", "Moderna", "Atlas"]
+WORDS = [
+	"casa", "tempo", "noite", "mar", "cidade", "guerra", "amor", "código", "python", "história",
+	"segredo", "jardim", "caminho", "estrela", "memória", "viagem", "sombra", "luz", "rio", "vento",
+]
+FIRST_NAMES = ["Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabriela", "Heitor", "Íris", "João"]
+LAST_NAMES = ["Silva", "Souza", "Oliveira", "Santos", "Lima", "Pereira", "Costa", "Almeida", "Rocha", "Gomes"]
+
+DEFAULT_PASSWORD = "senha-benchmark"
+
+
+@contextmanager
+def historical_timestamps(*fields):
+	"""Permite gravar datas passadas em campos auto_now/auto_now_add.
+
+	Por padrão o Django sobrescreve esses campos com "agora" no save e no
+	bulk_create; para simular histórico, desligamos isso temporariamente.
+	"""
+	saved = []
+	for field in fields:
+		saved.append((field, field.auto_now, field.auto_now_add))
+		field.auto_now = field.auto_now_add = False
+	try:
+		yield
+	finally:
+		for field, auto_now, auto_now_add in saved:
+			field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _batched_create(model, objects, batch_size, on_batch=None):
+	"""bulk_create em lotes a partir de um iterável (sem montar tudo na memória).
+
+	Cada lote roda na sua própria transação; `on_batch(total)` é chamado após cada um.
+	"""
+	created = 0
+	iterator = iter(objects)
+	while batch := list(itertools.islice(iterator, batch_size)):
+		model.objects.bulk_create(batch, batch_size=batch_size)
+		created += len(batch)
+		if on_batch:
+			on_batch(created)
+	return created
+
+
+def zipf_sampler(rng, population, exponent):
+	"""Devolve sample(k) que sorteia k itens com peso 1/posição^exponent.
+
+	O primeiro item da lista é o mais popular; com exponent=0 é uniforme.
+	Usa pesos acumulados + busca binária: O(log n) por sorteio, mesmo com
+	milhões de itens.
+	"""
+	population = list(population)
+	if exponent <= 0:
+		return lambda k: [rng.choice(population) for _ in range(k)]
+	cum_weights = list(itertools.accumulate(1 / rank ** exponent for rank in range(1, len(population) + 1)))
+	total = cum_weights[-1]
+	return lambda k: [population[bisect.bisect_left(cum_weights, rng.random() * total)] for _ in range(k)]
+
+
+def _chunks(total, size):
+	"""Tamanhos dos lotes: _chunks(10, 4) -> 4, 4, 2."""
+	while total > 0:
+		yield min(size, total)
+		total -= size
+
+
+def generate_library(
+	books=1000,
+	users=100,
+	loans=3000,
+	reviews=1000,
+	searches=1000,
+	seed=1,
+	batch_size=1000,
+	popularity=1.1,
+	category_skew=1.0,
+	active_ratio=0.05,
+	overdue_ratio=0.3,
+	progress=None,
+):
+	"""Gera um acervo sintético e devolve um dict com as quantidades criadas.
+
+	Os ISBNs e nomes de usuário usam um prefixo derivado da seed, então é
+	possível rodar várias vezes no mesmo banco com seeds diferentes.
+	`progress(etapa, criados)` é chamado a cada lote (útil em comandos).
+	"""
+	rng = random.Random(seed)
+	now = timezone.now()
+	today = timezone.localdate()
+	prefix = f"{seed % 1000:03d}"
+	report = progress or (lambda stage, created: None)
+
+	categories = []
+	for name in CATEGORY_NAMES:
+		category, _ = Category.objects.get_or_create(name=name)
+		categories.append(category)
+	pick_category = zipf_sampler(rng, categories, category_skew)
+
+	def make_books():
+		for i in range(books):
+			yield Book(
+				title=" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))).capitalize() + f" {i}",
+				author=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+				isbn=f"9{prefix}{i:09d}",
+				copies_total=rng.randint(1, 4),
+				category=pick_category(1)[0],
+				language=rng.choice(LANGUAGES),
+				publisher=rng.choice(PUBLISHERS),
+				edition_year=rng.randint(1950, today.year),
+			)
+
+	_batched_create(Book, make_books(), batch_size, lambda n: report("books", n))
+	copies = dict(Book.objects.filter(isbn__startswith=f"9{prefix}").values_list("id", "copies_total"))
+	book_ids = sorted(copies)
+	# A ordem de popularidade não acompanha o id (senão os livros antigos seriam os mais lidos)
+	ranked_books = book_ids[:]
+	rng.shuffle(ranked_books)
+	pick_book = zipf_sampler(rng, ranked_books, popularity)
+
+	User = get_user_model()
+	# Mesmo hash para todos: calcular PBKDF2 por usuário deixaria a geração lenta
+	password = make_password(DEFAULT_PASSWORD)
+	_batched_create(
+		User,
+		(User(username=f"leitor{prefix}_{i}", password=password) for i in range(users)),
+		batch_size,
+		lambda n: report("users", n),
+	)
+	# order_by: sem ele a ordem do banco não é garantida e a mesma semente geraria outros dados
+	user_ids = list(
+		User.objects.filter(username__startswith=f"leitor{prefix}_").order_by("id").values_list("id", flat=True)
+	)
+	if not user_ids or not book_ids:
+		loans = reviews = searches = 0
+
+	active = dict.fromkeys(book_ids, 0)
+
+	def make_loans():
+		for size in _chunks(loans, batch_size):
+			for book_id in pick_book(size):
+				is_open = rng.random() < active_ratio and active[book_id] < copies[book_id]
+				if is_open:
+					active[book_id] += 1
+					# Atrasado: emprestado há mais de 14 dias; em dia: nos últimos 14
+					days = rng.randint(15, 60) if rng.random() < overdue_ratio else rng.randint(0, 13)
+				else:
+					days = rng.randint(14, 730)
+				borrowed_at = now - timedelta(days=days, minutes=rng.randint(0, 1440))
+				due_date = timezone.localtime(borrowed_at).date() + timedelta(days=14)
+				returned_at = None
+				if not is_open:
+					returned_at = min(borrowed_at + timedelta(days=rng.randint(1, 21), hours=rng.randint(0, 23)), now)
+				yield Loan(
+					book_id=book_id,
+					user_id=rng.choice(user_ids),
+					borrowed_at=borrowed_at,
+					due_date=due_date,
+					returned_at=returned_at,
+				)
+
+	with historical_timestamps(Loan._meta.get_field("borrowed_at")):
+		loans_created = _batched_create(Loan, make_loans(), batch_size, lambda n: report("loans", n))
+
+	# Avaliações: apenas pares (livro, usuário) distintos, por causa da restrição única
+	def make_reviews():
+		seen = set()
+		attempts = 0
+		while len(seen) < reviews and attempts < reviews * 3:
+			for book_id in pick_book(min(batch_size, reviews - len(seen))):
+				attempts += 1
+				pair = (book_id, rng.choice(user_ids))
+				if pair in seen:
+					continue
+				seen.add(pair)
+				created_at = now - timedelta(days=rng.randint(0, 365))
+				yield Review(
+					book_id=pair[0],
+					user_id=pair[1],
+					# Notas tendem a ser altas em avaliações reais
+					rating=rng.choices((1, 2, 3, 4, 5), weights=(5, 8, 17, 35, 35))[0],
+					comment=" ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 12))),
+					created_at=created_at,
+					updated_at=created_at,
+				)
+
+	review_fields = [Review._meta.get_field("created_at"), Review._meta.get_field("updated_at")]
+	with historical_timestamps(*review_fields):
+		reviews_created = _batched_create(Review, make_reviews(), batch_size, lambda n: report("reviews", n))
+
+	# Buscas: termos populares se repetem muito (também Zipf)
+	pick_term = zipf_sampler(rng, WORDS, popularity)
+
+	def make_searches():
+		for size in _chunks(searches, batch_size):
+			for term in pick_term(size):
+				yield SearchQuery(
+					user_id=rng.choice(user_ids),
+					q=term,
+					params={"idioma": rng.choice(LANGUAGES + [""])},
+					created_at=now - timedelta(days=rng.randint(0, 90), minutes=rng.randint(0, 1440)),
+				)
+
+	with historical_timestamps(SearchQuery._meta.get_field("created_at")):
+		searches_created = _batched_create(SearchQuery, make_searches(), batch_size, lambda n: report("searches", n))
+
+	return {
+		"books": len(book_ids),
+		"users": len(user_ids),
+		"loans": loans_created,
+		"reviews": reviews_created,
+		"searches": searches_created,
+	}
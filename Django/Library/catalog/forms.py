@@ -3,7 +3,14 @@
 PT-BR: define formulários para interação do usuário, incluindo avaliações de livros.
 """
 
+import re
+
 from django import forms
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.utils import timezone
+
+from .circulation import MAX_BATCH_ITEMS
 from .models import Review
 
 
@@ -29,3 +36,44 @@ class ReviewForm(forms.ModelForm):
 			"rating": "Sua avaliação",
 			"comment": "Comentário (opcional)",
 		}
+
+
+class BatchCheckoutForm(forms.Form):
+	"""Empréstimo em lote no balcão (staff): um usuário e a pilha de livros.
+
+	PT-BR: os livros podem ser digitados ou lidos com leitor de código de
+	barras (ISBN), um por linha; ids numéricos também são aceitos.
+	"""
+
+	user = forms.CharField(label="Usuário (login ou id)")
+	books = forms.CharField(
+		label="Livros (ids ou ISBNs, um por linha)",
+		widget=forms.Textarea(attrs={"rows": 8, "class": "form-control", "autofocus": True}),
+	)
+	due_date = forms.DateField(
+		label="Devolver até (opcional)", required=False, widget=forms.DateInput(attrs={"type": "date"})
+	)
+
+	def clean_user(self):
+		value = self.cleaned_data["user"].strip()
+		lookup = Q(username=value)
+		if value.isdigit():
+			lookup |= Q(pk=int(value))
+		user = get_user_model().objects.filter(lookup, is_active=True).first()
+		if user is None:
+			raise forms.ValidationError("Usuário não encontrado.")
+		return user
+
+	def clean_books(self):
+		identifiers = [value for value in re.split(r"[\s,;]+", self.cleaned_data["books"]) if value]
+		if not identifiers:
+			raise forms.ValidationError("Informe ao menos um livro.")
+		if len(identifiers) > MAX_BATCH_ITEMS:
+			raise forms.ValidationError(f"Máximo de {MAX_BATCH_ITEMS} livros por vez.")
+		return identifiers
+
+	def clean_due_date(self):
+		due_date = self.cleaned_data["due_date"]
+		if due_date and due_date < timezone.localdate():
+			raise forms.ValidationError("A data de devolução não pode estar no passado.")
+		return due_date
@@ -0,0 +1,267 @@
+"""Benchmark dos caminhos mais usados do catálogo (latência e consultas por request).
+
+Uso:
+	python manage.py benchmark_catalog
+	python manage.py benchmark_catalog --books 5000 --loans 20000 --iterations 100 --seed 7
+	python manage.py benchmark_catalog --scenarios browse,search --output bench.json
+
+O comando cria um banco de teste separado (como o `manage.py test`; o
+db.sqlite3 do projeto não é tocado), preenche com dados sintéticos
+(`fake_data.py`) e executa cenários roteirizados com o cliente de teste do
+Django, passando por toda a pilha de middlewares, views e templates:
+
+- browse: páginas da lista de livros e detalhe de livros;
+- search: busca livre, filtros, busca avançada e sugestões;
+- borrow: emprestar e devolver (POST);
+- export: exportação CSV da lista e XLSX de relatório (staff);
+- api: as mesmas leituras da lista/detalhe pela API JSON (`api.py`), para
+  comparar com as páginas HTML do cenário browse.
+
+Para cada passo mostramos p50/p95/p99 da latência (ms) e a média/máximo de
+consultas SQL por request. Com a mesma `--seed` os dados e a sequência de
+requests são os mesmos, então dois relatórios JSON podem ser comparados
+antes/depois de uma mudança.
+"""
+
+import json
+import math
+import platform
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from catalog.fake_data import LANGUAGES, WORDS, generate_library
+from catalog.models import Book, Category, Loan
+
+# Caches em memória durante o benchmark: não misturamos as versões/entradas
+# do banco de teste com o cache compartilhado (arquivo) do ambiente local.
+BENCHMARK_CACHES = {
+	"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "bench-local"},
+	"shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "bench-shared"},
+	"versions": {
+		"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "bench-versions",
+		"OPTIONS": {"MAX_ENTRIES": 10 ** 9},
+	},
+}
+
+
+def percentile(values, pct):
+	"""Percentil pelo método do posto mais próximo (nearest-rank)."""
+	if not values:
+		return 0.0
+	ordered = sorted(values)
+	rank = max(1, math.ceil(pct / 100 * len(ordered)))
+	return ordered[rank - 1]
+
+
+class Context:
+	"""Estado compartilhado pelos passos: clientes logados, ids e gerador aleatório."""
+
+	def __init__(self, rng, reader, reader_user, staff):
+		self.rng = rng
+		self.reader = reader
+		self.reader_user = reader_user
+		self.staff = staff
+		self.book_ids = list(Book.objects.values_list("id", flat=True))
+		self.category_ids = list(Category.objects.values_list("id", flat=True))
+		self.pages = max(1, len(self.book_ids) // 20)
+
+
+# Cada passo recebe o Context e devolve (cliente, método, url, dados)
+def _browse_list(ctx):
+	return ctx.reader, "get", reverse("catalog:book_list") + f"?page={ctx.rng.randint(1, ctx.pages)}", None
+
+
+def _browse_detail(ctx):
+	return ctx.reader, "get", reverse("catalog:book_detail", args=[ctx.rng.choice(ctx.book_ids)]), None
+
+
+def _search_text(ctx):
+	return ctx.reader, "get", reverse("catalog:book_list") + f"?q={ctx.rng.choice(WORDS)}", None
+
+
+def _search_filters(ctx):
+	query = (
+		f"?categoria={ctx.rng.choice(ctx.category_ids)}&idioma={ctx.rng.choice(LANGUAGES)}"
+		f"&disponivel=1&ordenar=disponibilidade"
+	)
+	return ctx.reader, "get", reverse("catalog:book_list") + query, None
+
+
+def _search_advanced(ctx):
+	return ctx.reader, "get", reverse("catalog:advanced_search"), None
+
+
+def _search_suggest(ctx):
+	prefix = ctx.rng.choice(WORDS)[:3]
+	return ctx.reader, "get", reverse("catalog:book_list") + f"?suggest=1&q={prefix}", None
+
+
+def _borrow(ctx):
+	return ctx.reader, "post", reverse("catalog:borrow_book", args=[ctx.rng.choice(ctx.book_ids)]), {}
+
+
+def _return(ctx):
+	loan_id = (
+		Loan.objects.filter(user=ctx.reader_user, returned_at__isnull=True)
+		.order_by("-id").values_list("id", flat=True).first()
+	)
+	if loan_id is None:
+		return None
+	return ctx.reader, "post", reverse("catalog:return_book", args=[loan_id]), {}
+
+
+def _export_csv(ctx):
+	return ctx.reader, "get", reverse("catalog:book_list") + f"?export=csv&idioma={ctx.rng.choice(LANGUAGES)}", None
+
+
+def _export_report(ctx):
+	return ctx.staff, "get", reverse("catalog:report_export") + "?type=popular_books&format=xlsx", None
+
+
+def _api_list(ctx):
+	return ctx.reader, "get", reverse("catalog:api_books") + f"?page={ctx.rng.randint(1, ctx.pages)}", None
+
+
+def _api_detail(ctx):
+	return ctx.reader, "get", reverse("catalog:api_book_detail", args=[ctx.rng.choice(ctx.book_ids)]), None
+
+
+SCENARIOS = {
+	"browse": [("book_list", _browse_list), ("book_detail", _browse_detail)],
+	"search": [
+		("search_text", _search_text),
+		("search_filters", _search_filters),
+		("advanced_search", _search_advanced),
+		("suggest", _search_suggest),
+	],
+	"borrow": [("borrow", _borrow), ("return", _return)],
+	"export": [("export_csv", _export_csv), ("report_xlsx", _export_report)],
+	"api": [("api_books", _api_list), ("api_book_detail", _api_detail)],
+}
+
+
+class Command(BaseCommand):
+	help = "Mede latência (p50/p95/p99) e consultas por request nos principais fluxos do catálogo."
+
+	def add_arguments(self, parser):
+		parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Cenários separados por vírgula.")
+		parser.add_argument("--iterations", type=int, default=30, help="Execuções medidas de cada passo.")
+		parser.add_argument("--warmup", type=int, default=3, help="Execuções descartadas antes de medir.")
+		parser.add_argument("--books", type=int, default=2000)
+		parser.add_argument("--users", type=int, default=200)
+		parser.add_argument("--loans", type=int, default=5000)
+		parser.add_argument("--reviews", type=int, default=2000)
+		parser.add_argument("--searches", type=int, default=2000)
+		parser.add_argument("--seed", type=int, default=42)
+		parser.add_argument("--output", help="Grava o relatório completo em JSON neste arquivo.")
+
+	def handle(self, *args, **options):
+		names = [s.strip() for s in options["scenarios"].split(",") if s.strip()]
+		unknown = [s for s in names if s not in SCENARIOS]
+		if unknown:
+			raise CommandError(f"Cenários desconhecidos: {', '.join(unknown)}")
+
+		setup_test_environment()
+		old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+		try:
+			with override_settings(CACHES=BENCHMARK_CACHES, QUERY_PROFILING={"ENABLED": False}):
+				report = self._run(names, options)
+		finally:
+			connection.creation.destroy_test_db(old_name, verbosity=0)
+			teardown_test_environment()
+
+		self._print(report)
+		if options["output"]:
+			with open(options["output"], "w", encoding="utf-8") as fh:
+				json.dump(report, fh, ensure_ascii=False, indent=2)
+			self.stdout.write(f"Relatório gravado em {options['output']}")
+
+	def _run(self, names, options):
+		start = time.perf_counter()
+		counts = generate_library(
+			books=options["books"],
+			users=options["users"],
+			loans=options["loans"],
+			reviews=options["reviews"],
+			searches=options["searches"],
+			seed=options["seed"],
+		)
+		self.stdout.write(
+			"Dados gerados em {:.1f}s: {}".format(
+				time.perf_counter() - start, ", ".join(f"{k}={v}" for k, v in counts.items())
+			)
+		)
+
+		User = get_user_model()
+		reader_user = User.objects.create_user("bench_leitor", password="x")
+		staff_user = User.objects.create_user("bench_staff", password="x", is_staff=True)
+		reader, staff = Client(), Client()
+		reader.force_login(reader_user)
+		staff.force_login(staff_user)
+
+		ctx = Context(random.Random(options["seed"]), reader, reader_user, staff)
+		steps = []
+		for name in names:
+			for label, step in SCENARIOS[name]:
+				steps.append(self._measure(name, label, step, ctx, options))
+
+		return {
+			"config": {
+				key: options[key]
+				for key in ("scenarios", "iterations", "warmup", "books", "users", "loans", "reviews", "searches", "seed")
+			},
+			"environment": {
+				"python": platform.python_version(),
+				"database": connection.vendor,
+				"sqlite_profile": getattr(settings, "SQLITE_PROFILE", None),
+			},
+			"data": counts,
+			"steps": steps,
+		}
+
+	def _measure(self, scenario, label, step, ctx, options):
+		latencies, queries, errors = [], [], 0
+		for i in range(options["warmup"] + options["iterations"]):
+			request = step(ctx)
+			if request is None:
+				continue
+			client, method, url, data = request
+			with CaptureQueriesContext(connection) as captured:
+				started = time.perf_counter()
+				response = getattr(client, method)(url, data) if data is not None else getattr(client, method)(url)
+				elapsed = (time.perf_counter() - started) * 1000
+			if i < options["warmup"]:
+				continue
+			latencies.append(elapsed)
+			queries.append(len(captured))
+			if response.status_code >= 400:
+				errors += 1
+		return {
+			"scenario": scenario,
+			"step": label,
+			"requests": len(latencies),
+			"errors": errors,
+			"p50_ms": percentile(latencies, 50),
+			"p95_ms": percentile(latencies, 95),
+			"p99_ms": percentile(latencies, 99),
+			"mean_ms": sum(latencies) / len(latencies) if latencies else 0.0,
+			"mean_queries": sum(queries) / len(queries) if queries else 0.0,
+			"max_queries": max(queries, default=0),
+		}
+
+	def _print(self, report):
+		header = f"{'cenário':<8} {'passo':<16} {'n':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'cons./req':>10} {'máx':>5} {'erros':>6}"
+		self.stdout.write(header)
+		for s in report["steps"]:
+			self.stdout.write(
+				f"{s['scenario']:<8} {s['step']:<16} {s['requests']:>5} {s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} "
+				f"{s['p99_ms']:>8.1f} {s['mean_queries']:>10.1f} {s['max_queries']:>5} {s['errors']:>6}"
+			)
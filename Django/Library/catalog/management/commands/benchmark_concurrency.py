@@ -0,0 +1,300 @@
+"""Benchmark de vazão WSGI x ASGI com muitos clientes simultâneos (e lentos).
+
+Uso:
+	python manage.py benchmark_concurrency
+	python manage.py benchmark_concurrency --clients 100 --requests 2000 --client-delay 100 --threads 8
+	python manage.py benchmark_concurrency --modes asgi --output asgi.json
+
+Como no `benchmark_catalog`, um banco de teste separado é criado e
+preenchido com dados sintéticos. Os dois modos atendem a mesma sequência de
+leituras (páginas da lista e detalhes de livros), dentro do processo, sem
+rede:
+
+- wsgi: o `WSGIHandler` do Django com as views síncronas, atrás de um pool
+  de `--threads` threads (como `gunicorn --threads N`, um worker);
+- asgi: o `ASGIHandler` com as views de `async_views.py`, num único event
+  loop (como `uvicorn library.asgi:application`, um worker).
+
+`--clients` clientes ficam enviando requests em sequência (carga em laço
+fechado). `--client-delay` simula um cliente lento (rede móvel) que leva
+esse tempo para receber a resposta: no WSGI a thread do worker fica presa
+esperando; no ASGI o event loop atende outros requests enquanto isso.
+
+Para servidores reais, rode `gunicorn library.wsgi` e
+`uvicorn library.asgi:application` e use um gerador de carga externo
+(wrk, hey, locust) contra /catalog/books/… e /catalog/async/books/….
+"""
+
+import asyncio
+import io
+import json
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from catalog.fake_data import generate_library
+from catalog.management.commands.benchmark_catalog import BENCHMARK_CACHES, percentile
+from catalog.models import Book
+
+MODES = ("wsgi", "asgi")
+
+# Rota de cada tipo de leitura em cada modo
+ROUTES = {
+	"wsgi": {"list": "catalog:book_list", "detail": "catalog:book_detail"},
+	"asgi": {"list": "catalog:async_book_list", "detail": "catalog:async_book_detail"},
+}
+
+
+def _split(url):
+	path, _, query = url.partition("?")
+	return path, query
+
+
+class Command(BaseCommand):
+	help = "Compara vazão e latência de WSGI (threads) e ASGI (event loop) com clientes simultâneos."
+
+	def add_arguments(self, parser):
+		parser.add_argument("--modes", default=",".join(MODES), help="Modos separados por vírgula (wsgi, asgi).")
+		parser.add_argument("--clients", type=int, default=50, help="Clientes simultâneos.")
+		parser.add_argument("--requests", type=int, default=500, help="Requests medidos por modo.")
+		parser.add_argument("--warmup", type=int, default=20, help="Requests descartados antes de medir.")
+		parser.add_argument("--threads", type=int, default=4, help="Threads do worker WSGI.")
+		parser.add_argument(
+			"--client-delay", type=float, default=200.0, help="Tempo (ms) que cada cliente leva para receber a resposta."
+		)
+		parser.add_argument("--books", type=int, default=2000)
+		parser.add_argument("--users", type=int, default=200)
+		parser.add_argument("--loans", type=int, default=5000)
+		parser.add_argument("--reviews", type=int, default=2000)
+		parser.add_argument("--seed", type=int, default=42)
+		parser.add_argument("--output", help="Grava o relatório completo em JSON neste arquivo.")
+
+	def handle(self, *args, **options):
+		modes = [m.strip() for m in options["modes"].split(",") if m.strip()]
+		unknown = [m for m in modes if m not in MODES]
+		if unknown:
+			raise CommandError(f"Modos desconhecidos: {', '.join(unknown)}")
+		for name in ("clients", "requests", "threads"):
+			if options[name] < 1:
+				raise CommandError(f"--{name} deve ser positivo.")
+
+		setup_test_environment()
+		old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+		try:
+			with override_settings(CACHES=BENCHMARK_CACHES, QUERY_PROFILING={"ENABLED": False}):
+				report = self._run(modes, options)
+		finally:
+			connection.creation.destroy_test_db(old_name, verbosity=0)
+			teardown_test_environment()
+
+		self._print(report)
+		if options["output"]:
+			with open(options["output"], "w", encoding="utf-8") as fh:
+				json.dump(report, fh, ensure_ascii=False, indent=2)
+			self.stdout.write(f"Relatório gravado em {options['output']}")
+
+	def _run(self, modes, options):
+		counts = generate_library(
+			books=options["books"],
+			users=options["users"],
+			loans=options["loans"],
+			reviews=options["reviews"],
+			searches=0,
+			seed=options["seed"],
+		)
+		user = get_user_model().objects.create_user("bench_concorrencia", password="x")
+		client = Client()
+		client.force_login(user)
+		cookie = "; ".join(f"{morsel.key}={morsel.value}" for morsel in client.cookies.values())
+
+		# A mesma sequência de leituras para os dois modos
+		rng = random.Random(options["seed"])
+		book_ids = list(Book.objects.values_list("id", flat=True))
+		pages = max(1, len(book_ids) // 20)
+		plan = [
+			("list", rng.randint(1, pages)) if rng.random() < 0.5 else ("detail", rng.choice(book_ids))
+			for _ in range(options["warmup"] + options["requests"])
+		]
+
+		results = []
+		for mode in modes:
+			urls = [self._url(mode, kind, value) for kind, value in plan]
+			runner = self._run_wsgi if mode == "wsgi" else self._run_asgi
+			# Aquecimento sequencial (caches, conexões), fora da medição
+			runner(urls[:options["warmup"]], cookie, {**options, "clients": 1})
+			results.append({"mode": mode, **runner(urls[options["warmup"]:], cookie, options)})
+
+		return {
+			"config": {
+				key: options[key]
+				for key in ("modes", "clients", "requests", "warmup", "threads", "client_delay", "books", "seed")
+			},
+			"data": counts,
+			"results": results,
+		}
+
+	def _url(self, mode, kind, value):
+		if kind == "list":
+			return reverse(ROUTES[mode]["list"]) + f"?page={value}"
+		return reverse(ROUTES[mode]["detail"], args=[value])
+
+	def _summary(self, latencies, statuses, elapsed):
+		errors = sum(1 for status in statuses if status >= 400)
+		return {
+			"requests": len(latencies),
+			"errors": errors,
+			"seconds": elapsed,
+			"requests_per_second": len(latencies) / elapsed if elapsed else 0.0,
+			"p50_ms": percentile(latencies, 50),
+			"p95_ms": percentile(latencies, 95),
+			"p99_ms": percentile(latencies, 99),
+		}
+
+	# WSGI: pool de threads; o cliente lento prende a thread até receber tudo
+	def _run_wsgi(self, urls, cookie, options):
+		handler = WSGIHandler()
+		delay = options["client_delay"] / 1000
+
+		def serve(url):
+			path, query = _split(url)
+			environ = {
+				"REQUEST_METHOD": "GET",
+				"PATH_INFO": path,
+				"QUERY_STRING": query,
+				"SCRIPT_NAME": "",
+				"SERVER_NAME": "testserver",
+				"SERVER_PORT": "80",
+				"SERVER_PROTOCOL": "HTTP/1.1",
+				"HTTP_HOST": "testserver",
+				"HTTP_COOKIE": cookie,
+				"REMOTE_ADDR": "127.0.0.1",
+				"wsgi.input": io.BytesIO(),
+				"wsgi.errors": io.StringIO(),
+				"wsgi.url_scheme": "http",
+				"wsgi.version": (1, 0),
+				"wsgi.multithread": True,
+				"wsgi.multiprocess": False,
+				"wsgi.run_once": False,
+			}
+			status = {}
+
+			def start_response(line, headers, exc_info=None):
+				status["code"] = int(line.split()[0])
+
+			body = handler(environ, start_response)
+			try:
+				for _chunk in body:
+					pass
+				time.sleep(delay)
+			finally:
+				body.close()
+			return status["code"]
+
+		pending = queue.SimpleQueue()
+		for url in urls:
+			pending.put(url)
+		latencies, statuses = [], []
+
+		with ThreadPoolExecutor(max_workers=options["threads"]) as pool:
+			def client():
+				while True:
+					try:
+						url = pending.get_nowait()
+					except queue.Empty:
+						return
+					started = time.perf_counter()
+					statuses.append(pool.submit(serve, url).result())
+					latencies.append((time.perf_counter() - started) * 1000)
+
+			started = time.perf_counter()
+			clients = [threading.Thread(target=client) for _ in range(options["clients"])]
+			for thread in clients:
+				thread.start()
+			for thread in clients:
+				thread.join()
+			elapsed = time.perf_counter() - started
+		return self._summary(latencies, statuses, elapsed)
+
+	# ASGI: um event loop; o cliente lento só suspende a corrotina do request
+	def _run_asgi(self, urls, cookie, options):
+		return asyncio.run(self._run_asgi_async(urls, cookie, options))
+
+	async def _run_asgi_async(self, urls, cookie, options):
+		app = ASGIHandler()
+		delay = options["client_delay"] / 1000
+		pending = list(reversed(urls))
+		latencies, statuses = [], []
+
+		async def serve(url):
+			path, query = _split(url)
+			scope = {
+				"type": "http",
+				"asgi": {"version": "3.0"},
+				"http_version": "1.1",
+				"method": "GET",
+				"scheme": "http",
+				"path": path,
+				"raw_path": path.encode(),
+				"query_string": query.encode(),
+				"root_path": "",
+				"headers": [(b"host", b"testserver"), (b"cookie", cookie.encode())],
+				"client": ("127.0.0.1", 50000),
+				"server": ("testserver", 80),
+			}
+			request_sent = False
+			finished = asyncio.Event()
+			status = {}
+
+			async def receive():
+				nonlocal request_sent
+				if not request_sent:
+					request_sent = True
+					return {"type": "http.request", "body": b"", "more_body": False}
+				# O handler espera um possível "disconnect" até a resposta terminar
+				await finished.wait()
+				return {"type": "http.disconnect"}
+
+			async def send(message):
+				if message["type"] == "http.response.start":
+					status["code"] = message["status"]
+				elif message["type"] == "http.response.body" and not message.get("more_body"):
+					await asyncio.sleep(delay)
+					finished.set()
+
+			await app(scope, receive, send)
+			return status["code"]
+
+		async def client():
+			while pending:
+				url = pending.pop()
+				started = time.perf_counter()
+				statuses.append(await serve(url))
+				latencies.append((time.perf_counter() - started) * 1000)
+
+		started = time.perf_counter()
+		await asyncio.gather(*(client() for _ in range(options["clients"])))
+		return self._summary(latencies, statuses, time.perf_counter() - started)
+
+	def _print(self, report):
+		config = report["config"]
+		self.stdout.write(
+			f"{config['clients']} clientes, atraso do cliente {config['client_delay']:.0f} ms, "
+			f"{config['threads']} threads no WSGI"
+		)
+		self.stdout.write(f"{'modo':<6} {'n':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'erros':>6}")
+		for r in report["results"]:
+			self.stdout.write(
+				f"{r['mode']:<6} {r['requests']:>6} {r['requests_per_second']:>9.1f} {r['p50_ms']:>9.1f} "
+				f"{r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['errors']:>6}"
+			)
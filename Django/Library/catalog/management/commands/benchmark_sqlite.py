@@ -0,0 +1,140 @@
+"""Benchmark de concorrência do SQLite: compara perfis de PRAGMA (library/sqlite.py).
+
+Uso:
+	python manage.py benchmark_sqlite
+	python manage.py benchmark_sqlite --profiles legacy,production --threads 16 --seconds 10
+
+Cada perfil roda em um banco temporário próprio (o db.sqlite3 do projeto não é
+tocado). Várias threads, cada uma com sua conexão, executam uma mistura de
+leituras (consulta de livro + contagem de empréstimos ativos) e escritas
+(novo empréstimo / devolução), imitando o tráfego do catálogo. Ao final
+mostramos operações por segundo e quantas falharam com "database is locked".
+"""
+
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library.sqlite import SQLITE_PROFILES, pragma_statements, sqlite_options
+
+SCHEMA = """
+CREATE TABLE book (id INTEGER PRIMARY KEY, title TEXT NOT NULL, copies_total INTEGER NOT NULL);
+CREATE TABLE loan (
+	id INTEGER PRIMARY KEY,
+	book_id INTEGER NOT NULL REFERENCES book(id),
+	user_id INTEGER NOT NULL,
+	returned INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX loan_book_returned ON loan (book_id, returned);
+"""
+
+
+class Command(BaseCommand):
+	help = "Mede a vazão de leituras/escritas concorrentes no SQLite para cada perfil de PRAGMA."
+
+	def add_arguments(self, parser):
+		parser.add_argument("--profiles", default="legacy,production", help="Perfis separados por vírgula.")
+		parser.add_argument("--threads", type=int, default=8)
+		parser.add_argument("--seconds", type=float, default=5.0)
+		parser.add_argument("--write-ratio", type=float, default=0.2, help="Fração de operações de escrita (0–1).")
+		parser.add_argument("--books", type=int, default=5000)
+		parser.add_argument("--seed", type=int, default=42)
+
+	def handle(self, *args, **options):
+		profiles = [p.strip() for p in options["profiles"].split(",") if p.strip()]
+		unknown = [p for p in profiles if p not in SQLITE_PROFILES]
+		if unknown:
+			raise CommandError(f"Perfis desconhecidos: {', '.join(unknown)}")
+
+		self.stdout.write(
+			f"{options['threads']} threads, {options['seconds']}s por perfil, "
+			f"{options['write_ratio']:.0%} escritas, {options['books']} livros"
+		)
+		results = []
+		with tempfile.TemporaryDirectory() as tmp:
+			for profile in profiles:
+				path = Path(tmp) / f"{profile}.sqlite3"
+				self._create_database(path, options["books"])
+				results.append((profile, self._run(path, profile, options)))
+
+		self.stdout.write(f"{'perfil':<12} {'ops/s':>10} {'leituras':>10} {'escritas':>10} {'travadas':>10}")
+		for profile, r in results:
+			self.stdout.write(
+				f"{profile:<12} {r['ops'] / r['elapsed']:>10.0f} {r['reads']:>10} {r['writes']:>10} {r['locked']:>10}"
+			)
+		if len(results) > 1 and results[0][1]["ops"]:
+			base = results[0][1]["ops"] / results[0][1]["elapsed"]
+			for profile, r in results[1:]:
+				self.stdout.write(f"{profile}: {r['ops'] / r['elapsed'] / base:.2f}x a vazão de {results[0][0]}")
+
+	def _create_database(self, path, books):
+		conn = sqlite3.connect(path)
+		conn.executescript(SCHEMA)
+		conn.executemany(
+			"INSERT INTO book (id, title, copies_total) VALUES (?, ?, ?)",
+			((i, f"Livro {i}", 1 + i % 3) for i in range(1, books + 1)),
+		)
+		conn.commit()
+		conn.close()
+
+	def _connect(self, path, profile):
+		options = sqlite_options(profile)
+		# isolation_level=None: controlamos BEGIN/COMMIT manualmente, como o Django faz em atomic()
+		conn = sqlite3.connect(path, timeout=options.get("timeout", 5.0), isolation_level=None, check_same_thread=False)
+		for statement in pragma_statements(SQLITE_PROFILES[profile]):
+			conn.execute(statement)
+		return conn, options.get("transaction_mode", "DEFERRED")
+
+	def _run(self, path, profile, options):
+		totals = {"reads": 0, "writes": 0, "locked": 0}
+		lock = threading.Lock()
+		deadline = time.monotonic() + options["seconds"]
+
+		def worker(seed):
+			rng = random.Random(seed)
+			conn, begin_mode = self._connect(path, profile)
+			counts = {"reads": 0, "writes": 0, "locked": 0}
+			while time.monotonic() < deadline:
+				book_id = rng.randint(1, options["books"])
+				try:
+					if rng.random() < options["write_ratio"]:
+						conn.execute(f"BEGIN {begin_mode}")
+						active = conn.execute(
+							"SELECT COUNT(*) FROM loan WHERE book_id = ? AND returned = 0", (book_id,)
+						).fetchone()[0]
+						if active:
+							conn.execute("UPDATE loan SET returned = 1 WHERE book_id = ? AND returned = 0", (book_id,))
+						else:
+							conn.execute("INSERT INTO loan (book_id, user_id) VALUES (?, ?)", (book_id, rng.randint(1, 500)))
+						conn.execute("COMMIT")
+						counts["writes"] += 1
+					else:
+						conn.execute("SELECT title, copies_total FROM book WHERE id = ?", (book_id,)).fetchone()
+						conn.execute(
+							"SELECT COUNT(*) FROM loan WHERE book_id = ? AND returned = 0", (book_id,)
+						).fetchone()
+						counts["reads"] += 1
+				except sqlite3.OperationalError:
+					# "database is locked": conta como falha e desfaz a transação aberta
+					counts["locked"] += 1
+					if conn.in_transaction:
+						conn.execute("ROLLBACK")
+			conn.close()
+			with lock:
+				for key, value in counts.items():
+					totals[key] += value
+
+		start = time.monotonic()
+		threads = [threading.Thread(target=worker, args=(options["seed"] + i,)) for i in range(options["threads"])]
+		for t in threads:
+			t.start()
+		for t in threads:
+			t.join()
+		totals["elapsed"] = time.monotonic() - start
+		totals["ops"] = totals["reads"] + totals["writes"]
+		return totals
@@ -0,0 +1,65 @@
+"""Recalcula as recomendações (tabela de livros vizinhos).
+
+Uso:
+	python manage.py compute_recommendations                    # agendar à noite
+	python manage.py compute_recommendations --full             # refaz tudo
+	python manage.py compute_recommendations --kinds content --only-new   # após cadastrar livros
+	python manage.py compute_recommendations --top-k 20
+
+Tipos (`--kinds`, padrão os dois):
+- loans: "quem pegou este também pegou". Sem `--full`, só os livros afetados
+  por empréstimos feitos desde o início da última execução (registrada em
+  `RecommendationRun`, mesmo sem nada gravado) são recalculados; na primeira
+  execução tudo é calculado;
+- content: "livros parecidos" (TF-IDF dos metadados). Recalcula o acervo
+  inteiro, ou só os livros novos com `--only-new`.
+
+Com NumPy e SciPy instalados o cálculo usa matrizes esparsas; sem eles,
+contadores em Python (ver `catalog/recommendations.py`).
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from catalog.models import BookNeighbor
+from catalog.recommendations import DEFAULT_TOP_K, compute_content_neighbors, compute_loan_neighbors, last_computed
+
+KINDS = (BookNeighbor.KIND_LOANS, BookNeighbor.KIND_CONTENT)
+
+
+class Command(BaseCommand):
+	help = "Recalcula a tabela de livros vizinhos (empréstimos em comum e metadados parecidos)."
+
+	def add_arguments(self, parser):
+		parser.add_argument("--kinds", default=",".join(KINDS), help="Tipos separados por vírgula (loans, content).")
+		parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K, help="Vizinhos guardados por livro.")
+		parser.add_argument("--full", action="store_true", help="Empréstimos: recalcula todos os livros, não só os afetados.")
+		parser.add_argument("--only-new", action="store_true", help="Conteúdo: só os livros ainda sem vizinhos.")
+
+	def handle(self, *args, **options):
+		kinds = [k.strip() for k in options["kinds"].split(",") if k.strip()]
+		unknown = [k for k in kinds if k not in KINDS]
+		if unknown:
+			raise CommandError(f"Tipos desconhecidos: {', '.join(unknown)}")
+		if options["top_k"] < 1:
+			raise CommandError("--top-k deve ser positivo.")
+		if options["full"] and options["only_new"]:
+			raise CommandError("Use --full ou --only-new, não os dois.")
+
+		for kind in kinds:
+			started = time.perf_counter()
+			if kind == BookNeighbor.KIND_LOANS:
+				since = None if options["full"] else last_computed(kind)
+				summary = compute_loan_neighbors(top_k=options["top_k"], since=since)
+				scope = "todos os livros" if since is None else (
+					f"livros afetados desde {timezone.localtime(since):%d/%m/%Y %H:%M}"
+				)
+			else:
+				summary = compute_content_neighbors(top_k=options["top_k"], only_new=options["only_new"])
+				scope = "livros novos e seus vizinhos" if options["only_new"] else "todos os livros"
+			self.stdout.write(
+				f"{kind}: {summary['books']} livro(s) recalculado(s) ({scope}), {summary['neighbors']} vizinho(s) "
+				f"gravado(s) com o motor {summary['engine']} em {time.perf_counter() - started:.1f}s."
+			)
@@ -0,0 +1,27 @@
+"""Expira reservas separadas e não retiradas e passa as cópias adiante na fila.
+
+Uso:
+	python manage.py expire_holds
+	python manage.py expire_holds --batch-size 500
+
+Agendar periodicamente (ex.: a cada hora). Reservas com status "ready" e
+prazo (`expires_at`) vencido viram "expired" em lotes, e cada livro afetado
+tem a cópia separada para o próximo usuário da fila (catalog/circulation.py).
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.circulation import expire_holds
+
+
+class Command(BaseCommand):
+	help = "Expira reservas não retiradas no prazo e promove o próximo da fila."
+
+	def add_arguments(self, parser):
+		parser.add_argument("--batch-size", type=int, default=1000, help="Reservas expiradas por lote.")
+
+	def handle(self, *args, **options):
+		if options["batch_size"] < 1:
+			raise CommandError("--batch-size deve ser positivo.")
+		stats = expire_holds(batch_size=options["batch_size"])
+		self.stdout.write(f"{stats['expired']} reserva(s) expirada(s), {stats['promoted']} promovida(s) na fila.")
@@ -0,0 +1,86 @@
+"""Gera um acervo sintético grande para testar desempenho em escala de produção.
+
+Uso:
+	python manage.py generate_fake_library
+	python manage.py generate_fake_library --books 200000 --loans 3000000 --seed 7
+	python manage.py generate_fake_library --popularity 0 --active-ratio 0.2   # uniforme, mais livros emprestados
+
+Os dados são gravados no banco configurado (db.sqlite3 por padrão), com
+`bulk_create` em lotes — milhões de linhas levam alguns minutos, não horas.
+A mesma `--seed` gera exatamente os mesmos dados; seeds diferentes usam
+ISBNs e usuários diferentes, então podem ser somadas no mesmo banco.
+
+Distribuições (ver catalog/fake_data.py): popularidade Zipf de livros e
+termos de busca, categorias desbalanceadas e uma fração de empréstimos em
+aberto/atrasados respeitando as cópias de cada livro.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from catalog.fake_data import generate_library
+from catalog.versioning import bump_catalog_version, bump_facets_version
+
+
+class Command(BaseCommand):
+	help = "Cria livros, usuários, empréstimos, avaliações e buscas sintéticos (determinístico pela seed)."
+
+	def add_arguments(self, parser):
+		parser.add_argument("--books", type=int, default=100_000)
+		parser.add_argument("--users", type=int, default=10_000)
+		parser.add_argument("--loans", type=int, default=1_000_000)
+		parser.add_argument("--reviews", type=int, default=200_000)
+		parser.add_argument("--searches", type=int, default=500_000)
+		parser.add_argument("--seed", type=int, default=1)
+		parser.add_argument("--batch-size", type=int, default=5000, help="Linhas por bulk_create.")
+		parser.add_argument(
+			"--popularity", type=float, default=1.1, help="Expoente Zipf da popularidade dos livros (0 = uniforme)."
+		)
+		parser.add_argument("--category-skew", type=float, default=1.0, help="Expoente Zipf das categorias.")
+		parser.add_argument("--active-ratio", type=float, default=0.05, help="Fração de empréstimos em aberto.")
+		parser.add_argument("--overdue-ratio", type=float, default=0.3, help="Fração dos em aberto que está atrasada.")
+
+	def handle(self, *args, **options):
+		for name in ("active_ratio", "overdue_ratio"):
+			if not 0 <= options[name] <= 1:
+				raise CommandError(f"--{name.replace('_', '-')} deve estar entre 0 e 1.")
+		if options["batch_size"] < 1:
+			raise CommandError("--batch-size deve ser positivo.")
+
+		self.stdout.write(f"Gerando dados em '{connection.settings_dict['NAME']}' (seed {options['seed']})...")
+		start = time.perf_counter()
+		last = {"stage": None, "at": 0.0}
+
+		def progress(stage, created):
+			# No máximo uma linha a cada 2 s por etapa, para não inundar o terminal
+			now = time.perf_counter()
+			if stage != last["stage"] or now - last["at"] >= 2:
+				self.stdout.write(f"  {stage}: {created:,} ({now - start:.0f}s)")
+				last.update(stage=stage, at=now)
+
+		counts = generate_library(
+			books=options["books"],
+			users=options["users"],
+			loans=options["loans"],
+			reviews=options["reviews"],
+			searches=options["searches"],
+			seed=options["seed"],
+			batch_size=options["batch_size"],
+			popularity=options["popularity"],
+			category_skew=options["category_skew"],
+			active_ratio=options["active_ratio"],
+			overdue_ratio=options["overdue_ratio"],
+			progress=progress,
+		)
+		# bulk_create não dispara os signals: invalidamos os caches do catálogo aqui
+		bump_catalog_version()
+		bump_facets_version()
+
+		elapsed = time.perf_counter() - start
+		total = sum(counts.values())
+		self.stdout.write(self.style.SUCCESS(
+			f"{total:,} linhas em {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f}/s): "
+			+ ", ".join(f"{name}={value:,}" for name, value in counts.items())
+		))
@@ -0,0 +1,49 @@
+"""Renovação em massa de empréstimos (ex.: fim de semestre).
+
+Uso:
+	python manage.py renew_loans --due-before 2026-12-20
+	python manage.py renew_loans --due-before 2026-12-20 --user maria --dry-run
+
+Renova os empréstimos em aberto que vencem até `--due-before` (inclusive),
+respeitando o limite `LOAN_MAX_RENEWALS` e pulando livros com fila de
+reservas. Roda como poucos UPDATEs (um por data de devolução distinta), ver
+`catalog/circulation.py`. `--dry-run` só mostra quantos seriam renovados.
+"""
+
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.circulation import renew_loans
+from catalog.models import Loan
+
+
+class Command(BaseCommand):
+	help = "Renova em lote os empréstimos em aberto que vencem até uma data."
+
+	def add_arguments(self, parser):
+		parser.add_argument("--due-before", required=True, help="Data limite de vencimento (AAAA-MM-DD), inclusive.")
+		parser.add_argument("--user", help="Só os empréstimos deste usuário (login).")
+		parser.add_argument("--dry-run", action="store_true", help="Não altera nada; só conta.")
+
+	def handle(self, *args, **options):
+		try:
+			due_before = date.fromisoformat(options["due_before"])
+		except ValueError:
+			raise CommandError("--due-before deve estar no formato AAAA-MM-DD.")
+		loans = Loan.objects.filter(due_date__lte=due_before)
+		if options["user"]:
+			user = get_user_model().objects.filter(username=options["user"]).first()
+			if user is None:
+				raise CommandError(f"Usuário '{options['user']}' não encontrado.")
+			loans = loans.filter(user=user)
+
+		summary = renew_loans(loans, dry_run=options["dry_run"])
+		done = f"{summary['renewable']} renovável(is)" if options["dry_run"] else (
+			f"{summary['renewed']} renovado(s) em {summary['updates']} UPDATE(s)"
+		)
+		self.stdout.write(
+			f"{summary['open']} em aberto: {done}; {summary['at_limit']} no limite de renovações, "
+			f"{summary['blocked_by_holds']} com fila de reservas."
+		)
@@ -0,0 +1,55 @@
+"""Envia lembretes de devolução para empréstimos que vencem nos próximos dias.
+
+Uso:
+	python manage.py send_due_reminders
+	python manage.py send_due_reminders --days 5 --dry-run
+	python manage.py send_due_reminders --date 2025-12-01
+
+Agendar uma vez por dia. Os empréstimos são separados por dia de devolução
+(uma consulta indexada por dia) e todos os e-mails saem por uma única
+conexão com o servidor (EMAIL_BACKEND). Cada empréstimo recebe um lembrete
+por data de devolução, então repetir a execução não duplica e-mails.
+Ao final é exibido um relatório por dia e a vazão (e-mails por segundo).
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.notifications import send_due_reminders
+
+
+class Command(BaseCommand):
+	help = "Lembra os usuários dos empréstimos que vencem nos próximos N dias."
+
+	def add_arguments(self, parser):
+		parser.add_argument("--days", type=int, default=3, help="Quantos dias à frente lembrar (padrão: 3).")
+		parser.add_argument("--chunk-size", type=int, default=500, help="Usuários por lote de e-mails.")
+		parser.add_argument("--dry-run", action="store_true", help="Só mostra o que seria enviado.")
+		parser.add_argument("--date", help="Data de referência (AAAA-MM-DD); padrão: hoje.")
+
+	def handle(self, *args, **options):
+		if options["days"] < 1 or options["chunk_size"] < 1:
+			raise CommandError("--days e --chunk-size devem ser positivos.")
+		today = None
+		if options["date"]:
+			try:
+				today = date.fromisoformat(options["date"])
+			except ValueError:
+				raise CommandError("--date deve estar no formato AAAA-MM-DD.")
+
+		report = send_due_reminders(
+			days=options["days"], today=today, chunk_size=options["chunk_size"], dry_run=options["dry_run"]
+		)
+		prefix = "[dry-run] " if options["dry_run"] else ""
+		self.stdout.write(f"{'vence em':<12} {'dias':>4} {'usuários':>9} {'e-mails':>8} {'empréstimos':>12} {'s':>7}")
+		for bucket in report["buckets"]:
+			self.stdout.write(
+				f"{bucket['due_date']:%d/%m/%Y}   {bucket['days_left']:>4} {bucket['users']:>9} "
+				f"{bucket['emails']:>8} {bucket['loans']:>12} {bucket['seconds']:>7.2f}"
+			)
+		self.stdout.write(
+			f"{prefix}Total: {report['emails']} e-mail(s), {report['loans']} empréstimo(s), "
+			f"{report['skipped_no_email']} usuário(s) sem e-mail em {report['seconds']:.2f}s "
+			f"({report['emails_per_second']:.1f} e-mails/s)"
+		)
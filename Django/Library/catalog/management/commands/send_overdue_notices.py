@@ -0,0 +1,44 @@
+"""Envia por e-mail os avisos de empréstimos atrasados (ver catalog/notifications.py).
+
+Uso:
+	python manage.py send_overdue_notices
+	python manage.py send_overdue_notices --dry-run
+	python manage.py send_overdue_notices --chunk-size 200 --date 2025-12-01
+
+Pensado para rodar agendado (ex.: cron diário). É idempotente: cada
+empréstimo recebe o aviso uma vez por data de devolução, então repetir a
+execução não reenvia e-mails. O envio usa o EMAIL_BACKEND configurado.
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.notifications import send_overdue_notices
+
+
+class Command(BaseCommand):
+	help = "Envia um e-mail por usuário com os empréstimos atrasados ainda não avisados."
+
+	def add_arguments(self, parser):
+		parser.add_argument("--chunk-size", type=int, default=500, help="Usuários por bloco/lote de e-mails.")
+		parser.add_argument("--dry-run", action="store_true", help="Só mostra o que seria enviado.")
+		parser.add_argument("--date", help="Data de referência (AAAA-MM-DD); padrão: hoje.")
+
+	def handle(self, *args, **options):
+		if options["chunk_size"] < 1:
+			raise CommandError("--chunk-size deve ser positivo.")
+		today = None
+		if options["date"]:
+			try:
+				today = date.fromisoformat(options["date"])
+			except ValueError:
+				raise CommandError("--date deve estar no formato AAAA-MM-DD.")
+
+		stats = send_overdue_notices(today=today, chunk_size=options["chunk_size"], dry_run=options["dry_run"])
+		prefix = "[dry-run] " if options["dry_run"] else ""
+		self.stdout.write(
+			f"{prefix}{stats['emails']} e-mail(s) para {stats['users']} usuário(s), "
+			f"{stats['loans']} empréstimo(s) atrasado(s), {stats['skipped_no_email']} sem e-mail "
+			f"({stats['seconds']:.2f}s)"
+		)
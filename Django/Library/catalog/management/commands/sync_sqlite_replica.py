@@ -0,0 +1,34 @@
+"""Copia o banco SQLite primário para a réplica local (alias 'replica').
+
+Serve para exercitar o roteamento de leituras (catalog/db_routers.py) sem um
+servidor de replicação: usa a API de backup do SQLite, que faz uma cópia
+consistente mesmo com o primário em uso.
+
+Uso:
+	LIBRARY_REPLICA_DB=replica.sqlite3 python manage.py sync_sqlite_replica
+"""
+
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+	help = "Copia o db.sqlite3 primário para a réplica SQLite configurada em LIBRARY_REPLICA_DB."
+
+	def handle(self, *args, **options):
+		replica = settings.DATABASES.get("replica")
+		if not replica:
+			raise CommandError("Nenhuma réplica configurada. Defina LIBRARY_REPLICA_DB.")
+		primary = settings.DATABASES["default"]
+		if "sqlite3" not in primary["ENGINE"] or "sqlite3" not in replica["ENGINE"]:
+			raise CommandError("Este comando só copia bancos SQLite.")
+		source = sqlite3.connect(primary["NAME"])
+		target = sqlite3.connect(replica["NAME"])
+		try:
+			source.backup(target)
+		finally:
+			target.close()
+			source.close()
+		self.stdout.write(self.style.SUCCESS(f"Réplica atualizada: {replica['NAME']}"))
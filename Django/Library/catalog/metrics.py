@@ -0,0 +1,187 @@
+"""Métricas em memória do processo (contadores, medidores e histogramas).
+
+Implementação mínima no estilo Prometheus, sem dependências externas:
+- Counter: só cresce (ex.: conexões abertas);
+- Gauge: sobe e desce (ex.: conexões em uso no pool);
+- Histogram: distribui observações em faixas (ex.: tempo para obter conexão).
+
+Cada métrica pode ter rótulos (labels), ex.: `alias="default"`. As operações
+são protegidas por uma trava simples e custam poucos microssegundos, então
+podem ser usadas no caminho de cada request.
+
+As métricas são registradas em `REGISTRY` ao serem criadas; `snapshot()`
+devolve um dict com os valores atuais (útil em testes e páginas de staff) e
+`render_prometheus()` gera o texto servido em `/metrics`.
+Os valores são por processo: com vários workers, cada um tem os seus.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+REGISTRY = {}
+
+# Faixas padrão (segundos) para latências
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+	kind = ""
+
+	def __init__(self, name, help_text, labelnames=()):
+		self.name = name
+		self.help = help_text
+		self.labelnames = tuple(labelnames)
+		self._lock = threading.Lock()
+		self._values = {}
+
+	def _key(self, labels):
+		if set(labels) != set(self.labelnames):
+			raise ValueError(f"{self.name}: rótulos esperados {self.labelnames}, recebidos {tuple(labels)}")
+		return tuple(str(labels[name]) for name in self.labelnames)
+
+	def labels_dict(self, key):
+		return dict(zip(self.labelnames, key))
+
+	def items(self):
+		"""[(rótulos, valor)] — cópia segura para leitura."""
+		with self._lock:
+			return [(self.labels_dict(key), value) for key, value in self._values.items()]
+
+	def clear(self):
+		with self._lock:
+			self._values.clear()
+
+
+class Counter(_Metric):
+	kind = "counter"
+
+	def inc(self, amount=1, **labels):
+		key = self._key(labels)
+		with self._lock:
+			self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+	kind = "gauge"
+
+	def set(self, value, **labels):
+		key = self._key(labels)
+		with self._lock:
+			self._values[key] = value
+
+	def inc(self, amount=1, **labels):
+		key = self._key(labels)
+		with self._lock:
+			self._values[key] = self._values.get(key, 0) + amount
+
+	def dec(self, amount=1, **labels):
+		self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+	kind = "histogram"
+
+	def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+		super().__init__(name, help_text, labelnames)
+		self.buckets = tuple(sorted(buckets))
+
+	def observe(self, value, **labels):
+		key = self._key(labels)
+		with self._lock:
+			state = self._values.get(key)
+			if state is None:
+				state = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+			for i, upper in enumerate(self.buckets):
+				if value <= upper:
+					state["buckets"][i] += 1
+					break
+			state["sum"] += value
+			state["count"] += 1
+
+	def items(self):
+		with self._lock:
+			return [
+				(self.labels_dict(key), {"buckets": list(v["buckets"]), "sum": v["sum"], "count": v["count"]})
+				for key, v in self._values.items()
+			]
+
+
+def _register(cls, name, help_text, labelnames=(), **kwargs):
+	"""Cria a métrica ou devolve a já registrada com o mesmo nome."""
+	metric = REGISTRY.get(name)
+	if metric is None:
+		metric = REGISTRY[name] = cls(name, help_text, labelnames, **kwargs)
+	return metric
+
+
+def counter(name, help_text, labelnames=()):
+	return _register(Counter, name, help_text, labelnames)
+
+
+def gauge(name, help_text, labelnames=()):
+	return _register(Gauge, name, help_text, labelnames)
+
+
+def histogram(name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+	return _register(Histogram, name, help_text, labelnames, buckets=buckets)
+
+
+@contextmanager
+def timer(histogram_metric, **labels):
+	"""Observa no histograma a duração (s) do bloco `with`."""
+	start = time.perf_counter()
+	try:
+		yield
+	finally:
+		histogram_metric.observe(time.perf_counter() - start, **labels)
+
+
+def snapshot():
+	"""{nome: [(rótulos, valor)]} com os valores atuais de todas as métricas."""
+	return {name: metric.items() for name, metric in REGISTRY.items()}
+
+
+def reset():
+	"""Zera todas as métricas (usado nos testes)."""
+	for metric in REGISTRY.values():
+		metric.clear()
+
+
+def _escape(value) -> str:
+	"""Escapa barra invertida, aspas e quebras de linha nos valores de rótulo."""
+	return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=None):
+	pairs = {**labels, **(extra or {})}
+	if not pairs:
+		return ""
+	return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs.items()) + "}"
+
+
+def _format_value(value):
+	if isinstance(value, float) and value == int(value) and abs(value) < 1e15:
+		return str(int(value))
+	return repr(value) if isinstance(value, float) else str(value)
+
+
+def render_prometheus():
+	"""Texto no formato de exposição do Prometheus (versão 0.0.4)."""
+	lines = []
+	for name in sorted(REGISTRY):
+		metric = REGISTRY[name]
+		lines.append(f"# HELP {name} {metric.help}")
+		lines.append(f"# TYPE {name} {metric.kind}")
+		for labels, value in metric.items():
+			if metric.kind != "histogram":
+				lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+				continue
+			cumulative = 0
+			for upper, count in zip(metric.buckets, value["buckets"]):
+				cumulative += count
+				lines.append(f"{name}_bucket{_format_labels(labels, {'le': upper})} {cumulative}")
+			lines.append(f"{name}_bucket{_format_labels(labels, {'le': '+Inf'})} {value['count']}")
+			lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value['sum'])}")
+			lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+	return "\n".join(lines) + "\n"
@@ -0,0 +1,250 @@
+"""Middlewares de observabilidade do app catalog.
+
+- DBConnectionMetricsMiddleware: mede quanto tempo cada request leva para
+  obter a conexão com o banco (nova, reaproveitada via CONN_MAX_AGE ou vinda
+  do pool do psycopg) na primeira consulta e, no PostgreSQL com pool, a
+  saturação do pool. Requests sem consultas não abrem conexão.
+- RequestMetricsMiddleware: latência e número de consultas SQL por rota
+  (nome da URL, ex.: `catalog:book_list`), expostos em `/metrics`.
+- QueryProfilingMiddleware (opcional): conta e cronometra as consultas SQL de
+  cada request, detecta repetições (N+1) e agrega por view (profiling.py).
+
+Todos funcionam em WSGI e em ASGI (sync_capable/async_capable). Um único
+middleware só síncrono faria o Django rodar as views assíncronas
+(`async_views.py`) numa thread, anulando a vantagem do ASGI. No modo
+assíncrono, as conexões do banco pertencem à thread onde o ORM roda
+(`sync_to_async`), então os execute_wrappers são instalados lá.
+"""
+
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics
+from .profiling import VIEW_STATS, QueryRecorder, log_if_slow, profiling_settings
+
+DB_CONNECTION_ACQUIRE_SECONDS = metrics.histogram(
+	"library_db_connection_acquire_seconds",
+	"Tempo para obter a conexão com o banco na primeira consulta do request.",
+	("alias", "outcome"),
+)
+HTTP_REQUEST_SECONDS = metrics.histogram(
+	"library_http_request_duration_seconds",
+	"Latência dos requests por rota.",
+	("view", "method", "status"),
+)
+DB_QUERIES_PER_REQUEST = metrics.histogram(
+	"library_db_queries_per_request",
+	"Consultas SQL executadas por request, por rota.",
+	("view",),
+	buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+DB_POOL_SIZE = metrics.gauge("library_db_pool_size", "Conexões abertas no pool do psycopg.", ("alias",))
+DB_POOL_AVAILABLE = metrics.gauge("library_db_pool_available", "Conexões livres no pool do psycopg.", ("alias",))
+DB_POOL_WAITING = metrics.gauge(
+	"library_db_pool_requests_waiting", "Requests aguardando uma conexão do pool (saturação).", ("alias",)
+)
+
+
+def _view_name(request):
+	"""Nome da rota do request; caminhos sem rota dividem um rótulo fixo.
+
+	Usar o caminho criaria uma série (ou linha de estatística) nova para cada
+	URL inexistente pedida por robôs, sem limite.
+	"""
+	match = getattr(request, "resolver_match", None)
+	return match.view_name if match else "<não resolvida>"
+
+
+def _wrap_all_connections(stack, wrapper):
+	for connection in connections.all():
+		stack.enter_context(connection.execute_wrapper(wrapper))
+
+
+class HybridMiddleware:
+	"""Base dos middlewares do app: `process(request)` síncrono ou `aprocess(request)` assíncrono.
+
+	O Django escolhe o modo pelo tipo de `get_response`: com ASGI e todos os
+	middlewares assíncronos, a pilha inteira roda no event loop.
+	"""
+
+	sync_capable = True
+	async_capable = True
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+		if iscoroutinefunction(self.get_response):
+			markcoroutinefunction(self)
+
+	def __call__(self, request):
+		if iscoroutinefunction(self):
+			return self.aprocess(request)
+		return self.process(request)
+
+
+class _ConnectionAcquireTimer:
+	"""Mede a aquisição da conexão quando o ORM precisa dela, sem abri-la antes.
+
+	Durante o request, `connect()` da conexão é embrulhado (só nesta instância,
+	que é da thread): se a primeira consulta precisar abrir uma conexão ou
+	pegá-la do pool, o tempo vira `acquired`. Se a primeira consulta encontrar
+	a conexão já aberta (CONN_MAX_AGE), o execute_wrapper registra `reused`.
+	"""
+
+	def __init__(self, alias):
+		self.alias = alias
+		self.observed = False
+
+	def install(self, stack):
+		connection = connections[self.alias]
+		connect = connection.connect
+
+		def timed_connect():
+			start = time.perf_counter()
+			connect()
+			self._observe(time.perf_counter() - start, "acquired")
+
+		connection.connect = timed_connect
+		stack.callback(vars(connection).pop, "connect", None)
+		stack.enter_context(connection.execute_wrapper(self))
+		return connection
+
+	def __call__(self, execute, sql, params, many, context):
+		# connect() roda antes dos wrappers: se nada foi registrado, a conexão já estava aberta
+		self._observe(0.0, "reused")
+		return execute(sql, params, many, context)
+
+	def _observe(self, seconds, outcome):
+		if not self.observed:
+			self.observed = True
+			DB_CONNECTION_ACQUIRE_SECONDS.observe(seconds, alias=self.alias, outcome=outcome)
+
+
+class DBConnectionMetricsMiddleware(HybridMiddleware):
+	"""Registra o tempo de aquisição da conexão do alias `default` por request.
+
+	O rótulo `outcome` diz se a conexão já estava aberta (`reused`, graças ao
+	CONN_MAX_AGE) ou precisou ser aberta/pega do pool (`acquired`). Se a
+	proporção de `acquired` for alta ou o pool tiver requests esperando, há
+	workers demais para o pool (ou pool pequeno demais). A medição acontece na
+	primeira consulta (`_ConnectionAcquireTimer`): requests que não consultam o
+	banco continuam sem conexão e não entram na métrica.
+	"""
+
+	alias = "default"
+
+	def process(self, request):
+		with ExitStack() as stack:
+			connection = _ConnectionAcquireTimer(self.alias).install(stack)
+			try:
+				return self.get_response(request)
+			finally:
+				self._record_pool_stats(connection)
+
+	async def aprocess(self, request):
+		# A conexão é da thread do ORM, não do event loop
+		stack = ExitStack()
+		connection = await sync_to_async(_ConnectionAcquireTimer(self.alias).install)(stack)
+		try:
+			return await self.get_response(request)
+		finally:
+			await sync_to_async(stack.close)()
+			await sync_to_async(self._record_pool_stats)(connection)
+
+	def _record_pool_stats(self, connection):
+		# `pool` só existe no backend PostgreSQL do Django 5.1+ com OPTIONS['pool']
+		pool = getattr(connection, "pool", None)
+		if pool is None:
+			return
+		stats = pool.get_stats()
+		DB_POOL_SIZE.set(stats.get("pool_size", 0), alias=self.alias)
+		DB_POOL_AVAILABLE.set(stats.get("pool_available", 0), alias=self.alias)
+		DB_POOL_WAITING.set(stats.get("requests_waiting", 0), alias=self.alias)
+
+
+class _QueryCounter:
+	"""execute_wrapper mínimo: só conta as consultas (custo desprezível)."""
+
+	def __init__(self):
+		self.count = 0
+
+	def __call__(self, execute, sql, params, many, context):
+		self.count += 1
+		return execute(sql, params, many, context)
+
+
+class RequestMetricsMiddleware(HybridMiddleware):
+	"""Mede latência e quantidade de consultas por rota nomeada.
+
+	O rótulo `view` é o nome da rota (`catalog:book_list`), não o caminho, para
+	que URLs com ids não criem uma série nova por livro.
+	"""
+
+	def process(self, request):
+		counter = _QueryCounter()
+		start = time.perf_counter()
+		with ExitStack() as stack:
+			_wrap_all_connections(stack, counter)
+			response = self.get_response(request)
+		return self._record(request, response, counter, time.perf_counter() - start)
+
+	async def aprocess(self, request):
+		counter = _QueryCounter()
+		start = time.perf_counter()
+		stack = ExitStack()
+		await sync_to_async(_wrap_all_connections)(stack, counter)
+		try:
+			response = await self.get_response(request)
+		finally:
+			await sync_to_async(stack.close)()
+		return self._record(request, response, counter, time.perf_counter() - start)
+
+	def _record(self, request, response, counter, elapsed):
+		view_name = _view_name(request)
+		HTTP_REQUEST_SECONDS.observe(elapsed, view=view_name, method=request.method, status=response.status_code)
+		DB_QUERIES_PER_REQUEST.observe(counter.count, view=view_name)
+		return response
+
+
+class QueryProfilingMiddleware(HybridMiddleware):
+	"""Perfila as consultas SQL de cada request (ativado por QUERY_PROFILING['ENABLED']).
+
+	Desativado, o Django remove o middleware da pilha na inicialização
+	(MiddlewareNotUsed), então não há custo nenhum em produção.
+	"""
+
+	def __init__(self, get_response):
+		self.config = profiling_settings()
+		if not self.config["ENABLED"]:
+			raise MiddlewareNotUsed
+		super().__init__(get_response)
+
+	def process(self, request):
+		recorder = QueryRecorder()
+		with ExitStack() as stack:
+			_wrap_all_connections(stack, recorder)
+			response = self.get_response(request)
+		return self._report(request, response, recorder)
+
+	async def aprocess(self, request):
+		recorder = QueryRecorder()
+		stack = ExitStack()
+		await sync_to_async(_wrap_all_connections)(stack, recorder)
+		try:
+			response = await self.get_response(request)
+		finally:
+			await sync_to_async(stack.close)()
+		return self._report(request, response, recorder)
+
+	def _report(self, request, response, recorder):
+		view_name = _view_name(request)
+		summary = recorder.summary(self.config)
+		VIEW_STATS.record(view_name, summary, self.config)
+		log_if_slow(view_name, request.path, summary, self.config)
+		# Cabeçalhos úteis para inspecionar no navegador (aba Rede)
+		response["X-DB-Query-Count"] = str(summary["count"])
+		response["X-DB-Time-Ms"] = f"{summary['db_ms']:.1f}"
+		return response
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_alter_book_options_alter_category_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('overdue', 'Atraso')], max_length=20, verbose_name='Tipo')),
+                ('due_date', models.DateField(verbose_name='Devolver até (no envio)')),
+                ('sent_at', models.DateTimeField(auto_now_add=True, verbose_name='Enviado em')),
+            ],
+            options={
+                'verbose_name': 'Aviso de empréstimo',
+                'verbose_name_plural': 'Avisos de empréstimo',
+                'ordering': ['-sent_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(condition=models.Q(('returned_at__isnull', True)), fields=['due_date'], name='loan_open_due_idx'),
+        ),
+        migrations.AddField(
+            model_name='loannotification',
+            name='loan',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='catalog.loan', verbose_name='Empréstimo'),
+        ),
+        migrations.AddConstraint(
+            model_name='loannotification',
+            constraint=models.UniqueConstraint(fields=('loan', 'kind', 'due_date'), name='unique_notification_per_loan_due'),
+        ),
+    ]
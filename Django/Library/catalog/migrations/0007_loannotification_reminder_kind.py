@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_loan_notifications'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='loannotification',
+            name='kind',
+            field=models.CharField(choices=[('overdue', 'Atraso'), ('reminder', 'Lembrete de devolução')], max_length=20, verbose_name='Tipo'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_loannotification_reminder_kind'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(verbose_name='Posição')),
+                ('status', models.CharField(choices=[('waiting', 'Na fila'), ('ready', 'Disponível para retirada'), ('fulfilled', 'Atendida'), ('cancelled', 'Cancelada'), ('expired', 'Expirada')], default='waiting', max_length=10, verbose_name='Situação')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criada em')),
+                ('ready_at', models.DateTimeField(blank=True, null=True, verbose_name='Separada em')),
+                ('expires_at', models.DateTimeField(blank=True, null=True, verbose_name='Retirar até')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='catalog.book', verbose_name='Livro')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Reserva',
+                'verbose_name_plural': 'Reservas',
+                'ordering': ['book', 'position'],
+                'indexes': [models.Index(fields=['book', 'status', 'position'], name='hold_queue_idx'), models.Index(condition=models.Q(('status', 'ready')), fields=['expires_at'], name='hold_ready_expires_idx')],
+                'constraints': [models.UniqueConstraint(fields=('book', 'position'), name='unique_hold_position_per_book'), models.UniqueConstraint(condition=models.Q(('status__in', ['waiting', 'ready'])), fields=('book', 'user'), name='unique_open_hold_per_user_book')],
+            },
+        ),
+    ]
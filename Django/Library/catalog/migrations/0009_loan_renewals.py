@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_hold'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='renewals',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Renovações'),
+        ),
+    ]
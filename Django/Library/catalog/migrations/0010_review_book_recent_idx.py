@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_loan_renewals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['book', '-created_at', '-id'], name='review_book_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0010_review_book_recent_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookNeighbor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('loans', 'Empréstimos em comum')], max_length=10, verbose_name='Tipo')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Posição')),
+                ('score', models.FloatField(verbose_name='Similaridade')),
+                ('computed_at', models.DateTimeField(verbose_name='Calculado em')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='catalog.book', verbose_name='Livro')),
+                ('neighbor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbor_of', to='catalog.book', verbose_name='Vizinho')),
+            ],
+            options={
+                'verbose_name': 'Livro vizinho',
+                'verbose_name_plural': 'Livros vizinhos',
+                'constraints': [models.UniqueConstraint(fields=('book', 'kind', 'rank'), name='unique_neighbor_rank')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0011_bookneighbor'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bookneighbor',
+            name='kind',
+            field=models.CharField(choices=[('loans', 'Empréstimos em comum'), ('content', 'Metadados parecidos')], max_length=10, verbose_name='Tipo'),
+        ),
+    ]
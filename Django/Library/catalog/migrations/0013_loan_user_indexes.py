@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0012_bookneighbor_content_kind'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(condition=models.Q(('returned_at__isnull', True)), fields=['user', 'due_date'], name='loan_user_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(condition=models.Q(('returned_at__isnull', False)), fields=['user', '-returned_at', '-id'], name='loan_user_history_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0013_loan_user_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('loans', 'Empréstimos em comum'), ('content', 'Metadados parecidos')], max_length=10, verbose_name='Tipo')),
+                ('started_at', models.DateTimeField(verbose_name='Iniciada em')),
+                ('full', models.BooleanField(default=True, verbose_name='Completa')),
+                ('engine', models.CharField(max_length=10, verbose_name='Motor')),
+                ('books', models.PositiveIntegerField(verbose_name='Livros recalculados')),
+                ('neighbors', models.PositiveIntegerField(verbose_name='Vizinhos gravados')),
+            ],
+            options={
+                'verbose_name': 'Execução de recomendações',
+                'verbose_name_plural': 'Execuções de recomendações',
+                'indexes': [models.Index(fields=['kind', '-started_at'], name='recrun_kind_started_idx')],
+            },
+        ),
+    ]
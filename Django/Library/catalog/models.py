@@ -90,11 +90,23 @@ class Book(models.Model):
 	def copies_available(self) -> int:
 		"""Quantidade de cópias disponíveis agora.
 
-		Contamos quantos empréstimos estão ativos (returned_at nulo) e
-		subtraímos de copies_total. Nunca retornamos número negativo.
+		Contamos quantos empréstimos estão ativos (returned_at nulo) e quantas
+		cópias estão separadas para reservas (`ready`) e subtraímos de
+		copies_total. Nunca retornamos número negativo. Quem tem a reserva
+		separada pode retirar a cópia mesmo com o valor zerado (ver
+		`circulation.free_copies`).
+
+		Se o queryset já trouxe as anotações de `circulation.with_availability`
+		(como em book_list), usamos esses valores e evitamos consultas por
+		livro (N+1).
 		"""
-		active_loans = self.loans.filter(returned_at__isnull=True).count()
-		return max(self.copies_total - active_loans, 0)
+		active_loans = getattr(self, "active_loans", None)
+		if active_loans is None:
+			active_loans = self.loans.filter(returned_at__isnull=True).count()
+		ready_for_others = getattr(self, "ready_for_others", None)
+		if ready_for_others is None:
+			ready_for_others = self.holds.filter(status=Hold.STATUS_READY).count()
+		return max(self.copies_total - active_loans - ready_for_others, 0)
 
 	@property
 	def average_rating(self):
@@ -111,12 +123,26 @@ class Book(models.Model):
 		"""Verifica se o usuário pode avaliar este livro.
 		
 		PT-BR: apenas usuários que pegaram este livro emprestado (histórico)
-		podem deixar avaliações.
+		podem deixar avaliações. Para vários livros, use `users_can_review`.
+		"""
+		return self.pk in Book.users_can_review([self], user)
+
+	@staticmethod
+	def users_can_review(books, user):
+		"""Ids dos livros de `books` que o usuário pode avaliar (conjunto).
+
+		PT-BR: se o conjunto de livros já emprestados ao usuário foi carregado
+		(`circulation.borrowed_book_ids`, guardado na sessão), é só um teste de
+		pertinência, sem consulta; senão, uma consulta para todos os livros.
 		"""
 		if not user.is_authenticated:
-			return False
-		# PT-BR: verifica se existe algum empréstimo deste livro para este usuário
-		return self.loans.filter(user=user).exists()
+			return set()
+		ids = {book.pk for book in books}
+		borrowed = getattr(user, "_borrowed_book_ids", None)
+		if borrowed is None:
+			# PT-BR: empréstimos (históricos ou ativos) deste usuário nestes livros
+			borrowed = set(Loan.objects.filter(user=user, book_id__in=ids).values_list("book_id", flat=True))
+		return ids & borrowed
 
 	def user_review(self, user):
 		"""Retorna a avaliação do usuário para este livro, se existir.
@@ -143,6 +169,7 @@ class Loan(models.Model):
 	borrowed_at = models.DateTimeField(auto_now_add=True, verbose_name="Emprestado em")  # PT-BR: rótulo exibido no Admin
 	due_date = models.DateField(verbose_name="Devolver até")  # PT-BR: rótulo exibido no Admin
 	returned_at = models.DateTimeField(null=True, blank=True, verbose_name="Devolvido em")  # PT-BR: rótulo exibido no Admin
+	renewals = models.PositiveSmallIntegerField(default=0, verbose_name="Renovações")  # PT-BR: limite em LOAN_MAX_RENEWALS
 
 	class Meta:
 		ordering = ["-borrowed_at"]
@@ -155,6 +182,18 @@ class Loan(models.Model):
 				name="loan_due_after_borrowed",
 			),
 		]
+		indexes = [
+			# Índice parcial só com empréstimos em aberto, ordenado pela data de
+			# devolução: atende "atrasados" (due_date < hoje) e "vencem no dia X"
+			# sem percorrer o histórico de devolvidos.
+			models.Index(fields=["due_date"], condition=Q(returned_at__isnull=True), name="loan_open_due_idx"),
+			# "Meus empréstimos": os em aberto do usuário por vencimento (atrasados
+			# e em andamento) e o histórico de devolvidos em páginas por chave.
+			models.Index(fields=["user", "due_date"], condition=Q(returned_at__isnull=True), name="loan_user_open_idx"),
+			models.Index(
+				fields=["user", "-returned_at", "-id"], condition=Q(returned_at__isnull=False), name="loan_user_history_idx"
+			),
+		]
 		verbose_name = "Empréstimo"  # PT-BR: nome do modelo no Admin
 		verbose_name_plural = "Empréstimos"  # PT-BR: plural do modelo no Admin
 
@@ -187,6 +226,102 @@ class Loan(models.Model):
 			self.save(update_fields=["returned_at"])
 
 
+class Hold(models.Model):
+	"""Reserva (fila de espera) de um livro sem cópias disponíveis.
+
+	Ciclo de vida:
+	- waiting: na fila; `position` cresce a cada nova reserva do livro;
+	- ready: uma cópia voltou e está separada para o usuário até `expires_at`;
+	- fulfilled: o usuário emprestou o livro;
+	- cancelled / expired: saiu da fila (desistiu ou não retirou a tempo).
+
+	O próximo da fila é o `waiting` de menor `position` do livro; o índice
+	(book, status, position) torna essa busca um único acesso ao índice,
+	mesmo com milhares de reservas no mesmo título.
+	"""
+
+	STATUS_WAITING = "waiting"
+	STATUS_READY = "ready"
+	STATUS_FULFILLED = "fulfilled"
+	STATUS_CANCELLED = "cancelled"
+	STATUS_EXPIRED = "expired"
+	STATUS_CHOICES = [
+		(STATUS_WAITING, "Na fila"),
+		(STATUS_READY, "Disponível para retirada"),
+		(STATUS_FULFILLED, "Atendida"),
+		(STATUS_CANCELLED, "Cancelada"),
+		(STATUS_EXPIRED, "Expirada"),
+	]
+	OPEN_STATUSES = (STATUS_WAITING, STATUS_READY)
+
+	book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="holds", verbose_name="Livro")
+	user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="holds", verbose_name="Usuário")
+	position = models.PositiveIntegerField(verbose_name="Posição")
+	status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_WAITING, verbose_name="Situação")
+	created_at = models.DateTimeField(auto_now_add=True, verbose_name="Criada em")
+	ready_at = models.DateTimeField(null=True, blank=True, verbose_name="Separada em")
+	expires_at = models.DateTimeField(null=True, blank=True, verbose_name="Retirar até")
+
+	class Meta:
+		ordering = ["book", "position"]
+		verbose_name = "Reserva"
+		verbose_name_plural = "Reservas"
+		constraints = [
+			# Posição única por livro: duas reservas simultâneas não empatam
+			models.UniqueConstraint(fields=["book", "position"], name="unique_hold_position_per_book"),
+			# Um usuário só pode ter uma reserva aberta por livro
+			models.UniqueConstraint(
+				fields=["book", "user"],
+				condition=Q(status__in=["waiting", "ready"]),
+				name="unique_open_hold_per_user_book",
+			),
+		]
+		indexes = [
+			models.Index(fields=["book", "status", "position"], name="hold_queue_idx"),
+			# Job de expiração: reservas separadas com prazo vencido
+			models.Index(fields=["expires_at"], condition=Q(status="ready"), name="hold_ready_expires_idx"),
+		]
+
+	def __str__(self) -> str:  # pragma: no cover
+		return f"{self.book.title} — {self.user} (#{self.position}, {self.get_status_display()})"
+
+	@property
+	def is_open(self) -> bool:
+		return self.status in self.OPEN_STATUSES
+
+
+class LoanNotification(models.Model):
+	"""Registro de um aviso enviado ao usuário sobre um empréstimo.
+
+	Serve para não enviar o mesmo aviso duas vezes: cada (empréstimo, tipo,
+	data de devolução) é único. Guardamos a due_date do momento do envio para
+	que, se o prazo mudar (renovação), um novo aviso possa ser enviado.
+	"""
+
+	KIND_OVERDUE = "overdue"
+	KIND_REMINDER = "reminder"
+	KIND_CHOICES = [
+		(KIND_OVERDUE, "Atraso"),
+		(KIND_REMINDER, "Lembrete de devolução"),
+	]
+
+	loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name="notifications", verbose_name="Empréstimo")
+	kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="Tipo")
+	due_date = models.DateField(verbose_name="Devolver até (no envio)")
+	sent_at = models.DateTimeField(auto_now_add=True, verbose_name="Enviado em")
+
+	class Meta:
+		ordering = ["-sent_at"]
+		verbose_name = "Aviso de empréstimo"
+		verbose_name_plural = "Avisos de empréstimo"
+		constraints = [
+			models.UniqueConstraint(fields=["loan", "kind", "due_date"], name="unique_notification_per_loan_due"),
+		]
+
+	def __str__(self) -> str:  # pragma: no cover
+		return f"{self.get_kind_display()} — empréstimo {self.loan_id} ({self.sent_at:%d/%m/%Y})"
+
+
 class SearchQuery(models.Model):
 	"""Histórico de buscas realizadas.
 
@@ -243,6 +378,77 @@ class Review(models.Model):
 				name="unique_review_per_user_book",
 			)  # PT-BR: impede avaliar o mesmo livro mais de uma vez por usuário
 		]
+		indexes = [
+			# Páginas de avaliações do detalhe do livro (mais recentes primeiro,
+			# paginação por chave created_at/id): cada página é um intervalo do índice.
+			models.Index(fields=["book", "-created_at", "-id"], name="review_book_recent_idx"),
+		]
 
 	def __str__(self) -> str:  # pragma: no cover
 		return f"{self.book.title} — {self.user} ({self.rating}★)"
+
+
+class BookNeighbor(models.Model):
+	"""Vizinho pré-calculado de um livro (recomendações).
+
+	- loans: "quem pegou este também pegou" (empréstimos em comum);
+	- content: "livros parecidos" (título, autor, assunto, série, categoria).
+
+	Gerado offline pelo comando `compute_recommendations` (ver
+	`catalog/recommendations.py`): para cada livro guardamos só os K vizinhos
+	mais parecidos, já ordenados (`rank` 1..K). Servir a recomendação é uma
+	única leitura no índice (book, kind, rank), sem calcular nada no request.
+	"""
+
+	KIND_LOANS = "loans"
+	KIND_CONTENT = "content"
+	KIND_CHOICES = [
+		(KIND_LOANS, "Empréstimos em comum"),
+		(KIND_CONTENT, "Metadados parecidos"),
+	]
+
+	book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="neighbors", verbose_name="Livro")
+	neighbor = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="neighbor_of", verbose_name="Vizinho")
+	kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name="Tipo")
+	rank = models.PositiveSmallIntegerField(verbose_name="Posição")
+	score = models.FloatField(verbose_name="Similaridade")
+	computed_at = models.DateTimeField(verbose_name="Calculado em")
+
+	class Meta:
+		verbose_name = "Livro vizinho"
+		verbose_name_plural = "Livros vizinhos"
+		constraints = [
+			# Também é o índice da leitura: vizinhos de um livro, em ordem
+			models.UniqueConstraint(fields=["book", "kind", "rank"], name="unique_neighbor_rank"),
+		]
+
+	def __str__(self) -> str:  # pragma: no cover
+		return f"{self.book_id} → {self.neighbor_id} ({self.kind} #{self.rank}, {self.score:.3f})"
+
+
+class RecommendationRun(models.Model):
+	"""Uma execução do cálculo de vizinhos (`compute_recommendations`).
+
+	`started_at` é o instante anterior à leitura dos empréstimos: a próxima
+	execução incremental recalcula o que mudou desde então, mesmo quando esta
+	não gravou nenhum vizinho (sem isso, a mesma janela seria refeita toda
+	noite).
+	"""
+
+	kind = models.CharField(max_length=10, choices=BookNeighbor.KIND_CHOICES, verbose_name="Tipo")
+	started_at = models.DateTimeField(verbose_name="Iniciada em")
+	full = models.BooleanField(default=True, verbose_name="Completa")
+	engine = models.CharField(max_length=10, verbose_name="Motor")
+	books = models.PositiveIntegerField(verbose_name="Livros recalculados")
+	neighbors = models.PositiveIntegerField(verbose_name="Vizinhos gravados")
+
+	class Meta:
+		verbose_name = "Execução de recomendações"
+		verbose_name_plural = "Execuções de recomendações"
+		indexes = [
+			# Última execução de cada tipo (`recommendations.last_computed`)
+			models.Index(fields=["kind", "-started_at"], name="recrun_kind_started_idx"),
+		]
+
+	def __str__(self) -> str:  # pragma: no cover
+		return f"{self.kind} em {self.started_at:%d/%m/%Y %H:%M} ({self.books} livros)"
@@ -0,0 +1,194 @@
+"""Avisos por e-mail sobre empréstimos (atrasos e lembretes), enviados em lote.
+
+Usado pelos comandos `send_overdue_notices` e `send_due_reminders` (agendar
+no cron/Agendador de Tarefas, ex.: uma vez por dia). O fluxo é:
+
+1. descobrir quais usuários têm empréstimos atrasados ainda não avisados —
+   consulta no índice parcial `loan_open_due_idx` (só empréstimos em aberto);
+2. percorrer esses usuários em blocos (`chunk_size`), buscando os
+   empréstimos do bloco numa única consulta;
+3. montar UM e-mail por usuário listando todos os livros atrasados;
+4. enviar o bloco inteiro por uma única conexão com o servidor de e-mail
+   (`send_messages`), aberta uma vez por execução;
+5. registrar em `LoanNotification` o que foi enviado. Rodar de novo no mesmo
+   dia não reenvia nada e a consulta do passo 1 já exclui os avisados.
+
+Lembretes: os empréstimos que vencem nos próximos N dias são separados em
+"baldes" por dia de devolução — uma consulta de igualdade (due_date = dia) no
+mesmo índice parcial para cada dia — e todos os baldes compartilham uma
+única conexão com o servidor de e-mail.
+"""
+
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Exists, OuterRef
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import metrics
+from .models import Loan, LoanNotification
+
+logger = logging.getLogger("catalog.notifications")
+
+NOTIFICATIONS_SENT = metrics.counter(
+	"library_notifications_sent_total", "E-mails de aviso enviados aos usuários.", ("kind",)
+)
+
+# Assunto e template de cada tipo de aviso
+NOTICE_TEMPLATES = {
+	LoanNotification.KIND_OVERDUE: ("Empréstimos atrasados na biblioteca", "catalog/emails/overdue_notice.txt"),
+	LoanNotification.KIND_REMINDER: ("Lembrete: devolução de livros", "catalog/emails/due_reminder.txt"),
+}
+
+
+def pending_loans(kind, loans):
+	"""Filtra `loans` deixando só os que ainda não receberam o aviso `kind` para a due_date atual."""
+	already_sent = LoanNotification.objects.filter(loan=OuterRef("pk"), kind=kind, due_date=OuterRef("due_date"))
+	return loans.filter(returned_at__isnull=True).exclude(Exists(already_sent))
+
+
+def overdue_loans(today=None):
+	"""Empréstimos em aberto com devolução antes de hoje e ainda não avisados."""
+	today = today or timezone.localdate()
+	return pending_loans(LoanNotification.KIND_OVERDUE, Loan.objects.filter(due_date__lt=today))
+
+
+def due_date_buckets(days, today=None):
+	"""{dia: empréstimos que vencem nesse dia e ainda não receberam lembrete}, de amanhã até hoje+days.
+
+	Cada balde é uma consulta `due_date = dia` (busca pontual no índice parcial
+	`loan_open_due_idx`), então o custo não depende do tamanho do histórico.
+	"""
+	today = today or timezone.localdate()
+	return {
+		day: pending_loans(LoanNotification.KIND_REMINDER, Loan.objects.filter(due_date=day))
+		for day in (today + timedelta(days=offset) for offset in range(1, days + 1))
+	}
+
+
+def _chunks(items, size):
+	for start in range(0, len(items), size):
+		yield items[start:start + size]
+
+
+def send_loan_notices(kind, loans, *, today=None, chunk_size=500, dry_run=False, connection=None, extra_context=None):
+	"""Envia um e-mail por usuário com os empréstimos de `loans` e registra o envio.
+
+	`loans` deve ser um queryset já filtrado por `pending_loans`. Devolve um
+	dict com contadores (usuários, e-mails, empréstimos, sem e-mail, segundos).
+	Em `dry_run` nada é enviado nem registrado. Se `connection` vier de fora,
+	quem chamou é responsável por abri-la e fechá-la (permite reaproveitá-la).
+	"""
+	today = today or timezone.localdate()
+	subject, template_name = NOTICE_TEMPLATES[kind]
+	stats = {"users": 0, "emails": 0, "loans": 0, "skipped_no_email": 0, "seconds": 0.0}
+	start = time.perf_counter()
+
+	# Passo 1: só os ids dos usuários. Sem ORDER BY no banco o planejador usa o
+	# índice parcial de due_date; a ordenação (para blocos estáveis) é feita aqui.
+	user_ids = sorted(set(loans.order_by().values_list("user_id", flat=True)))
+	stats["users"] = len(user_ids)
+	if not user_ids:
+		return stats
+
+	owns_connection = connection is None and not dry_run
+	if owns_connection:
+		connection = get_connection()
+		connection.open()
+	try:
+		for chunk in _chunks(user_ids, chunk_size):
+			# Passo 2: todos os empréstimos do bloco de usuários numa consulta
+			by_user = defaultdict(list)
+			for loan in loans.filter(user_id__in=chunk).select_related("book", "user").order_by("user_id", "due_date"):
+				by_user[loan.user].append(loan)
+
+			# Passo 3: uma mensagem por usuário, com os empréstimos que ela cobre
+			messages = []
+			for user, user_loans in by_user.items():
+				if not user.email:
+					stats["skipped_no_email"] += 1
+					continue
+				context = {"user": user, "loans": user_loans, "today": today, **(extra_context or {})}
+				body = render_to_string(template_name, context)
+				messages.append((EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [user.email]), user_loans))
+				stats["loans"] += len(user_loans)
+
+			stats["emails"] += len(messages)
+			if dry_run or not messages:
+				continue
+			# Passo 4: envia pela mesma conexão, uma mensagem por vez, para saber
+			# exatamente quais saíram (send_messages devolve quantas enviou)
+			sent_loans, sent = [], 0
+			try:
+				for message, user_loans in messages:
+					if connection.send_messages([message]):
+						sent += 1
+						sent_loans.extend(user_loans)
+			finally:
+				# Passo 5: registra o que saiu, mesmo se o envio falhar no meio do
+				# bloco (senão a próxima execução reenviaria esses avisos);
+				# ignore_conflicts cobre execuções simultâneas
+				LoanNotification.objects.bulk_create(
+					[LoanNotification(loan=loan, kind=kind, due_date=loan.due_date) for loan in sent_loans],
+					ignore_conflicts=True,
+				)
+				NOTIFICATIONS_SENT.inc(sent, kind=kind)
+	finally:
+		if owns_connection:
+			connection.close()
+
+	stats["seconds"] = time.perf_counter() - start
+	logger.info("Avisos '%s': %d e-mails, %d empréstimos em %.2fs", kind, stats["emails"], stats["loans"], stats["seconds"])
+	return stats
+
+
+def send_overdue_notices(today=None, chunk_size=500, dry_run=False, connection=None):
+	"""Envia os avisos de atraso pendentes (ver docstring do módulo)."""
+	return send_loan_notices(
+		LoanNotification.KIND_OVERDUE,
+		overdue_loans(today),
+		today=today,
+		chunk_size=chunk_size,
+		dry_run=dry_run,
+		connection=connection,
+	)
+
+
+def send_due_reminders(days=3, today=None, chunk_size=500, dry_run=False):
+	"""Lembretes para empréstimos que vencem nos próximos `days` dias.
+
+	Devolve um relatório com os totais, a vazão (e-mails/s) e um item por
+	balde de dia: {"due_date", "days_left", "users", "emails", "loans", "seconds"}.
+	"""
+	today = today or timezone.localdate()
+	report = {"buckets": [], "emails": 0, "loans": 0, "skipped_no_email": 0}
+	start = time.perf_counter()
+	connection = None if dry_run else get_connection()
+	if connection is not None:
+		connection.open()
+	try:
+		for day, loans in due_date_buckets(days, today).items():
+			days_left = (day - today).days
+			stats = send_loan_notices(
+				LoanNotification.KIND_REMINDER,
+				loans,
+				today=today,
+				chunk_size=chunk_size,
+				dry_run=dry_run,
+				connection=connection,
+				extra_context={"due_date": day, "days_left": days_left},
+			)
+			report["buckets"].append({"due_date": day, "days_left": days_left, **stats})
+			for key in ("emails", "loans", "skipped_no_email"):
+				report[key] += stats[key]
+	finally:
+		if connection is not None:
+			connection.close()
+	report["seconds"] = time.perf_counter() - start
+	report["emails_per_second"] = report["emails"] / report["seconds"] if report["seconds"] else 0.0
+	return report
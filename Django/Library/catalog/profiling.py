@@ -0,0 +1,147 @@
+"""Perfil de consultas SQL por request (contagem, tempo, N+1 e mais lentas).
+
+Usado pelo `QueryProfilingMiddleware` (middleware.py), que só é ativado com
+`QUERY_PROFILING['ENABLED'] = True` (variável LIBRARY_QUERY_PROFILING=1).
+
+Para cada request guardamos:
+- quantidade de consultas e tempo total no banco;
+- consultas repetidas: a mesma SQL (com %s no lugar dos valores) executada
+  várias vezes costuma indicar um laço N+1 (ex.: `book.copies_available` em
+  cada linha do template);
+- as consultas mais lentas.
+
+As estatísticas agregadas por view ficam em memória (por processo) e são
+exibidas na página de staff `staff/profiling/`.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+logger = logging.getLogger("catalog.profiling")
+
+DEFAULTS = {
+	"ENABLED": False,
+	# Registra no log requests acima de qualquer um destes limites
+	"SLOW_REQUEST_QUERIES": 50,
+	"SLOW_REQUEST_DB_MS": 200,
+	# Consulta individual considerada lenta
+	"SLOW_QUERY_MS": 50,
+	# A partir de quantas repetições da mesma SQL suspeitamos de N+1
+	"DUPLICATE_THRESHOLD": 5,
+	# Quantas consultas lentas guardar por request/view
+	"TOP_STATEMENTS": 5,
+}
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_IN_LIST_RE = re.compile(r"IN \((?:%s, )*%s\)")
+
+
+def profiling_settings():
+	return {**DEFAULTS, **getattr(settings, "QUERY_PROFILING", {})}
+
+
+def query_signature(sql: str) -> str:
+	"""Normaliza a SQL para agrupar execuções "iguais" com valores diferentes.
+
+	O Django já envia os valores separados (%s), então basta compactar espaços
+	e listas `IN (%s, %s, ...)` de tamanhos diferentes.
+	"""
+	sql = _WHITESPACE_RE.sub(" ", sql).strip()
+	return _IN_LIST_RE.sub("IN (...)", sql)
+
+
+class QueryRecorder:
+	"""Wrapper de execução (`connection.execute_wrapper`) que anota cada consulta."""
+
+	def __init__(self):
+		self.queries = []  # [(sql, duração em segundos)]
+
+	def __call__(self, execute, sql, params, many, context):
+		start = time.perf_counter()
+		try:
+			return execute(sql, params, many, context)
+		finally:
+			self.queries.append((sql, time.perf_counter() - start))
+
+	def summary(self, config):
+		signatures = Counter(query_signature(sql) for sql, _ in self.queries)
+		duplicates = [
+			{"sql": sig, "count": count}
+			for sig, count in signatures.most_common()
+			if count >= config["DUPLICATE_THRESHOLD"]
+		]
+		slowest = sorted(self.queries, key=lambda item: item[1], reverse=True)[: config["TOP_STATEMENTS"]]
+		return {
+			"count": len(self.queries),
+			"db_ms": sum(duration for _, duration in self.queries) * 1000,
+			"duplicates": duplicates,
+			"slowest": [{"sql": query_signature(sql), "ms": duration * 1000} for sql, duration in slowest],
+		}
+
+
+class ViewStats:
+	"""Agregado por view (nome da rota) das execuções perfiladas neste processo."""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._views = {}
+
+	def record(self, view_name, summary, config):
+		with self._lock:
+			stats = self._views.setdefault(view_name, {
+				"view": view_name,
+				"requests": 0,
+				"queries": 0,
+				"max_queries": 0,
+				"db_ms": 0.0,
+				"max_db_ms": 0.0,
+				"n_plus_one_requests": 0,
+				"slowest": [],
+			})
+			stats["requests"] += 1
+			stats["queries"] += summary["count"]
+			stats["max_queries"] = max(stats["max_queries"], summary["count"])
+			stats["db_ms"] += summary["db_ms"]
+			stats["max_db_ms"] = max(stats["max_db_ms"], summary["db_ms"])
+			if summary["duplicates"]:
+				stats["n_plus_one_requests"] += 1
+			merged = stats["slowest"] + summary["slowest"]
+			stats["slowest"] = sorted(merged, key=lambda q: q["ms"], reverse=True)[: config["TOP_STATEMENTS"]]
+
+	def rows(self):
+		"""Lista de dicts (com médias calculadas), da view mais cara para a mais barata."""
+		with self._lock:
+			rows = []
+			for stats in self._views.values():
+				row = dict(stats, slowest=list(stats["slowest"]))
+				row["avg_queries"] = stats["queries"] / stats["requests"]
+				row["avg_db_ms"] = stats["db_ms"] / stats["requests"]
+				rows.append(row)
+		return sorted(rows, key=lambda r: r["db_ms"], reverse=True)
+
+	def clear(self):
+		with self._lock:
+			self._views.clear()
+
+
+VIEW_STATS = ViewStats()
+
+
+def log_if_slow(view_name, path, summary, config):
+	"""Registra no log requests acima dos limites configurados e suspeitas de N+1."""
+	too_many = summary["count"] > config["SLOW_REQUEST_QUERIES"]
+	too_slow = summary["db_ms"] > config["SLOW_REQUEST_DB_MS"]
+	if too_many or too_slow:
+		logger.warning(
+			"%s (%s): %d consultas, %.1f ms no banco", view_name, path, summary["count"], summary["db_ms"]
+		)
+	for dup in summary["duplicates"]:
+		logger.warning("%s: possível N+1 — %dx %s", view_name, dup["count"], dup["sql"][:300])
+	for query in summary["slowest"]:
+		if query["ms"] > config["SLOW_QUERY_MS"]:
+			logger.warning("%s: consulta lenta (%.1f ms) %s", view_name, query["ms"], query["sql"][:300])
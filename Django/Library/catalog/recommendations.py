@@ -0,0 +1,397 @@
+"""Recomendações de livros a partir de vizinhos pré-calculados (`BookNeighbor`).
+
+Dois tipos de vizinho, calculados offline pelo comando
+`compute_recommendations` e guardados só os `top_k` de cada livro:
+
+- loans ("quem pegou este também pegou"): modelo item-item por co-ocorrência
+  de empréstimos. Com X a matriz binária leitores × livros (1 = já pegou), a
+  co-ocorrência é C = Xᵀ·X: C[i, j] conta os leitores que pegaram i e j, e a
+  diagonal C[i, i] os leitores de i. A nota é o cosseno
+
+	sim(i, j) = C[i, j] / sqrt(C[i, i] · C[j, j])
+
+  que não empurra os campeões de empréstimo para a lista de todo mundo;
+
+- content ("livros parecidos"): similaridade de texto entre os metadados
+  (título, autor, assunto, série e categoria), para livros ainda sem
+  histórico de empréstimos. Cada livro vira um vetor TF-IDF normalizado e a
+  nota é o produto escalar (cosseno) entre os vetores.
+
+Cálculo em lote: com NumPy e SciPy instalados, as matrizes são esparsas e os
+produtos saem em blocos de `BLOCK_SIZE` livros, sem nunca montar a matriz
+densa livros × livros; sem eles, o mesmo resultado sai de contadores em
+Python, suficiente para acervos pequenos e para os testes.
+
+Atualização incremental:
+- loans: só as linhas dos livros emprestados por leitores com empréstimo novo
+  desde a última execução (só as co-ocorrências desses leitores mudaram).
+  Lemos só o histórico dos leitores desses livros (o resto não altera as
+  linhas recalculadas); a diagonal (leitores por livro) vem de uma contagem
+  agrupada. As notas das outras linhas em relação a esses livros ficam
+  levemente defasadas até o próximo `--full`. O início de cada execução fica
+  em `RecommendationRun`, ponto de partida da seguinte;
+- content (`--only-new`): só os livros ainda sem vizinhos de conteúdo
+  (cadastros novos) e os vizinhos encontrados para eles, que passam a poder
+  listar o livro novo. O IDF é sempre calculado sobre o acervo inteiro.
+
+Servir é uma consulta no índice (book, kind, rank): `also_borrowed` e
+`similar_books` no detalhe do livro, `for_user` em "Meus empréstimos".
+"""
+
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Exists, Max, OuterRef, Sum
+from django.utils import timezone
+
+from .models import Book, BookNeighbor, Loan, RecommendationRun
+from .versioning import bump_book_version
+
+DEFAULT_TOP_K = 10
+# Livros (linhas do produto de matrizes) calculados por vez no caminho esparso
+BLOCK_SIZE = 1000
+# Empréstimos mais recentes do leitor usados como ponto de partida do "para você"
+SEED_LOANS = 20
+# Linhas por DELETE/INSERT ao regravar a tabela de vizinhos
+WRITE_BATCH = 1000
+# Termos presentes em mais que esta fração do acervo (e em mais que
+# MAX_DF_MIN_BOOKS livros, para não cortar tudo num acervo pequeno) não
+# distinguem livros
+MAX_DF_RATIO = 0.5
+MAX_DF_MIN_BOOKS = 100
+STOPWORDS = frozenset(
+	"a o as os um uma uns umas de da do das dos e em no na nos nas ao aos para por pela pelo com sem "
+	"sobre que the of and to in for on an".split()
+)
+
+
+def _chunks(items, size):
+	items = list(items)
+	for start in range(0, len(items), size):
+		yield items[start:start + size]
+
+
+def _sparse_backend():
+	"""(numpy, scipy.sparse) se instalados; senão None (caminho em Python puro)."""
+	try:
+		import numpy as np
+		from scipy import sparse
+	except ImportError:
+		return None
+	return np, sparse
+
+
+def _top(candidates, top_k):
+	# Maior nota primeiro; empate pelo id, para o resultado ser estável
+	return sorted(candidates, key=lambda item: (-item[1], item[0]))[:top_k]
+
+
+def _sparse_top_k(np, product, block, ids, top_k, norms=None):
+	"""Vizinhos de cada linha de `product` (bloco × livros, esparsa).
+
+	`block` são os índices (colunas) dos livros das linhas; com `norms`, o
+	produto é dividido pelas normas (cosseno a partir de contagens).
+	"""
+	result = {}
+	for offset, i in enumerate(block):
+		start, end = product.indptr[offset], product.indptr[offset + 1]
+		cols = product.indices[start:end]
+		keep = cols != i  # o próprio livro não é vizinho
+		cols, scores = cols[keep], product.data[start:end][keep]
+		if norms is not None:
+			scores = scores / (norms[i] * norms[cols])
+		if len(cols) > top_k:
+			# Corte na k-ésima maior nota, mantendo os empates: `_top` desempata pelo id
+			threshold = np.partition(scores, len(scores) - top_k)[len(scores) - top_k]
+			best = scores >= threshold
+			cols, scores = cols[best], scores[best]
+		result[int(ids[i])] = _top(zip(ids[cols].tolist(), scores.tolist()), top_k)
+	return result
+
+
+def _write_neighbors(kind, rows, neighbors, replace_all):
+	"""Troca as linhas de `rows` (ou a tabela inteira do tipo) pelos vizinhos novos."""
+	now = timezone.now()
+	with transaction.atomic():
+		if replace_all:
+			BookNeighbor.objects.filter(kind=kind).delete()
+		else:
+			for chunk in _chunks(rows, WRITE_BATCH):
+				BookNeighbor.objects.filter(kind=kind, book_id__in=chunk).delete()
+		BookNeighbor.objects.bulk_create(
+			(
+				BookNeighbor(book_id=book_id, neighbor_id=other, kind=kind, rank=rank, score=score, computed_at=now)
+				for book_id, best in neighbors.items()
+				for rank, (other, score) in enumerate(best, start=1)
+			),
+			batch_size=WRITE_BATCH,
+		)
+	# bulk_create não dispara signals: o detalhe dos livros regravados muda
+	for book_id in rows:
+		bump_book_version(book_id)
+	return sum(len(best) for best in neighbors.values())
+
+
+# --- Empréstimos em comum --------------------------------------------------
+
+
+def _baskets(books=None):
+	"""{leitor: livros que já pegou}, lido do histórico numa única consulta.
+
+	Com `books` (queryset de ids), só os leitores que pegaram algum desses
+	livros: são os únicos que contam nas linhas deles de C = Xᵀ·X.
+	"""
+	loans = Loan.objects.order_by()
+	if books is not None:
+		loans = loans.filter(user_id__in=Loan.objects.filter(book_id__in=books).values("user_id"))
+	baskets = defaultdict(set)
+	for user_id, book_id in loans.values_list("user_id", "book_id").distinct().iterator(chunk_size=5000):
+		baskets[user_id].add(book_id)
+	return baskets
+
+
+def _readers_per_book():
+	"""Diagonal de C: {livro: leitores distintos}, numa consulta agrupada."""
+	rows = Loan.objects.order_by().values("book_id").annotate(readers=Count("user_id", distinct=True))
+	return {row["book_id"]: row["readers"] for row in rows}
+
+
+def _affected_books(since):
+	"""Livros emprestados (em qualquer época) por leitores com empréstimo desde `since` (queryset de ids)."""
+	recent_readers = Loan.objects.filter(borrowed_at__gte=since).values("user_id")
+	return Loan.objects.filter(user_id__in=recent_readers).order_by().values("book_id").distinct()
+
+
+def _loan_neighbors_python(baskets, popularity, rows, top_k):
+	counts = defaultdict(Counter)
+	for basket in baskets.values():
+		for book_id in basket & rows:
+			row = counts[book_id]
+			for other in basket:
+				if other != book_id:
+					row[other] += 1
+	return {
+		book_id: _top(
+			((other, together / math.sqrt(popularity[book_id] * popularity[other])) for other, together in row.items()),
+			top_k,
+		)
+		for book_id, row in counts.items()
+	}
+
+
+def _loan_neighbors_sparse(np, sparse, baskets, popularity, rows, top_k):
+	ids = np.array(sorted({book_id for basket in baskets.values() for book_id in basket}))
+	column = {book_id: i for i, book_id in enumerate(ids.tolist())}
+	indptr, indices = [0], []
+	for basket in baskets.values():
+		indices.extend(column[book_id] for book_id in basket)
+		indptr.append(len(indices))
+	x = sparse.csr_matrix((np.ones(len(indices), dtype=np.float32), indices, indptr), shape=(len(baskets), len(ids)))
+	xt = x.T.tocsr()
+	# Norma das colunas pela diagonal completa: `baskets` pode ter só parte dos leitores
+	norms = np.sqrt(np.array([popularity[book_id] for book_id in ids.tolist()], dtype=np.float32))
+	result = {}
+	for block in _chunks(sorted(column[book_id] for book_id in rows if book_id in column), BLOCK_SIZE):
+		# Linhas do bloco de C = Xᵀ·X: bloco × livros, ainda esparsa
+		result.update(_sparse_top_k(np, (xt[block] @ x).tocsr(), block, ids, top_k, norms))
+	return result
+
+
+def last_computed(kind=BookNeighbor.KIND_LOANS):
+	"""Início da última execução do tipo (None se nunca rodou)."""
+	last = RecommendationRun.objects.filter(kind=kind).aggregate(last=Max("started_at"))["last"]
+	if last is None:
+		# Vizinhos gravados antes de existir o registro de execuções
+		last = BookNeighbor.objects.filter(kind=kind).aggregate(last=Max("computed_at"))["last"]
+	return last
+
+
+def _finish_run(kind, started_at, full, summary):
+	RecommendationRun.objects.create(kind=kind, started_at=started_at, full=full, **summary)
+	return summary
+
+
+def compute_loan_neighbors(top_k=DEFAULT_TOP_K, since=None):
+	"""Recalcula os vizinhos por empréstimos em comum.
+
+	Com `since`, só as linhas dos livros afetados por empréstimos feitos desde
+	então, lendo só o histórico dos leitores desses livros; sem, o acervo
+	inteiro. Retorna um resumo (motor usado, livros e vizinhos gravados).
+	"""
+	started_at = timezone.now()
+	backend = _sparse_backend()
+	if since is None:
+		baskets = _baskets()
+		rows = {book_id for basket in baskets.values() for book_id in basket}
+	else:
+		affected = _affected_books(since)
+		rows = set(affected.values_list("book_id", flat=True))
+		baskets = _baskets(affected) if rows else {}
+	neighbors = {}
+	if rows:
+		popularity = _readers_per_book()
+		neighbors = (
+			_loan_neighbors_sparse(*backend, baskets, popularity, rows, top_k) if backend
+			else _loan_neighbors_python(baskets, popularity, rows, top_k)
+		)
+	return _finish_run(BookNeighbor.KIND_LOANS, started_at, since is None, {
+		"engine": "scipy" if backend else "python",
+		"books": len(rows),
+		"neighbors": _write_neighbors(BookNeighbor.KIND_LOANS, rows, neighbors, replace_all=since is None),
+	})
+
+
+# --- Metadados parecidos (TF-IDF) --------------------------------------------
+
+
+def _fold(text):
+	"""Minúsculas e sem acentos: "Ficção" e "ficcao" viram o mesmo termo."""
+	text = unicodedata.normalize("NFKD", text.lower())
+	return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def _terms(row):
+	"""Termos de um livro: palavras dos metadados e autor/série/categoria inteiros.
+
+	Os campos inteiros ("autor=machado de assis") fazem "mesmo autor" ou
+	"mesma série" pesar mais que uma palavra solta em comum.
+	"""
+	text = " ".join(filter(None, (row["title"], row["author"], row["subject"], row["series"], row["category__name"])))
+	terms = [
+		word for word in re.findall(r"\w+", _fold(text))
+		if len(word) > 2 and word not in STOPWORDS and not word.isdigit()
+	]
+	for field, value in (("autor", row["author"]), ("serie", row["series"]), ("categoria", row["category__name"])):
+		if value:
+			terms.append(f"{field}={_fold(value).strip()}")
+	return terms
+
+
+def _tfidf_vectors():
+	"""{livro: {termo: peso}} com TF logarítmico, IDF suavizado e norma 1.
+
+	Termos de um livro só (não aproximam ninguém) e termos comuns demais
+	(`MAX_DF_RATIO`) ficam de fora: vetores menores, listas invertidas curtas.
+	"""
+	counts = {}
+	rows = Book.objects.order_by().values("id", "title", "author", "subject", "series", "category__name")
+	for row in rows.iterator(chunk_size=5000):
+		counts[row["id"]] = Counter(_terms(row))
+	total = len(counts)
+	df = Counter(term for terms in counts.values() for term in terms)
+	max_df = max(MAX_DF_MIN_BOOKS, MAX_DF_RATIO * total)
+	idf = {term: math.log((1 + total) / (1 + n)) + 1 for term, n in df.items() if 1 < n <= max_df}
+	vectors = {}
+	for book_id, terms in counts.items():
+		weights = {term: (1 + math.log(n)) * idf[term] for term, n in terms.items() if term in idf}
+		norm = math.sqrt(sum(w * w for w in weights.values()))
+		vectors[book_id] = {term: w / norm for term, w in weights.items()} if norm else {}
+	return vectors
+
+
+def _content_neighbors_python(vectors, rows, top_k):
+	postings = defaultdict(list)
+	for book_id, weights in vectors.items():
+		for term, weight in weights.items():
+			postings[term].append((book_id, weight))
+	result = {}
+	for book_id in rows:
+		scores = defaultdict(float)
+		for term, weight in vectors.get(book_id, {}).items():
+			for other, other_weight in postings[term]:
+				if other != book_id:
+					scores[other] += weight * other_weight
+		result[book_id] = _top(scores.items(), top_k)
+	return result
+
+
+def _content_neighbors_sparse(np, sparse, vectors, rows, top_k):
+	ids = np.array(sorted(vectors))
+	vocabulary = {}
+	indptr, indices, data = [0], [], []
+	for book_id in ids.tolist():
+		for term, weight in vectors[book_id].items():
+			indices.append(vocabulary.setdefault(term, len(vocabulary)))
+			data.append(weight)
+		indptr.append(len(indices))
+	v = sparse.csr_matrix((np.array(data, dtype=np.float32), indices, indptr), shape=(len(ids), len(vocabulary)))
+	vt = v.T.tocsr()
+	row_of = {book_id: i for i, book_id in enumerate(ids.tolist())}
+	result = {}
+	for block in _chunks(sorted(row_of[book_id] for book_id in rows if book_id in row_of), BLOCK_SIZE):
+		# Vetores já normalizados: V·Vᵀ é o cosseno (bloco × livros, esparsa)
+		result.update(_sparse_top_k(np, (v[block] @ vt).tocsr(), block, ids, top_k))
+	return result
+
+
+def compute_content_neighbors(top_k=DEFAULT_TOP_K, only_new=False):
+	"""Recalcula os vizinhos por metadados parecidos (TF-IDF).
+
+	Com `only_new`, só os livros ainda sem vizinhos de conteúdo e os vizinhos
+	encontrados para eles; sem, o acervo inteiro.
+	"""
+	started_at = timezone.now()
+	backend = _sparse_backend()
+	vectors = _tfidf_vectors()
+
+	def neighbors_of(rows):
+		if not rows:
+			return {}
+		if backend:
+			return _content_neighbors_sparse(*backend, vectors, rows, top_k)
+		return _content_neighbors_python(vectors, rows, top_k)
+
+	if only_new:
+		has_rows = BookNeighbor.objects.filter(book=OuterRef("pk"), kind=BookNeighbor.KIND_CONTENT)
+		# Livros sem nenhum termo relevante nunca terão vizinhos: não entram
+		rows = {book_id for book_id in Book.objects.filter(~Exists(has_rows)).values_list("id", flat=True) if vectors.get(book_id)}
+		neighbors = neighbors_of(rows)
+		# A similaridade é simétrica: quem é vizinho de um livro novo pode passar a listá-lo
+		touched = {other for best in neighbors.values() for other, _ in best} - rows
+		neighbors.update(neighbors_of(touched))
+		rows |= touched
+	else:
+		rows = set(vectors)
+		neighbors = neighbors_of(rows)
+	return _finish_run(BookNeighbor.KIND_CONTENT, started_at, not only_new, {
+		"engine": "scipy" if backend else "python",
+		"books": len(rows),
+		"neighbors": _write_neighbors(BookNeighbor.KIND_CONTENT, rows, neighbors, replace_all=not only_new),
+	})
+
+
+# --- Leitura (views) ---------------------------------------------------------
+
+
+def _neighbors(book_id, kind, limit):
+	return Book.objects.filter(
+		neighbor_of__book_id=book_id, neighbor_of__kind=kind, neighbor_of__rank__lte=limit
+	).order_by("neighbor_of__rank")
+
+
+def also_borrowed(book_id, limit=6):
+	"""Livros que os leitores deste também pegaram (queryset, uma consulta no índice)."""
+	return _neighbors(book_id, BookNeighbor.KIND_LOANS, limit)
+
+
+def similar_books(book_id, limit=6):
+	"""Livros com metadados parecidos (queryset, uma consulta no índice)."""
+	return _neighbors(book_id, BookNeighbor.KIND_CONTENT, limit)
+
+
+def for_user(user, limit=8):
+	"""Sugestões "para você": vizinhos dos últimos livros do leitor, somando as notas.
+
+	Uma consulta: os `SEED_LOANS` empréstimos mais recentes e os livros que o
+	leitor já pegou entram como subconsultas.
+	"""
+	seeds = Loan.objects.filter(user=user).order_by("-borrowed_at").values("book_id")[:SEED_LOANS]
+	return (
+		Book.objects.filter(neighbor_of__book_id__in=seeds, neighbor_of__kind=BookNeighbor.KIND_LOANS)
+		.exclude(pk__in=Loan.objects.filter(user=user).values("book_id"))
+		.annotate(recommendation_score=Sum("neighbor_of__score"))
+		.order_by("-recommendation_score", "title")[:limit]
+	)
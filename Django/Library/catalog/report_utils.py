@@ -5,64 +5,84 @@ from .models import Loan, Book
 
 User = get_user_model()
 
-def build_report_dataset(report_type: str):
-	"""Retorna dict com title, headers, rows para cada tipo de relatório."""
-	now_str = timezone.localtime().strftime("%d/%m/%Y %H:%M")
+
+def _loan_status(l):
+	return "Devolvido" if l.returned_at else ("Atrasado" if l.is_overdue else "Em aberto")
+
+
+def _report_spec(report_type: str):
+	"""(título, cabeçalhos, queryset, função linha) de cada relatório, ou None.
+
+	O queryset ainda não foi executado: `build_report_dataset` percorre com
+	`for` e `abuild_report_dataset` com `async for` (views assíncronas).
+	"""
 	if report_type == "loans":
-		qs = Loan.objects.select_related("book", "user").order_by("-borrowed_at")
-		return {
-			"title": f"Relatório de Empréstimos ({now_str})",
-			"headers": ["Livro", "Usuário", "Emprestado em", "Devolver até", "Status"],
-			"rows": [
-				[
-					l.book.title,
-					str(l.user),
-					l.borrowed_at.strftime("%d/%m/%Y"),
-					l.due_date.strftime("%d/%m/%Y"),
-					"Devolvido" if l.returned_at else ("Atrasado" if l.is_overdue else "Em aberto"),
-				]
-				for l in qs
+		return (
+			"Relatório de Empréstimos",
+			["Livro", "Usuário", "Emprestado em", "Devolver até", "Status"],
+			Loan.objects.select_related("book", "user").order_by("-borrowed_at"),
+			lambda l: [
+				l.book.title,
+				str(l.user),
+				l.borrowed_at.strftime("%d/%m/%Y"),
+				l.due_date.strftime("%d/%m/%Y"),
+				_loan_status(l),
 			],
-		}
+		)
 	if report_type == "popular_books":
-		qs = (
+		return (
+			"Livros Mais Populares",
+			["Título", "Autor", "Empréstimos"],
 			Book.objects.annotate(total_loans=Count("loans"))
 			.filter(total_loans__gt=0)
-			.order_by("-total_loans", "title")[:50]
+			.order_by("-total_loans", "title")[:50],
+			lambda b: [b.title, b.author, b.total_loans],
 		)
-		return {
-			"title": f"Livros Mais Populares ({now_str})",
-			"headers": ["Título", "Autor", "Empréstimos"],
-			"rows": [[b.title, b.author, b.total_loans] for b in qs],
-		}
 	if report_type == "active_users":
-		qs = (
+		return (
+			"Usuários Mais Ativos",
+			["Usuário", "Empréstimos"],
 			User.objects.annotate(total_loans=Count("loans"))
 			.filter(total_loans__gt=0)
-			.order_by("-total_loans", "username")[:50]
+			.order_by("-total_loans", "username")[:50],
+			lambda u: [str(u), u.total_loans],
 		)
-		return {
-			"title": f"Usuários Mais Ativos ({now_str})",
-			"headers": ["Usuário", "Empréstimos"],
-			"rows": [[str(u), u.total_loans] for u in qs],
-		}
 	if report_type == "overdue_loans":
-		qs = (
+		today = timezone.localdate()
+		return (
+			"Empréstimos Atrasados",
+			["Livro", "Usuário", "Devolver até", "Dias atraso"],
 			Loan.objects.select_related("book", "user")
-			.filter(returned_at__isnull=True, due_date__lt=timezone.localdate())
-			.order_by("due_date")
-		)
-		return {
-			"title": f"Empréstimos Atrasados ({now_str})",
-			"headers": ["Livro", "Usuário", "Devolver até", "Dias atraso"],
-			"rows": [
-				[
-					l.book.title,
-					str(l.user),
-					l.due_date.strftime("%d/%m/%Y"),
-					(timezone.localdate() - l.due_date).days,
-				]
-				for l in qs
+			.filter(returned_at__isnull=True, due_date__lt=today)
+			.order_by("due_date"),
+			lambda l: [
+				l.book.title,
+				str(l.user),
+				l.due_date.strftime("%d/%m/%Y"),
+				(today - l.due_date).days,
 			],
-		}
-	return {"title": "Relatório vazio", "headers": [], "rows": []}
+		)
+	return None
+
+
+def _dataset(title, headers, rows):
+	now_str = timezone.localtime().strftime("%d/%m/%Y %H:%M")
+	return {"title": f"{title} ({now_str})", "headers": headers, "rows": rows}
+
+
+def build_report_dataset(report_type: str):
+	"""Retorna dict com title, headers, rows para cada tipo de relatório."""
+	spec = _report_spec(report_type)
+	if spec is None:
+		return {"title": "Relatório vazio", "headers": [], "rows": []}
+	title, headers, qs, row = spec
+	return _dataset(title, headers, [row(obj) for obj in qs])
+
+
+async def abuild_report_dataset(report_type: str):
+	"""Versão assíncrona de `build_report_dataset` (ORM assíncrono, `async for`)."""
+	spec = _report_spec(report_type)
+	if spec is None:
+		return {"title": "Relatório vazio", "headers": [], "rows": []}
+	title, headers, qs, row = spec
+	return _dataset(title, headers, [row(obj) async for obj in qs])
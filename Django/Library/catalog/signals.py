@@ -0,0 +1,61 @@
+"""Receptores de sinais do app catalog.
+
+Conectados em `CatalogConfig.ready()`. Aqui invalidamos os carimbos de versão
+(`versioning.py`) usados pelo cache HTTP das páginas do catálogo e contamos
+as conexões abertas com o banco (`metrics.py`).
+"""
+
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import metrics
+from .models import Book, Category, Hold, Loan, Review
+from .versioning import bump_book_version, bump_catalog_version, bump_facets_version, bump_user_loans_version
+
+
+@receiver([post_save, post_delete], sender=Book)
+def book_changed(sender, instance, **kwargs):
+	bump_book_version(instance.pk)
+	bump_catalog_version()
+	bump_facets_version()
+
+
+@receiver([post_save, post_delete], sender=Loan)
+def loan_changed(sender, instance, **kwargs):
+	# Empréstimos mudam a disponibilidade exibida na lista e no detalhe
+	bump_book_version(instance.book_id)
+	bump_catalog_version()
+	# Livros já emprestados e contadores de "Meus empréstimos" do usuário
+	bump_user_loans_version(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Review)
+def review_changed(sender, instance, **kwargs):
+	# Avaliações aparecem apenas no detalhe do livro
+	bump_book_version(instance.book_id)
+
+
+@receiver([post_save, post_delete], sender=Hold)
+def hold_changed(sender, instance, **kwargs):
+	# A fila de reservas aparece no detalhe do livro. A lista só muda quando
+	# uma reserva entra ou sai de `ready` (cópia separada): `circulation`
+	# invalida a versão do catálogo nessas transições
+	bump_book_version(instance.book_id)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_changed(sender, instance, **kwargs):
+	bump_catalog_version()
+	bump_facets_version()
+
+
+DB_CONNECTIONS_OPENED = metrics.counter(
+	"library_db_connections_opened_total", "Conexões novas abertas com o banco.", ("alias",)
+)
+
+
+@receiver(connection_created)
+def db_connection_created(sender, connection, **kwargs):
+	# Com CONN_MAX_AGE/pool funcionando, este contador cresce bem devagar
+	DB_CONNECTIONS_OPENED.inc(alias=connection.alias)
@@ -1,10 +1,54 @@
+import tempfile
+from collections import Counter
 from datetime import timedelta
+from pathlib import Path
+from unittest import skipUnless
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.http import Http404, HttpResponse
+from django.conf import settings
+from django.test import AsyncClient, Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver
+from django.utils.module_loading import import_string
+from django.urls import reverse
 from django.utils import timezone
 
-from .models import Book, Loan
+from library.sqlite import sqlite_options
+from library.static_serving import serve_media, serve_static
+
+from . import circulation, metrics, recommendations
+from .cache_utils import cache_stats, get_or_set, reset_cache_stats, shared_cache
+from .db_routers import PIN_COOKIE_NAME, PrimaryReplicaRouter, ReplicaRoutingMiddleware, use_replica
+from .facets import compute_result_facets, get_catalog_facets
+from .fake_data import generate_library, historical_timestamps
+from .management.commands.benchmark_catalog import BENCHMARK_CACHES, percentile
+from .middleware import QueryProfilingMiddleware
+from .notifications import send_due_reminders, send_overdue_notices
+from .models import Book, BookNeighbor, Category, Hold, Loan, LoanNotification, Review, SearchQuery
+from .profiling import VIEW_STATS, QueryRecorder, profiling_settings, query_signature
+from .versioning import get_catalog_version
+from .views import (
+	REVIEWS_PAGE_SIZE, _book_list_etag, _book_list_last_modified, _encode_loan_cursor, _encode_review_cursor,
+)
+
+# Caches em memória em todos os testes: o cache em arquivo do desenvolvedor
+# (BASE_DIR/.cache) não é lido, gravado nem limpo pelos `clear()` abaixo
+_test_caches = override_settings(CACHES=BENCHMARK_CACHES)
+
+
+def setUpModule():
+	_test_caches.enable()
+
+
+def tearDownModule():
+	_test_caches.disable()
 
 
 class LoanModelTests(TestCase):
@@ -47,3 +91,1014 @@ class AuthViewsTests(TestCase):
 		resp_post = self.client.post("/logout/")
 		self.assertEqual(resp_post.status_code, 302)
 		self.assertIn("/login/", resp_post.headers.get("Location", ""))
+
+
+class StaticServingTests(TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.root = Path(self.tmp.name)
+		(self.root / "capa.jpg").write_bytes(b"jpeg-bytes")
+		(self.root / "site.0123456789ab.css").write_text("body{}" * 100)
+		(self.root / "site.0123456789ab.css.gz").write_bytes(b"gz-bytes")
+		self.addCleanup(self.tmp.cleanup)
+
+	def test_media_conditional_get_returns_304(self):
+		factory = RequestFactory()
+		with override_settings(MEDIA_ROOT=self.root):
+			resp = serve_media(factory.get("/media/capa.jpg"), "capa.jpg")
+			self.assertEqual(resp.status_code, 200)
+			etag = resp["ETag"]
+			resp.close()
+			resp_304 = serve_media(factory.get("/media/capa.jpg", HTTP_IF_NONE_MATCH=etag), "capa.jpg")
+			self.assertEqual(resp_304.status_code, 304)
+			self.assertEqual(resp_304["ETag"], etag)
+			with self.assertRaises(Http404):
+				serve_media(factory.get("/media/../settings.py"), "../settings.py")
+
+	def test_hashed_static_is_immutable_and_precompressed(self):
+		factory = RequestFactory()
+		with override_settings(STATIC_ROOT=self.root):
+			resp = serve_static(factory.get("/static/x", HTTP_ACCEPT_ENCODING="gzip, br"), "site.0123456789ab.css")
+			self.assertIn("immutable", resp["Cache-Control"])
+			self.assertEqual(resp["Content-Encoding"], "gzip")
+			self.assertEqual(b"".join(resp.streaming_content), b"gz-bytes")
+			# Cada variante tem o próprio ETag; o 304 também varia por Accept-Encoding
+			self.assertTrue(resp["ETag"].endswith('-gz"'))
+			plain = serve_static(factory.get("/static/x"), "site.0123456789ab.css")
+			self.assertNotEqual(plain["ETag"], resp["ETag"])
+			plain.close()
+			resp_304 = serve_static(
+				factory.get("/static/x", HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=resp["ETag"]), "site.0123456789ab.css"
+			)
+			self.assertEqual(resp_304.status_code, 304)
+			self.assertIn("Accept-Encoding", resp_304["Vary"])
+
+	def test_precompressed_variant_respects_q_zero(self):
+		factory = RequestFactory()
+		with override_settings(STATIC_ROOT=self.root):
+			for header in ("gzip;q=0", "gzip; q=0, *", "x-gzip", "identity"):
+				resp = serve_static(factory.get("/static/x", HTTP_ACCEPT_ENCODING=header), "site.0123456789ab.css")
+				self.assertFalse(resp.has_header("Content-Encoding"), header)
+				resp.close()
+			resp = serve_static(factory.get("/static/x", HTTP_ACCEPT_ENCODING="br;q=0, *;q=0.5"), "site.0123456789ab.css")
+			self.assertEqual(resp["Content-Encoding"], "gzip")
+			resp.close()
+
+
+class ConditionalGetTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		shared_cache().clear()
+		self.user = get_user_model().objects.create_user("u3", password="pass")
+		self.book = Book.objects.create(title="Cache", author="Autor", isbn="1111111111111", copies_total=1)
+		self.client.login(username="u3", password="pass")
+		# Primeira visita define o cookie CSRF (que faz parte do ETag)
+		self.client.get(reverse("catalog:book_list"))
+
+	def test_book_detail_returns_304_until_book_changes(self):
+		url = reverse("catalog:book_detail", args=[self.book.id])
+		resp = self.client.get(url)
+		self.assertEqual(resp.status_code, 200)
+		etag = resp["ETag"]
+		self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+		# Um empréstimo muda a disponibilidade: a versão do livro é carimbada de novo
+		Loan.objects.create(book=self.book, user=self.user, due_date=timezone.localdate() + timedelta(days=7))
+		resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(resp.status_code, 200)
+		self.assertNotEqual(resp["ETag"], etag)
+
+	def test_book_detail_works_without_login(self):
+		self.client.logout()
+		Review.objects.create(book=self.book, user=self.user, rating=4, comment="Bom")
+		for name in ("catalog:book_detail", "catalog:async_book_detail"):
+			resp = self.client.get(reverse(name, args=[self.book.id]))
+			self.assertContains(resp, "Bom")
+			self.assertIsNone(resp.context["user_review"])
+
+	def test_book_list_etag_depends_on_query_and_catalog_version(self):
+		url = reverse("catalog:book_list")
+		etag = self.client.get(url)["ETag"]
+		self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+		self.assertEqual(self.client.get(url + "?q=Cache", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+		Book.objects.create(title="Outro", author="Autor", isbn="2222222222222")
+		self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class CacheLayerTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		shared_cache().clear()
+		reset_cache_stats()
+
+	def test_get_or_set_computes_once_and_counts_hits_per_prefix(self):
+		calls = []
+
+		def compute():
+			calls.append(1)
+			return ["a", "b"]
+
+		for _ in range(3):
+			self.assertEqual(get_or_set("catalog:test:1", compute, beta=0), ["a", "b"])
+		self.assertEqual(len(calls), 1)
+		stats = cache_stats()["catalog:test"]
+		self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+		# O nível compartilhado atende outro processo (aqui: local limpo)
+		cache.clear()
+		self.assertEqual(get_or_set("catalog:test:1", compute, beta=0), ["a", "b"])
+		self.assertEqual(len(calls), 1)
+
+	def test_advanced_search_categories_invalidated_by_catalog_version(self):
+		get_user_model().objects.create_user("u4", password="pass")
+		self.client.login(username="u4", password="pass")
+		Category.objects.create(name="Romance")
+		self.client.get(reverse("catalog:advanced_search"))
+		# Apenas sessão + usuário: categorias e idiomas vêm do cache
+		with self.assertNumQueries(2):
+			resp = self.client.get(reverse("catalog:advanced_search"))
+		self.assertContains(resp, "Romance")
+		Category.objects.create(name="Poesia")
+		self.assertContains(self.client.get(reverse("catalog:advanced_search")), "Poesia")
+
+
+class FacetServiceTests(TestCase):
+	def setUp(self):
+		shared_cache().clear()
+		cache.clear()
+
+	def test_facets_count_values_and_refresh_after_book_changes(self):
+		romance = Category.objects.create(name="Romance")
+		Book.objects.create(title="A", author="X", isbn="3000000000001", category=romance, language="Português", publisher="Ed1", edition_year=1990)
+		Book.objects.create(title="B", author="Y", isbn="3000000000002", category=romance, language="Inglês", edition_year=2020)
+		facets = get_catalog_facets()
+		self.assertEqual(facets["categories"], [{"id": romance.id, "name": "Romance", "book_count": 2}])
+		self.assertEqual([l["value"] for l in facets["languages"]], ["Inglês", "Português"])
+		self.assertEqual(facets["publishers"], [{"value": "Ed1", "count": 1}])
+		self.assertEqual(facets["edition_years"], {"min": 1990, "max": 2020})
+		with self.assertNumQueries(0):
+			get_catalog_facets()
+		Book.objects.create(title="C", author="Z", isbn="3000000000003", language="Português")
+		self.assertEqual(get_catalog_facets()["languages"][1], {"value": "Português", "count": 2})
+
+
+class ResultFacetsTests(TestCase):
+	def setUp(self):
+		shared_cache().clear()
+		cache.clear()
+		self.user = get_user_model().objects.create_user("u5", password="pass")
+		self.client.login(username="u5", password="pass")
+		self.romance = Category.objects.create(name="Romance")
+		self.poesia = Category.objects.create(name="Poesia")
+		a = Book.objects.create(title="A", author="X", isbn="4000000000001", category=self.romance, language="Português", edition_year=1995)
+		Book.objects.create(title="B", author="X", isbn="4000000000002", category=self.romance, language="Inglês", edition_year=2001)
+		Book.objects.create(title="C", author="Y", isbn="4000000000003", category=self.poesia, language="Português", edition_year=1999)
+		Loan.objects.create(book=a, user=self.user, due_date=timezone.localdate() + timedelta(days=7))
+
+	def test_book_list_facet_counts_for_current_result(self):
+		resp = self.client.get(reverse("catalog:book_list"), {"q": "X"})
+		facets = resp.context["result_facets"]
+		self.assertEqual(resp.context["total_count"], 2)
+		self.assertEqual([(f["label"], f["count"]) for f in facets["categories"]], [("Romance", 2)])
+		self.assertEqual([(f["label"], f["count"]) for f in facets["languages"]], [("Inglês", 1), ("Português", 1)])
+		self.assertEqual([f["label"] for f in facets["year_buckets"]], ["1990–1999", "2000–2009"])
+		self.assertEqual((facets["available"]["count"], facets["unavailable"]), (1, 1))
+		self.assertIn("idioma=Ingl%C3%AAs", facets["languages"][0]["url"])
+		resp = self.client.get(reverse("catalog:book_list"), {"disponivel": "1", "ordenar": "disponibilidade"})
+		self.assertEqual([b.title for b in resp.context["books"]], ["B", "C"])
+
+	def test_result_facets_use_a_single_grouped_query(self):
+		qs = circulation.with_availability(Book.objects.all())
+		with self.assertNumQueries(1):
+			facets = compute_result_facets(qs)
+		self.assertEqual(facets["total"], 3)
+		self.assertEqual(facets["categories"], {self.romance.id: 2, self.poesia.id: 1})
+
+
+class SqliteProfileTests(TestCase):
+	def test_production_profile_builds_init_command(self):
+		options = sqlite_options("production", busy_timeout=30000)
+		self.assertIn("PRAGMA journal_mode=WAL", options["init_command"])
+		self.assertIn("PRAGMA busy_timeout=30000", options["init_command"])
+		self.assertEqual(options["timeout"], 30)
+		self.assertEqual(options["transaction_mode"], "IMMEDIATE")
+		self.assertEqual(sqlite_options("legacy"), {})
+		with self.assertRaises(ValueError):
+			sqlite_options("turbo")
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRouterTests(TestCase):
+	def test_reads_go_to_replica_only_when_enabled(self):
+		router = PrimaryReplicaRouter()
+		self.assertIsNone(router.db_for_read(Book))
+		with use_replica():
+			self.assertEqual(router.db_for_read(Book), "replica")
+			self.assertIsNone(router.db_for_read(get_user_model()))
+			self.assertEqual(router.db_for_write(Book), "default")
+		self.assertFalse(router.allow_migrate("replica", "catalog"))
+
+	def test_middleware_routes_read_views_and_pins_after_writes(self):
+		seen = []
+		router = PrimaryReplicaRouter()
+		middleware = ReplicaRoutingMiddleware(lambda request: seen.append(router.db_for_read(Book)) or HttpResponse())
+		factory = RequestFactory()
+		middleware(factory.get(reverse("catalog:book_list")))
+		middleware(factory.get(reverse("catalog:my_loans")))
+		response = middleware(factory.post(reverse("catalog:borrow_book", args=[1])))
+		self.assertIn(PIN_COOKIE_NAME, response.cookies)
+		pinned = factory.get(reverse("catalog:book_list"))
+		pinned.COOKIES[PIN_COOKIE_NAME] = "1"
+		middleware(pinned)
+		self.assertEqual(seen, ["replica", None, None, None])
+
+	def test_versioned_caches_are_not_filled_from_the_replica(self):
+		router = PrimaryReplicaRouter()
+		seen = []
+		with use_replica():
+			get_or_set(f"catalog:replica-test:{timezone.now().timestamp()}", lambda: seen.append(router.db_for_read(Book)))
+		self.assertEqual(seen, [None])
+		# Página lida da réplica sai sem ETag nem Last-Modified
+		request = RequestFactory().get(reverse("catalog:book_list"))
+		request.user = get_user_model().objects.create_user("leitor", password="pass")
+		self.assertIsNotNone(_book_list_etag(request))
+		with use_replica():
+			self.assertIsNone(_book_list_etag(request))
+			self.assertIsNone(_book_list_last_modified(request))
+
+
+class ConnectionMetricsTests(TestCase):
+	def test_connection_acquisition_is_measured_on_first_query(self):
+		metrics.reset()
+		# Sem sessão nem consultas: nada é medido (e nenhuma conexão é pedida)
+		with CaptureQueriesContext(connection) as queries:
+			self.client.get(reverse("login"))
+		self.assertEqual(len(queries), 0)
+		self.assertEqual(metrics.snapshot().get("library_db_connection_acquire_seconds", []), [])
+		get_user_model().objects.create_user("conexao", password="pass")
+		self.client.login(username="conexao", password="pass")
+		self.client.get(reverse("catalog:book_list"))
+		samples = metrics.snapshot()["library_db_connection_acquire_seconds"]
+		self.assertEqual(sum(value["count"] for _labels, value in samples), 1)
+		self.assertEqual(samples[0][0], {"alias": "default", "outcome": "reused"})
+
+
+@override_settings(QUERY_PROFILING={"ENABLED": True, "DUPLICATE_THRESHOLD": 2})
+class QueryProfilingTests(TestCase):
+	def setUp(self):
+		VIEW_STATS.clear()
+		self.staff = get_user_model().objects.create_user("staff", password="pass", is_staff=True)
+
+	def test_profiles_requests_and_flags_repeated_queries(self):
+		middleware = QueryProfilingMiddleware(
+			lambda request: [Book.objects.filter(pk=i).first() for i in range(3)] and HttpResponse()
+		)
+		with self.assertLogs("catalog.profiling", "WARNING") as logs:
+			response = middleware(RequestFactory().get("/qualquer/"))
+		self.assertIn("possível N+1", logs.output[0])
+		self.assertEqual(response["X-DB-Query-Count"], "3")
+		# Caminhos sem rota dividem um rótulo fixo (o caminho fica só no log)
+		with self.assertLogs("catalog.profiling", "WARNING"):
+			middleware(RequestFactory().get("/outro/"))
+		row = VIEW_STATS.rows()[0]
+		self.assertEqual((row["view"], row["requests"], row["n_plus_one_requests"]), ("<não resolvida>", 2, 2))
+
+	def test_staff_page_lists_view_stats(self):
+		self.client.login(username="staff", password="pass")
+		VIEW_STATS.record("catalog:book_list", {"count": 7, "db_ms": 3.0, "duplicates": [], "slowest": []}, profiling_settings())
+		resp = self.client.get(reverse("catalog:admin_query_profile"))
+		self.assertContains(resp, "catalog:book_list")
+		self.client.post(reverse("catalog:admin_query_profile"))
+		# Só resta o próprio POST (perfilado depois de zerar)
+		self.assertEqual([row["view"] for row in VIEW_STATS.rows()], ["catalog:admin_query_profile"])
+
+
+@override_settings(METRICS_TOKEN="segredo")
+class MetricsEndpointTests(TestCase):
+	def setUp(self):
+		metrics.reset()
+		self.user = get_user_model().objects.create_user("u6", password="pass")
+		book = Book.objects.create(title="M", author="A", isbn="5000000000001")
+		Loan.objects.create(book=book, user=self.user, due_date=timezone.localdate())
+
+	def test_metrics_requires_token_and_exposes_request_histograms(self):
+		self.assertEqual(self.client.get("/metrics").status_code, 404)
+		self.client.login(username="u6", password="pass")
+		self.client.get(reverse("catalog:book_list"), {"export": "csv"})
+		resp = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer segredo")
+		self.assertEqual(resp.status_code, 200)
+		body = resp.content.decode()
+		self.assertIn('library_http_request_duration_seconds_count{view="catalog:book_list",method="GET",status="200"} 1', body)
+		self.assertIn('library_export_duration_seconds_count{export="books",format="csv"} 1', body)
+		self.assertIn("library_active_loans 1", body)
+		self.assertIn('library_db_queries_per_request_bucket{view="catalog:book_list",le="+Inf"} 1', body)
+
+
+class BenchmarkToolsTests(TestCase):
+	def test_generator_is_deterministic_by_seed(self):
+		counts = generate_library(books=30, users=5, loans=40, reviews=10, searches=10, seed=3)
+		self.assertEqual(counts["books"], 30)
+		self.assertEqual(Loan.objects.count(), 40)
+		first = list(Book.objects.order_by("isbn").values_list("title", "language", "copies_total"))
+		Book.objects.all().delete()
+		generate_library(books=30, users=0, loans=0, reviews=0, searches=0, seed=3)
+		self.assertEqual(list(Book.objects.order_by("isbn").values_list("title", "language", "copies_total")), first)
+
+	def test_generator_distributions(self):
+		generate_library(books=50, users=20, loans=2000, reviews=0, searches=0, seed=5, active_ratio=0.5)
+		books = Book.objects.annotate(active=circulation.active_loans_subquery(), total=Count("loans")).order_by("-total")
+		# Cópias nunca são ultrapassadas pelos empréstimos em aberto
+		self.assertFalse([b for b in books if b.active > b.copies_total])
+		# Zipf: o livro mais popular tem bem mais empréstimos que a mediana
+		totals = [b.total for b in books]
+		self.assertGreater(totals[0], 5 * totals[len(totals) // 2])
+
+	def test_percentile_nearest_rank(self):
+		values = list(range(1, 101))
+		self.assertEqual(percentile(values, 50), 50)
+		self.assertEqual(percentile(values, 99), 99)
+		self.assertEqual(percentile([7], 95), 7)
+
+
+class QueryCountRegressionTests(TestCase):
+	"""Cada rota do catalog deve executar o mesmo número de consultas com poucas ou muitas linhas.
+
+	Se uma view ou template passar a consultar o banco por linha (N+1), a
+	contagem cresce com o tamanho dos dados e o teste falha mostrando quais
+	consultas (SQL normalizada) apareceram a mais.
+	"""
+
+	SMALL, LARGE = 3, 12
+
+	def setUp(self):
+		User = get_user_model()
+		self.reader = User.objects.create_user("leitor", password="pass")
+		self.staff = User.objects.create_user("equipe", password="pass", is_staff=True)
+		self.category = Category.objects.create(name="Geral")
+		self.books, self.reviewers = [], []
+		self._grow(self.SMALL)
+		self.target = self.books[0]
+		self.own_review = Review.objects.create(book=self.books[1], user=self.reader, rating=4)
+		# Livro sem cópias livres para o leitor reservar (a reserva é cancelada no caso seguinte)
+		self.popular = Book.objects.create(title="Popular", author="A", isbn="7799999999999", copies_total=1)
+		Loan.objects.create(book=self.popular, user=self.staff, due_date=timezone.localdate() + timedelta(days=7))
+		self.clients = {"anon": Client(), "reader": Client(), "staff": Client()}
+		self.clients["reader"].force_login(self.reader)
+		self.clients["staff"].force_login(self.staff)
+
+	def _grow(self, size):
+		"""Acrescenta linhas até `size` livros, cada um com empréstimos, avaliação e busca."""
+		today = timezone.localdate()
+		past = timezone.now() - timedelta(days=30)
+		with historical_timestamps(Loan._meta.get_field("borrowed_at")):
+			for i in range(len(self.books), size):
+				book = Book.objects.create(
+					title=f"Livro {i}", author=f"Autor {i}", isbn=f"77{i:011d}", copies_total=3,
+					category=self.category, language="Português", edition_year=1990 + i,
+				)
+				self.books.append(book)
+				reviewer = get_user_model().objects.create_user(f"revisor{i}")
+				self.reviewers.append(reviewer)
+				# Em aberto (atrasado), devolvido e um empréstimo de outro leitor no livro-alvo
+				Loan.objects.create(book=book, user=self.reader, borrowed_at=past, due_date=today - timedelta(days=5))
+				Loan.objects.create(
+					book=book, user=self.reader, borrowed_at=past, due_date=past.date() + timedelta(days=14),
+					returned_at=past + timedelta(days=3),
+				)
+				Loan.objects.create(book=self.books[0], user=reviewer, borrowed_at=past, due_date=today - timedelta(days=1))
+				Review.objects.create(book=self.books[0], user=reviewer, rating=1 + i % 5, comment="ok")
+				SearchQuery.objects.create(user=self.reader, q=f"livro {i}", params={"idioma": "Português"})
+		# Vizinhos pré-calculados: o detalhe e "meus empréstimos" exibem recomendações
+		recommendations.compute_loan_neighbors()
+
+	def _active_loan_id(self):
+		return Loan.objects.filter(user=self.reader, returned_at__isnull=True).values_list("id", flat=True).first()
+
+	def _open_hold_id(self):
+		# A reserva feita no caso place_hold
+		return Hold.objects.get(book=self.popular, user=self.reader, status__in=Hold.OPEN_STATUSES).id
+
+	def _cases(self):
+		"""(rota, descrição, cliente, método, função que monta a URL)."""
+		book = lambda: self.target.id
+		return [
+			("book_list", "lista", "reader", "get", lambda: reverse("catalog:book_list")),
+			("book_list", "busca", "reader", "get", lambda: reverse("catalog:book_list") + "?q=Livro&disponivel=1"),
+			("book_list", "sugestões", "reader", "get", lambda: reverse("catalog:book_list") + "?suggest=1&q=Liv"),
+			("book_list", "csv", "reader", "get", lambda: reverse("catalog:book_list") + "?export=csv"),
+			("book_list", "xlsx", "reader", "get", lambda: reverse("catalog:book_list") + "?export=xlsx"),
+			("book_detail", "detalhe", "reader", "get", lambda: reverse("catalog:book_detail", args=[book()])),
+			("book_reviews", "página", "reader", "get", lambda: reverse("catalog:book_reviews", args=[book()])),
+			("book_reviews", "cursor", "reader", "get", lambda: reverse("catalog:book_reviews", args=[book()])
+				+ "?after=" + _encode_review_cursor(self.target.reviews.order_by("-created_at", "-id").first())),
+			("advanced_search", "form", "reader", "get", lambda: reverse("catalog:advanced_search")),
+			("search_history", "lista", "reader", "get", lambda: reverse("catalog:search_history")),
+			("search_history", "csv", "reader", "get", lambda: reverse("catalog:search_history") + "?export=csv"),
+			("signup", "form", "anon", "get", lambda: reverse("catalog:signup")),
+			("borrow_book", "post", "reader", "post", lambda: reverse("catalog:borrow_book", args=[self.books[-1].id])),
+			("return_book", "post", "reader", "post", lambda: reverse("catalog:return_book", args=[self._active_loan_id()])),
+			("my_loans", "lista", "reader", "get", lambda: reverse("catalog:my_loans")),
+			("my_loans", "histórico", "reader", "get", lambda: reverse("catalog:my_loans")
+				+ "?antes=" + _encode_loan_cursor(self.reader.loans.filter(returned_at__isnull=False).latest("returned_at"))),
+			("renew_loan", "post", "reader", "post", lambda: reverse("catalog:renew_loan", args=[self._active_loan_id()])),
+			("place_hold", "post", "reader", "post", lambda: reverse("catalog:place_hold", args=[self.popular.id])),
+			("cancel_hold", "post", "reader", "post", lambda: reverse("catalog:cancel_hold", args=[self._open_hold_id()])),
+			("admin_book_borrowers", "lista", "staff", "get", lambda: reverse("catalog:admin_book_borrowers", args=[book()])),
+			("admin_overdue_loans", "lista", "staff", "get", lambda: reverse("catalog:admin_overdue_loans")),
+			("admin_mark_returned", "post", "staff", "post", lambda: reverse("catalog:admin_mark_returned", args=[self._active_loan_id()])),
+			("admin_query_profile", "página", "staff", "get", lambda: reverse("catalog:admin_query_profile")),
+			("admin_batch_checkout", "form", "staff", "get", lambda: reverse("catalog:admin_batch_checkout")),
+			("add_review", "form", "reader", "get", lambda: reverse("catalog:add_review", args=[self.books[1].id])),
+			("delete_review", "confirmação", "reader", "get", lambda: reverse("catalog:delete_review", args=[self.own_review.id])),
+			("report_loans", "relatório", "staff", "get", lambda: reverse("catalog:report_loans")),
+			("report_popular_books", "relatório", "staff", "get", lambda: reverse("catalog:report_popular_books")),
+			("report_active_users", "relatório", "staff", "get", lambda: reverse("catalog:report_active_users")),
+			("report_overdue_loans", "relatório", "staff", "get", lambda: reverse("catalog:report_overdue_loans")),
+			("report_export", "xlsx", "staff", "get", lambda: reverse("catalog:report_export") + "?type=loans&format=xlsx"),
+			("api_books", "lista", "reader", "get", lambda: reverse("catalog:api_books")),
+			("api_book_detail", "detalhe", "reader", "get", lambda: reverse("catalog:api_book_detail", args=[book()])),
+			("api_book_reviews", "lista", "reader", "get", lambda: reverse("catalog:api_book_reviews", args=[book()])),
+			("api_my_loans", "lista", "reader", "get", lambda: reverse("catalog:api_my_loans")),
+			("async_book_list", "lista", "reader", "get", lambda: reverse("catalog:async_book_list")),
+			("async_book_list", "busca", "reader", "get", lambda: reverse("catalog:async_book_list") + "?q=Livro&disponivel=1"),
+			("async_book_list", "sugestões", "reader", "get", lambda: reverse("catalog:async_book_list") + "?suggest=1&q=Liv"),
+			("async_book_detail", "detalhe", "reader", "get", lambda: reverse("catalog:async_book_detail", args=[book()])),
+			("async_report_loans", "relatório", "staff", "get", lambda: reverse("catalog:async_report_loans")),
+			("async_report_popular_books", "relatório", "staff", "get", lambda: reverse("catalog:async_report_popular_books")),
+			("async_report_active_users", "relatório", "staff", "get", lambda: reverse("catalog:async_report_active_users")),
+			("async_report_overdue_loans", "relatório", "staff", "get", lambda: reverse("catalog:async_report_overdue_loans")),
+		]
+
+	def _measure(self):
+		results = {}
+		for route, label, client_name, method, url in self._cases():
+			# Caches frios: medimos o caminho completo da view
+			cache.clear()
+			shared_cache().clear()
+			# QueryRecorder guarda a SQL com %s no lugar dos valores: ids diferentes agrupam juntos
+			recorder = QueryRecorder()
+			path = url()
+			with connection.execute_wrapper(recorder):
+				response = getattr(self.clients[client_name], method)(path)
+			self.assertLess(response.status_code, 400, f"{route} ({label}) respondeu {response.status_code}")
+			results[(route, label)] = [query_signature(sql) for sql, _ in recorder.queries]
+		return results
+
+	def test_every_catalog_route_is_covered(self):
+		routes = {p.name for p in get_resolver("catalog.urls").url_patterns}
+		self.assertEqual(routes - {case[0] for case in self._cases()}, set(), "Adicione a rota nova em _cases()")
+
+	def test_query_count_does_not_grow_with_rows(self):
+		small = self._measure()
+		self._grow(self.LARGE)
+		large = self._measure()
+		failures = []
+		for key, queries in large.items():
+			if len(queries) != len(small[key]):
+				extra = Counter(queries) - Counter(small[key])
+				diff = "\n".join(f"    +{count}x {sql[:200]}" for sql, count in extra.most_common())
+				failures.append(f"{key[0]} ({key[1]}): {len(small[key])} -> {len(queries)} consultas\n{diff}")
+		if failures:
+			self.fail("Consultas por linha detectadas:\n" + "\n".join(failures))
+
+
+class ReviewPaginationTests(TestCase):
+	def setUp(self):
+		User = get_user_model()
+		self.reader = User.objects.create_user("pagina", password="pass")
+		self.book = Book.objects.create(title="Muito avaliado", author="A", isbn="9600000000000")
+		for i in range(REVIEWS_PAGE_SIZE * 2 + 5):
+			Review.objects.create(book=self.book, user=User.objects.create_user(f"aval{i}"), rating=1 + i % 5)
+		# Mesmo created_at para todas: o id desempata e nenhuma se repete entre páginas
+		Review.objects.update(created_at=timezone.now())
+		Loan.objects.create(book=self.book, user=self.reader, due_date=timezone.localdate() + timedelta(days=7))
+		self.client.login(username="pagina", password="pass")
+
+	def test_load_more_walks_every_review_once(self):
+		resp = self.client.get(reverse("catalog:book_detail", args=[self.book.id]))
+		self.assertTrue(resp.context["can_review"])
+		self.assertIsNone(resp.context["user_review"])
+		seen = [review.id for review in resp.context["reviews"]]
+		cursor = resp.context["next_cursor"]
+		self.assertEqual(len(seen), REVIEWS_PAGE_SIZE)
+		while cursor:
+			page = self.client.get(reverse("catalog:book_reviews", args=[self.book.id]), {"after": cursor})
+			seen += [review.id for review in page.context["reviews"]]
+			cursor = page.context["next_cursor"]
+		expected = list(self.book.reviews.order_by("-created_at", "-id").values_list("id", flat=True))
+		self.assertEqual(seen, expected)
+
+	def test_invalid_cursor_is_bad_request(self):
+		resp = self.client.get(reverse("catalog:book_reviews", args=[self.book.id]), {"after": "nada"})
+		self.assertEqual(resp.status_code, 400)
+
+
+class ReviewEligibilityTests(TestCase):
+	def setUp(self):
+		self.reader = get_user_model().objects.create_user("elegivel", password="pass")
+		self.read, self.unread = [
+			Book.objects.create(title=f"E{i}", author="A", isbn=f"97{i:011d}") for i in range(2)
+		]
+		Loan.objects.create(book=self.read, user=self.reader, due_date=timezone.localdate() + timedelta(days=7))
+
+	def test_bulk_check(self):
+		self.assertEqual(Book.users_can_review([self.read, self.unread], self.reader), {self.read.pk})
+		self.assertFalse(self.unread.user_can_review(self.reader))
+
+	def test_borrowed_set_cached_in_session_until_new_loan(self):
+		self.client.login(username="elegivel", password="pass")
+		self.assertEqual(self.client.get(reverse("catalog:add_review", args=[self.read.id])).status_code, 200)
+		with CaptureQueriesContext(connection) as ctx:
+			self.client.get(reverse("catalog:add_review", args=[self.read.id]))
+		self.assertFalse([q["sql"] for q in ctx.captured_queries if "catalog_loan" in q["sql"]])
+
+		self.assertEqual(self.client.get(reverse("catalog:add_review", args=[self.unread.id])).status_code, 302)
+		Loan.objects.create(book=self.unread, user=self.reader, due_date=timezone.localdate() + timedelta(days=7))
+		self.assertEqual(self.client.get(reverse("catalog:add_review", args=[self.unread.id])).status_code, 200)
+
+
+class RecommendationTests(TestCase):
+	def setUp(self):
+		User = get_user_model()
+		self.books = [Book.objects.create(title=f"Rec {i}", author="A", isbn=f"98{i:011d}") for i in range(5)]
+		self.readers = [User.objects.create_user(f"leitor{i}", password="pass") for i in range(3)]
+		# leitor0: 0,1,2 · leitor1: 0,1 · leitor2: 0,3
+		for reader, books in zip(self.readers, ((0, 1, 2), (0, 1), (0, 3))):
+			for i in books:
+				self._loan(reader, self.books[i])
+
+	def _loan(self, reader, book):
+		return Loan.objects.create(book=book, user=reader, due_date=timezone.localdate() + timedelta(days=7))
+
+	def _neighbors(self, book):
+		return list(recommendations.also_borrowed(book.pk).values_list("title", flat=True))
+
+	def test_cosine_neighbors_and_suggestions(self):
+		summary = recommendations.compute_loan_neighbors(top_k=2)
+		self.assertEqual(summary["books"], 4)
+		# Rec 2 tem 1 leitor em comum com Rec 0 e com Rec 1; o cosseno prefere
+		# Rec 1 (2 leitores) a Rec 0 (3 leitores, mais popular)
+		self.assertEqual(self._neighbors(self.books[2]), ["Rec 1", "Rec 0"])
+		self.assertEqual(BookNeighbor.objects.filter(book=self.books[0]).count(), 2)
+		# leitor2 (pegou 0 e 3): recomenda o que ainda não pegou
+		suggested = [book.title for book in recommendations.for_user(self.readers[2])]
+		self.assertEqual(suggested[0], "Rec 1")
+		self.assertNotIn("Rec 3", suggested)
+
+		self.client.login(username="leitor1", password="pass")
+		self.assertContains(self.client.get(reverse("catalog:book_detail", args=[self.books[2].id])), "também pegou")
+		self.assertContains(self.client.get(reverse("catalog:my_loans")), "Rec 2")
+
+	def test_incremental_run_rewrites_only_affected_books(self):
+		recommendations.compute_loan_neighbors()
+		since = recommendations.last_computed()
+		untouched = BookNeighbor.objects.get(book=self.books[3], rank=1).computed_at
+		self._loan(self.readers[1], self.books[4])
+		summary = recommendations.compute_loan_neighbors(since=since)
+		# Só os livros do leitor1 (0, 1 e o novo 4)
+		self.assertEqual(summary["books"], 3)
+		self.assertEqual(self._neighbors(self.books[4])[:1], ["Rec 1"])
+		self.assertEqual(BookNeighbor.objects.get(book=self.books[3], rank=1).computed_at, untouched)
+		# Notas iguais às de uma execução completa: a diagonal não depende dos leitores lidos
+		incremental = dict(BookNeighbor.objects.filter(book=self.books[1]).values_list("neighbor_id", "score"))
+		recommendations.compute_loan_neighbors()
+		full = dict(BookNeighbor.objects.filter(book=self.books[1]).values_list("neighbor_id", "score"))
+		self.assertEqual(incremental.keys(), full.keys())
+		for neighbor_id, score in full.items():
+			self.assertAlmostEqual(incremental[neighbor_id], score, places=5)
+
+	def test_empty_incremental_run_advances_the_window(self):
+		recommendations.compute_loan_neighbors()
+		first = recommendations.last_computed()
+		summary = recommendations.compute_loan_neighbors(since=first)
+		self.assertEqual((summary["books"], summary["neighbors"]), (0, 0))
+		self.assertGreater(recommendations.last_computed(), first)
+
+	def test_content_neighbors_and_only_new(self):
+		def book(title, author, **extra):
+			return Book.objects.create(title=title, author=author, isbn=f"99{Book.objects.count():011d}", **extra)
+
+		Book.objects.all().delete()  # só os livros deste teste (o IDF depende do acervo)
+		foundation = book("Fundação", "Isaac Asimov", series="Fundação")
+		empire = book("Fundação e Império", "Isaac Asimov", series="Fundação")
+		book("Cozinha Brasileira", "Rita Lobo", subject="Culinária")
+		recipes = book("Receitas de Cozinha", "Outra Autora", subject="Culinária")
+		recommendations.compute_content_neighbors(top_k=3)
+		self.assertEqual(list(recommendations.similar_books(foundation.pk).values_list("id", flat=True)), [empire.pk])
+
+		second = book("Segunda Fundação", "Isaac Asimov", series="Fundação")
+		summary = recommendations.compute_content_neighbors(top_k=3, only_new=True)
+		# O livro novo e os vizinhos dele (que passam a listá-lo)
+		self.assertEqual(summary["books"], 3)
+		self.assertIn(second.pk, recommendations.similar_books(foundation.pk).values_list("id", flat=True))
+
+		# Sem empréstimos em comum, o detalhe mostra os parecidos
+		self.client.login(username="leitor0", password="pass")
+		self.assertContains(self.client.get(reverse("catalog:book_detail", args=[recipes.id])), "Livros parecidos")
+
+	@skipUnless(recommendations._sparse_backend(), "NumPy/SciPy não instalados")
+	def test_sparse_and_python_engines_agree(self):
+		backend = recommendations._sparse_backend()
+		Book.objects.create(title="Dom Casmurro", author="Machado de Assis", isbn="9700000000001", subject="Romance")
+		Book.objects.create(title="Memórias Póstumas", author="Machado de Assis", isbn="9700000000002", subject="Romance")
+
+		def same(python, sparse):
+			self.assertEqual(python.keys(), sparse.keys())
+			for book_id, best in python.items():
+				self.assertEqual([other for other, _ in best], [other for other, _ in sparse[book_id]])
+				for (_, expected), (_, score) in zip(best, sparse[book_id]):
+					self.assertAlmostEqual(expected, score, places=5)
+
+		baskets, popularity = recommendations._baskets(), recommendations._readers_per_book()
+		rows = {book.pk for book in self.books}
+		same(
+			recommendations._loan_neighbors_python(baskets, popularity, rows, 3),
+			recommendations._loan_neighbors_sparse(*backend, baskets, popularity, rows, 3),
+		)
+		vectors = recommendations._tfidf_vectors()
+		same(
+			recommendations._content_neighbors_python(vectors, set(vectors), 3),
+			recommendations._content_neighbors_sparse(*backend, vectors, set(vectors), 3),
+		)
+
+
+class MyLoansDashboardTests(TestCase):
+	def setUp(self):
+		self.reader = get_user_model().objects.create_user("painel", password="pass")
+		self.today = timezone.localdate()
+		books = [Book.objects.create(title=f"P{i:02d}", author="A", isbn=f"93{i:011d}") for i in range(27)]
+		past = timezone.now() - timedelta(days=60)
+		with historical_timestamps(Loan._meta.get_field("borrowed_at")):
+			self.overdue = Loan.objects.create(
+				book=books[0], user=self.reader, borrowed_at=past, due_date=self.today - timedelta(days=2)
+			)
+			for i, book in enumerate(books[2:]):
+				Loan.objects.create(
+					book=book, user=self.reader, borrowed_at=past, due_date=past.date() + timedelta(days=14),
+					returned_at=past + timedelta(days=1, hours=i),
+				)
+		self.active = Loan.objects.create(book=books[1], user=self.reader, due_date=self.today + timedelta(days=7))
+		self.client.login(username="painel", password="pass")
+
+	def test_sections_and_history_pages(self):
+		resp = self.client.get(reverse("catalog:my_loans"))
+		self.assertEqual(resp.context["summary"], {"total": 27, "active": 1, "overdue": 1, "returned": 25})
+		self.assertEqual([loan.pk for loan in resp.context["overdue"]], [self.overdue.pk])
+		self.assertEqual([loan.pk for loan in resp.context["active"]], [self.active.pk])
+		history = list(resp.context["history"])
+		page = self.client.get(reverse("catalog:my_loans"), {"antes": resp.context["history_cursor"]})
+		history += page.context["history"]
+		self.assertIsNone(page.context["history_cursor"])
+		expected = self.reader.loans.filter(returned_at__isnull=False).order_by("-returned_at")
+		self.assertEqual([loan.pk for loan in history], [loan.pk for loan in expected])
+
+	def test_summary_cached_until_loans_change(self):
+		circulation.loan_summary(self.reader)
+		with self.assertNumQueries(0):
+			circulation.loan_summary(self.reader)
+		self.active.mark_returned()
+		self.assertEqual(circulation.loan_summary(self.reader)["returned"], 26)
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class OverdueNoticeTests(TestCase):
+	def setUp(self):
+		User = get_user_model()
+		self.ana = User.objects.create_user("ana", email="ana@example.com")
+		self.bia = User.objects.create_user("bia", email="bia@example.com")
+		self.sem_email = User.objects.create_user("sem_email")
+		past = timezone.now() - timedelta(days=30)
+		today = timezone.localdate()
+		with historical_timestamps(Loan._meta.get_field("borrowed_at")):
+			for i, user in enumerate([self.ana, self.ana, self.bia, self.sem_email]):
+				book = Book.objects.create(title=f"Atrasado {i}", author="A", isbn=f"66{i:011d}")
+				Loan.objects.create(book=book, user=user, borrowed_at=past, due_date=today - timedelta(days=2))
+			# Em dia: não deve gerar aviso
+			Loan.objects.create(book=book, user=self.bia, borrowed_at=past, due_date=today + timedelta(days=2))
+
+	def test_one_email_per_user_and_reruns_are_idempotent(self):
+		stats = send_overdue_notices(chunk_size=1)
+		self.assertEqual((stats["emails"], stats["loans"], stats["skipped_no_email"]), (2, 3, 1))
+		self.assertEqual(sorted(m.to[0] for m in mail.outbox), ["ana@example.com", "bia@example.com"])
+		ana_mail = next(m for m in mail.outbox if m.to == ["ana@example.com"])
+		self.assertIn("Atrasado 0", ana_mail.body)
+		self.assertIn("Atrasado 1", ana_mail.body)
+		self.assertEqual(LoanNotification.objects.count(), 3)
+
+		# Segunda execução: nada pendente além do usuário sem e-mail
+		stats = send_overdue_notices()
+		self.assertEqual(stats["emails"], 0)
+		self.assertEqual(len(mail.outbox), 2)
+
+	def test_failure_mid_chunk_records_what_was_sent(self):
+		class FailsOnSecond(LocmemEmailBackend):
+			def send_messages(self, messages):
+				if mail.outbox:
+					raise ConnectionError("SMTP caiu")
+				return super().send_messages(messages)
+
+		with self.assertRaises(ConnectionError):
+			send_overdue_notices(connection=FailsOnSecond())
+		# O primeiro e-mail (ana, 2 empréstimos) saiu e ficou registrado
+		self.assertEqual(len(mail.outbox), 1)
+		self.assertEqual(LoanNotification.objects.count(), 2)
+		# Na nova tentativa só a bia recebe; a ana não é avisada duas vezes
+		stats = send_overdue_notices()
+		self.assertEqual(stats["emails"], 1)
+		self.assertEqual([m.to[0] for m in mail.outbox], ["ana@example.com", "bia@example.com"])
+
+	def test_dry_run_sends_and_records_nothing(self):
+		stats = send_overdue_notices(dry_run=True)
+		self.assertEqual(stats["emails"], 2)
+		self.assertEqual(len(mail.outbox), 0)
+		self.assertFalse(LoanNotification.objects.exists())
+
+	def test_due_reminders_bucket_by_day_and_share_one_connection(self):
+		today = timezone.localdate()
+		book = Book.objects.create(title="Vence logo", author="A", isbn="6600000000099")
+		Loan.objects.create(book=book, user=self.ana, due_date=today + timedelta(days=1))
+		Loan.objects.create(book=book, user=self.ana, due_date=today + timedelta(days=5))  # fora da janela
+		# 1 consulta por balde (3 dias) + empréstimos e registro dos 2 baldes com dados
+		with self.assertNumQueries(3 + 2 * 2):
+			report = send_due_reminders(days=3)
+		self.assertEqual([b["loans"] for b in report["buckets"]], [1, 1, 0])
+		self.assertEqual(report["emails"], 2)
+		self.assertIn("Amanhã", next(m for m in mail.outbox if m.to == ["ana@example.com"]).body)
+		self.assertEqual(send_due_reminders(days=3)["emails"], 0)
+
+
+class HoldQueueTests(TestCase):
+	def setUp(self):
+		User = get_user_model()
+		self.owner, self.first, self.second = (User.objects.create_user(name, password="pass") for name in ("dono", "primeiro", "segundo"))
+		self.book = Book.objects.create(title="Disputado", author="A", isbn="8800000000001", copies_total=1)
+		self.loan = circulation.checkout(self.book, self.owner)
+
+	def test_return_promotes_next_in_line_and_reserves_the_copy(self):
+		first_hold = circulation.place_hold(self.book, self.first)
+		circulation.place_hold(self.book, self.second)
+		self.assertEqual(circulation.queue_position(first_hold), 1)
+
+		self.client.login(username="dono", password="pass")
+		self.client.post(reverse("catalog:return_book", args=[self.loan.id]))
+		first_hold.refresh_from_db()
+		self.assertEqual(first_hold.status, Hold.STATUS_READY)
+		# A cópia está separada: o segundo da fila não consegue emprestar, o primeiro sim
+		with self.assertRaises(circulation.CirculationError):
+			circulation.checkout(self.book, self.second)
+		circulation.checkout(self.book, self.first)
+		first_hold.refresh_from_db()
+		self.assertEqual(first_hold.status, Hold.STATUS_FULFILLED)
+
+	def test_expired_pickup_passes_copy_to_next_holder(self):
+		first_hold = circulation.place_hold(self.book, self.first)
+		second_hold = circulation.place_hold(self.book, self.second)
+		self.loan.mark_returned()
+		circulation.on_copies_returned([self.book.id])
+
+		stats = circulation.expire_holds(now=timezone.now() + timedelta(days=circulation.pickup_days() + 1))
+		self.assertEqual(stats, {"expired": 1, "promoted": 1})
+		first_hold.refresh_from_db()
+		second_hold.refresh_from_db()
+		self.assertEqual((first_hold.status, second_hold.status), (Hold.STATUS_EXPIRED, Hold.STATUS_READY))
+
+	def test_borrow_without_copies_redirects_to_hold_option(self):
+		self.client.login(username="primeiro", password="pass")
+		resp = self.client.post(reverse("catalog:borrow_book", args=[self.book.id]))
+		self.assertRedirects(resp, reverse("catalog:book_detail", args=[self.book.id]), fetch_redirect_response=False)
+		self.client.post(reverse("catalog:place_hold", args=[self.book.id]))
+		self.assertTrue(Hold.objects.filter(book=self.book, user=self.first, status=Hold.STATUS_WAITING).exists())
+
+	def test_only_ready_transitions_invalidate_the_catalog(self):
+		version = get_catalog_version()
+		waiting = circulation.place_hold(self.book, self.first)
+		circulation.cancel_hold(waiting)
+		self.assertEqual(get_catalog_version(), version)
+		circulation.place_hold(self.book, self.second)
+		self.loan.mark_returned()
+		version = get_catalog_version()
+		circulation.on_copies_returned([self.book.id])
+		self.assertNotEqual(get_catalog_version(), version)
+
+	def test_ready_hold_blocks_copy_for_other_readers(self):
+		circulation.place_hold(self.book, self.first)
+		self.loan.mark_returned()
+		circulation.on_copies_returned([self.book.id])
+		# A cópia devolvida está separada para o primeiro: o segundo vê "Reservar"
+		self.client.login(username="segundo", password="pass")
+		resp = self.client.get(reverse("catalog:book_detail", args=[self.book.id]))
+		self.assertEqual(resp.context["book"].copies_available, 0)
+		self.assertContains(resp, reverse("catalog:place_hold", args=[self.book.id]))
+		self.assertNotContains(resp, reverse("catalog:borrow_book", args=[self.book.id]))
+		resp = self.client.get(reverse("catalog:book_list"), {"disponivel": "1"})
+		self.assertEqual(list(resp.context["books"]), [])
+		self.assertEqual(resp.context["result_facets"]["available"]["count"], 0)
+		# Quem tem a reserva separada continua vendo "Emprestar"
+		self.client.login(username="primeiro", password="pass")
+		resp = self.client.get(reverse("catalog:book_list"))
+		self.assertContains(resp, reverse("catalog:borrow_book", args=[self.book.id]))
+		resp = self.client.get(reverse("catalog:book_detail", args=[self.book.id]))
+		self.assertContains(resp, reverse("catalog:borrow_book", args=[self.book.id]))
+
+
+class JsonApiTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		shared_cache().clear()
+		self.user = get_user_model().objects.create_user("api", password="pass")
+		category = Category.objects.create(name="Técnicos")
+		# Assunto longo: respostas curtas demais não são compactadas (o gzip do Django
+		# acrescenta bytes aleatórios e desiste quando o resultado fica maior)
+		self.book = Book.objects.create(
+			title="Django", author="A", isbn="9900000000001", copies_total=2, category=category,
+			subject="web " * 35, series="Guia " * 25,
+		)
+		Book.objects.create(title="Flask", author="B", isbn="9900000000002")
+		Loan.objects.create(book=self.book, user=self.user, due_date=timezone.localdate() + timedelta(days=3))
+		self.client.login(username="api", password="pass")
+
+	def test_requires_login(self):
+		self.client.logout()
+		self.assertEqual(self.client.get(reverse("catalog:api_books")).status_code, 401)
+
+	def test_books_list_with_field_selection_and_pagination(self):
+		resp = self.client.get(reverse("catalog:api_books"), {"fields": "title,available,category", "page_size": 1})
+		data = resp.json()
+		self.assertEqual((data["count"], data["pages"]), (2, 2))
+		self.assertEqual(data["results"], [{"title": "Django", "available": 1, "category": "Técnicos"}])
+		bad = self.client.get(reverse("catalog:api_books"), {"fields": "title,senha"})
+		self.assertEqual(bad.status_code, 400)
+
+	def test_detail_etag_and_gzip(self):
+		url = reverse("catalog:api_book_detail", args=[self.book.id])
+		resp = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+		self.assertEqual(resp["Content-Encoding"], "gzip")
+		self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=resp["ETag"]).status_code, 304)
+		data = self.client.get(url, {"fields": "available,reviews_count"}).json()
+		self.assertEqual(data, {"available": 1, "reviews_count": 0})
+		self.assertEqual(self.client.get(reverse("catalog:api_book_detail", args=[999])).status_code, 404)
+
+
+class AsyncViewsTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		shared_cache().clear()
+		self.user = get_user_model().objects.create_user("assinc", password="pass")
+		self.book = Book.objects.create(title="Python Assíncrono", author="Autor", isbn="9800000000001", copies_total=2)
+		Loan.objects.create(book=self.book, user=self.user, due_date=timezone.localdate() + timedelta(days=3))
+		Review.objects.create(book=self.book, user=self.user, rating=5, comment="Ótimo")
+		self.client.login(username="assinc", password="pass")
+		self.async_client = AsyncClient()
+		self.async_client.cookies = self.client.cookies
+
+	async def test_book_list_matches_sync_view(self):
+		query = "?q=Python&disponivel=1"
+		sync_resp = await sync_to_async(self.client.get)(reverse("catalog:book_list") + query)
+		resp = await self.async_client.get(reverse("catalog:async_book_list") + query)
+		self.assertEqual(resp.status_code, 200)
+		self.assertEqual([b.pk for b in resp.context["books"]], [b.pk for b in sync_resp.context["books"]])
+		self.assertEqual(resp.context["total_count"], 1)
+		self.assertEqual(await SearchQuery.objects.filter(user=self.user).acount(), 2)
+		suggest = await self.async_client.get(reverse("catalog:async_book_list") + "?suggest=1&q=Pyt")
+		self.assertEqual(suggest.json()["titles"], ["Python Assíncrono"])
+
+	async def test_book_detail_and_conditional_get(self):
+		url = reverse("catalog:async_book_detail", args=[self.book.pk])
+		await self.async_client.get(url)  # o primeiro acesso define o cookie CSRF (parte do ETag)
+		resp = await self.async_client.get(url)
+		self.assertContains(resp, "Ótimo")
+		self.assertTrue(resp.context["can_review"])
+		self.assertEqual(resp.context["book"].copies_available, 1)
+		again = await self.async_client.get(url, headers={"if-none-match": resp["ETag"]})
+		self.assertEqual(again.status_code, 304)
+		missing = await self.async_client.get(reverse("catalog:async_book_detail", args=[999]))
+		self.assertEqual(missing.status_code, 404)
+
+	async def test_reports_are_staff_only(self):
+		resp = await self.async_client.get(reverse("catalog:async_report_loans"))
+		self.assertEqual(resp.status_code, 404)
+
+	def test_middleware_stack_is_async_capable(self):
+		# Um middleware só síncrono faria o ASGI rodar as views assíncronas numa thread
+		sync_only = [path for path in settings.MIDDLEWARE if not getattr(import_string(path), "async_capable", False)]
+		self.assertEqual(sync_only, [])
+
+
+class BatchCheckoutTests(TestCase):
+	def setUp(self):
+		User = get_user_model()
+		self.staff = User.objects.create_user("balcao", password="pass", is_staff=True)
+		self.reader = User.objects.create_user("leitora", password="pass")
+		self.other = User.objects.create_user("outro", password="pass")
+		self.books = [
+			Book.objects.create(title=f"Pilha {i}", author="A", isbn=f"96{i:011d}", copies_total=1) for i in range(6)
+		]
+		self.client.login(username="balcao", password="pass")
+
+	def test_per_item_results_and_hold_fulfilment(self):
+		taken, reserved, free = self.books[0], self.books[1], self.books[2]
+		Loan.objects.create(book=taken, user=self.other, due_date=timezone.localdate() + timedelta(days=3))
+		Hold.objects.create(book=reserved, user=self.reader, position=1, status=Hold.STATUS_READY)
+		results = circulation.batch_checkout(
+			self.reader, [str(taken.pk), reserved.isbn, str(free.pk), free.isbn, "0000000000"]
+		)
+		self.assertEqual(
+			[(r["book"] and r["book"].pk, bool(r["loan"]), r["error"]) for r in results],
+			[
+				(taken.pk, False, "Não há cópias disponíveis para empréstimo."),
+				(reserved.pk, True, None),
+				(free.pk, True, None),
+				(free.pk, False, "Livro repetido nesta lista."),
+				(None, False, "Livro não encontrado."),
+			],
+		)
+		self.assertEqual(Loan.objects.filter(user=self.reader, returned_at__isnull=True).count(), 2)
+		self.assertEqual(Hold.objects.get(book=reserved).status, Hold.STATUS_FULFILLED)
+
+	def test_query_count_does_not_depend_on_stack_size(self):
+		# Disponibilidade, INSERT em lote e UPDATE das reservas + SAVEPOINT/RELEASE do TestCase
+		with self.assertNumQueries(5):
+			circulation.batch_checkout(self.other, [b.isbn for b in self.books[:2]])
+		with self.assertNumQueries(5):
+			circulation.batch_checkout(self.reader, [b.isbn for b in self.books[2:]])
+
+	def test_json_endpoint(self):
+		resp = self.client.post(
+			reverse("catalog:admin_batch_checkout"),
+			{"user": "leitora", "books": f"{self.books[0].isbn}\n{self.books[1].pk}"},
+			HTTP_ACCEPT="application/json",
+		)
+		data = resp.json()
+		self.assertEqual(data["borrowed"], 2)
+		self.assertEqual([r["title"] for r in data["results"]], ["Pilha 0", "Pilha 1"])
+		bad = self.client.post(reverse("catalog:admin_batch_checkout"), {"user": "ninguem", "books": "1"}, HTTP_ACCEPT="application/json")
+		self.assertEqual(bad.status_code, 400)
+		self.client.logout()
+		self.client.login(username="leitora", password="pass")
+		self.assertEqual(self.client.get(reverse("catalog:admin_batch_checkout")).status_code, 302)
+
+
+class LoanRenewalTests(TestCase):
+	def setUp(self):
+		User = get_user_model()
+		self.reader = User.objects.create_user("renova", password="pass")
+		self.waiting = User.objects.create_user("fila", password="pass")
+		self.today = timezone.localdate()
+		self.books = [Book.objects.create(title=f"R{i}", author="A", isbn=f"95{i:011d}") for i in range(4)]
+
+	def _loan(self, book, due_in, renewals=0):
+		return Loan.objects.create(
+			book=book, user=self.reader, due_date=self.today + timedelta(days=due_in), renewals=renewals
+		)
+
+	def test_bulk_renewal_skips_limit_and_holds(self):
+		soon = self._loan(self.books[0], 1)
+		later = self._loan(self.books[1], 15)  # vence exatamente na data nova de `soon`
+		at_limit = self._loan(self.books[2], 1, renewals=2)
+		held = self._loan(self.books[3], 1)
+		Hold.objects.create(book=self.books[3], user=self.waiting, position=1)
+		# No limite e com fila: conta só como "no limite", não duas vezes
+		Hold.objects.create(book=self.books[2], user=self.waiting, position=1)
+
+		summary = circulation.renew_loans(Loan.objects.all(), today=self.today)
+		self.assertEqual(
+			{k: summary[k] for k in ("open", "renewed", "at_limit", "blocked_by_holds", "updates")},
+			{"open": 4, "renewed": 2, "at_limit": 1, "blocked_by_holds": 1, "updates": 2},
+		)
+		for loan in (soon, later, at_limit, held):
+			loan.refresh_from_db()
+		# Cada um renovado uma única vez, a partir do próprio vencimento
+		self.assertEqual((soon.due_date, soon.renewals), (self.today + timedelta(days=15), 1))
+		self.assertEqual((later.due_date, later.renewals), (self.today + timedelta(days=29), 1))
+		self.assertEqual(at_limit.renewals, 2)
+		self.assertEqual(held.due_date, self.today + timedelta(days=1))
+
+	def test_overdue_loans_share_a_single_update(self):
+		with historical_timestamps(Loan._meta.get_field("borrowed_at")):
+			for days_late, book in enumerate(self.books[:3], start=1):
+				Loan.objects.create(
+					book=book, user=self.reader, borrowed_at=timezone.now() - timedelta(days=30),
+					due_date=self.today - timedelta(days=days_late),
+				)
+		future = self._loan(self.books[3], 3)
+		summary = circulation.renew_loans(Loan.objects.all(), today=self.today)
+		# Três vencidos em datas distintas num UPDATE, o futuro em outro
+		self.assertEqual((summary["renewed"], summary["updates"]), (4, 2))
+		overdue = Loan.objects.exclude(pk=future.pk)
+		self.assertEqual(set(overdue.values_list("due_date", flat=True)), {self.today + timedelta(days=14)})
+		future.refresh_from_db()
+		self.assertEqual(future.due_date, self.today + timedelta(days=17))
+
+	def test_overdue_loan_renews_from_today_and_view_reports_reason(self):
+		with historical_timestamps(Loan._meta.get_field("borrowed_at")):
+			loan = Loan.objects.create(
+				book=self.books[0], user=self.reader, borrowed_at=timezone.now() - timedelta(days=20),
+				due_date=self.today - timedelta(days=3),
+			)
+		circulation.renew_loan(loan, today=self.today)
+		self.assertEqual(loan.due_date, self.today + timedelta(days=14))
+
+		self.client.login(username="renova", password="pass")
+		Hold.objects.create(book=self.books[0], user=self.waiting, position=1)
+		resp = self.client.post(reverse("catalog:renew_loan", args=[loan.pk]), follow=True)
+		self.assertContains(resp, "fila deste livro")
+		loan.refresh_from_db()
+		self.assertEqual(loan.renewals, 1)
@@ -5,7 +5,7 @@ O `app_name` permite usar nomes de rota com namespace, por exemplo `catalog:book
 """
 
 from django.urls import path
-from . import views
+from . import api, async_views, views
 
 app_name = "catalog"
 
@@ -13,17 +13,24 @@ urlpatterns = [
     # raiz do app (e do site se incluído como "/"): lista livros
     path("", views.book_list, name="book_list"),
     path("book/<int:book_id>/", views.book_detail, name="book_detail"),  # adicionada rota de detalhes
+    path("book/<int:book_id>/reviews/", views.book_reviews, name="book_reviews"),  # "carregar mais" avaliações
     path("advanced-search/", views.advanced_search, name="advanced_search"),
     path("me/searches/", views.search_history, name="search_history"),
     path("signup/", views.signup, name="signup"),
     # Ações do usuário
     path("borrow/<int:book_id>/", views.borrow_book, name="borrow_book"),
     path("return/<int:loan_id>/", views.return_book, name="return_book"),
+    path("renew/<int:loan_id>/", views.renew_loan, name="renew_loan"),
     path("me/loans/", views.my_loans, name="my_loans"),
+    # Reservas (fila de espera de livros sem cópias)
+    path("hold/<int:book_id>/", views.place_hold, name="place_hold"),
+    path("hold/<int:hold_id>/cancel/", views.cancel_hold, name="cancel_hold"),
     # Ferramentas de staff (evitamos o prefixo 'admin/' para não colidir com o Django Admin)
     path("staff/book/<int:book_id>/borrowers/", views.admin_book_borrowers, name="admin_book_borrowers"),
     path("staff/overdue/", views.admin_overdue_loans, name="admin_overdue_loans"),
     path("staff/loan/<int:loan_id>/return/", views.admin_mark_returned, name="admin_mark_returned"),
+    path("staff/profiling/", views.admin_query_profile, name="admin_query_profile"),
+    path("staff/checkout/", views.admin_batch_checkout, name="admin_batch_checkout"),
     # Avaliações
     path("book/<int:book_id>/review/", views.add_review, name="add_review"),
     path("review/<int:review_id>/delete/", views.delete_review, name="delete_review"),
@@ -38,4 +45,16 @@ urlpatterns = [
     path("reports/active-users/", views.report_active_users, name="report_active_users"),
     path("reports/overdue-loans/", views.report_overdue_loans, name="report_overdue_loans"),
     path("reports/export/", views.report_export, name="report_export"),  # ?type=loans&format=pdf|xlsx
+    # API JSON (somente leitura) para clientes móveis e quiosques (ver api.py)
+    path("api/books/", api.books, name="api_books"),
+    path("api/books/<int:book_id>/", api.book_detail, name="api_book_detail"),
+    path("api/books/<int:book_id>/reviews/", api.book_reviews, name="api_book_reviews"),
+    path("api/me/loans/", api.my_loans, name="api_my_loans"),
+    # Versões assíncronas das leituras mais acessadas (servidor ASGI; ver async_views.py)
+    path("async/books/", async_views.book_list, name="async_book_list"),
+    path("async/books/<int:book_id>/", async_views.book_detail, name="async_book_detail"),
+    path("async/reports/loans/", async_views.report_loans, name="async_report_loans"),
+    path("async/reports/popular-books/", async_views.report_popular_books, name="async_report_popular_books"),
+    path("async/reports/active-users/", async_views.report_active_users, name="async_report_active_users"),
+    path("async/reports/overdue-loans/", async_views.report_overdue_loans, name="async_report_overdue_loans"),
 ]
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""Carimbos de versão (version stamps) do catálogo, guardados no cache.
+
+Cada livro tem uma versão própria e o catálogo inteiro tem uma versão global.
+Sempre que um Book, Loan, Review ou Category é gravado/apagado, os sinais em
+`signals.py` "carimbam" a versão com o instante atual. As views usam esses
+carimbos para montar ETag/Last-Modified e responder 304 (não modificado) sem
+consultar o banco nem renderizar o template de novo.
+
+Os carimbos ficam num cache visto por todos os workers (`CACHES['versions']`),
+para que uma escrita feita em um worker invalide as páginas servidas pelos
+demais. Esse alias não descarta entradas para abrir espaço: os carimbos são
+gravados sem expiração e não podem sumir ao acaso.
+
+O carimbo é um timestamp (segundos desde a época), então serve diretamente
+como Last-Modified. Se o cache for limpo, uma nova versão é criada com o
+instante atual: os clientes apenas revalidam uma vez.
+"""
+
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from .cache_utils import versions_cache
+
+CATALOG_VERSION_KEY = "catalog:version"
+# Versão só dos metadados usados em filtros (muda com Book/Category, não com empréstimos)
+FACETS_VERSION_KEY = "catalog:facets-version"
+
+
+def _book_version_key(book_id) -> str:
+	return f"catalog:book:{book_id}:version"
+
+
+def _user_loans_version_key(user_id) -> str:
+	return f"catalog:user:{user_id}:loans-version"
+
+
+def _get_or_create(key: str) -> float:
+	cache = versions_cache()
+	version = cache.get(key)
+	if version is None:
+		# add() não sobrescreve se outro processo criou a chave nesse meio tempo
+		cache.add(key, time.time(), None)
+		version = cache.get(key) or time.time()
+	return version
+
+
+def get_catalog_version() -> float:
+	"""Versão global do catálogo (muda a cada escrita em livros, empréstimos ou categorias)."""
+	return _get_or_create(CATALOG_VERSION_KEY)
+
+
+def get_facets_version() -> float:
+	"""Versão das facetas (categorias, idiomas, editoras, anos) usadas nos filtros."""
+	return _get_or_create(FACETS_VERSION_KEY)
+
+
+def get_book_version(book_id) -> float:
+	"""Versão de um livro específico (muda com empréstimos, avaliações ou edição do livro)."""
+	return _get_or_create(_book_version_key(book_id))
+
+
+def get_user_loans_version(user_id) -> float:
+	"""Versão dos empréstimos de um usuário (muda a cada empréstimo, devolução ou renovação dele)."""
+	return _get_or_create(_user_loans_version_key(user_id))
+
+
+def bump_catalog_version() -> None:
+	versions_cache().set(CATALOG_VERSION_KEY, time.time(), None)
+
+
+def bump_facets_version() -> None:
+	versions_cache().set(FACETS_VERSION_KEY, time.time(), None)
+
+
+def bump_book_version(book_id) -> None:
+	versions_cache().set(_book_version_key(book_id), time.time(), None)
+
+
+def bump_user_loans_version(user_id) -> None:
+	versions_cache().set(_user_loans_version_key(user_id), time.time(), None)
+
+
+def version_to_datetime(version: float) -> datetime:
+	"""Converte o carimbo em datetime (UTC) para o cabeçalho Last-Modified."""
+	return datetime.fromtimestamp(version, tz=dt_timezone.utc)
@@ -4,21 +4,38 @@ Cada função abaixo recebe um `request` e retorna uma `HttpResponse`.
 Os comentários explicam passo a passo o que cada view faz.
 """
 
-from datetime import timedelta
+import base64
+import datetime
+import hashlib
+import re
+import time
+from functools import wraps
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.exceptions import BadRequest
 from django.core.paginator import Paginator
-from django.db.models import Avg, Count, F, Q, Value
-from django.db.models.functions import Lower
+from django.db.models import Avg, Count, Exists, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Lower
 from django.http import JsonResponse
 from django.http import HttpResponse, Http404, HttpRequest  # exportação de arquivos
-from django.shortcuts import render, get_object_or_404  # adicionar render
+from django.shortcuts import render, get_object_or_404, redirect  # adicionar render
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
 
-from .models import Book, Loan, Category, SearchQuery, Review
-from .forms import ReviewForm
+from .models import Book, Hold, Loan, SearchQuery, Review
+from .forms import BatchCheckoutForm, ReviewForm
+from . import circulation, metrics, recommendations
+from .cache_utils import cache_stats
+from .db_routers import reading_from_replica
+from .facets import get_catalog_facets, get_result_facets
+from .profiling import VIEW_STATS, profiling_settings
 from .report_utils import build_report_dataset  # dados dos relatórios
+from .versioning import get_book_version, get_catalog_version, version_to_datetime
 
 
 def _is_staff(user):
@@ -29,28 +46,121 @@ def _is_staff(user):
 	return user.is_authenticated and user.is_staff
 
 
-@login_required
-def book_list(request: HttpRequest) -> HttpResponse:
-	"""Lista livros com busca, filtros, ordenação, paginação e exportação.
+EXPORT_SECONDS = metrics.histogram(
+	"library_export_duration_seconds",
+	"Tempo para gerar exportações (CSV/XLSX/PDF).",
+	("export", "format"),
+	buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+ACTIVE_LOANS = metrics.gauge("library_active_loans", "Empréstimos ativos (não devolvidos).")
+OVERDUE_LOANS = metrics.gauge("library_overdue_loans", "Empréstimos ativos com devolução atrasada.")
+CACHE_LOOKUPS = metrics.gauge("library_cache_lookups", "Consultas ao cache por prefixo de chave.", ("prefix", "result"))
+CACHE_HIT_RATIO = metrics.gauge("library_cache_hit_ratio", "Taxa de acerto do cache por prefixo de chave.", ("prefix",))
 
-	Recursos suportados via parâmetros GET:
-	- q: termo de busca (título, autor ou ISBN) – destaque no template.
-	- disponivel=1: somente livros com cópias disponíveis.
-	- categoria: id da categoria.
-	- idioma: filtra campo language.
-	- ano_min / ano_max: faixa de ano de edição.
-	- ordenar: campo de ordenação (title|author|disponibilidade); sempre crescente.
-	- mostrar: '20' (padrão) ou 'todos'.
-	- export=csv: retorna CSV em vez de HTML.
+EXPORT_FORMATS = {"csv", "xlsx", "pdf"}
 
-	Também grava histórico da busca (SearchQuery) e provê endpoint de
-	sugestões (se chamado como /?suggest=1&q=prefixo).
+
+def _timed_export(export_name, format_param="export"):
+	"""Decorator: mede a duração da view quando ela gera uma exportação.
+
+	`export_name` pode ser um texto ou uma função (request) -> texto. Só
+	registramos respostas 200 com formato conhecido, para que parâmetros
+	inválidos não criem séries novas na métrica.
 	"""
+	def decorator(view):
+		@wraps(view)
+		def wrapper(request, *args, **kwargs):
+			export_format = request.GET.get(format_param)
+			if export_format not in EXPORT_FORMATS:
+				return view(request, *args, **kwargs)
+			start = time.perf_counter()
+			response = view(request, *args, **kwargs)
+			if response.status_code == 200:
+				name = export_name(request) if callable(export_name) else export_name
+				EXPORT_SECONDS.observe(time.perf_counter() - start, export=name, format=export_format)
+			return response
+		return wrapper
+	return decorator
 
-	# Queryset base com anotação de empréstimos ativos
-	qs = Book.objects.all().annotate(
-		active_loans=Count("loans", filter=Q(loans__returned_at__isnull=True))
-	)
+
+def _has_pending_messages(request) -> bool:
+	"""Há mensagens (flash) a exibir? Nesse caso a página precisa ser renderizada."""
+	# len() não marca as mensagens como lidas
+	return bool(len(messages.get_messages(request)))
+
+
+def _page_etag(request, *parts):
+	"""Monta um ETag para páginas do catálogo a partir de carimbos de versão.
+
+	A página depende também do usuário (botões, avaliações próprias) e do
+	cookie CSRF (token dos formulários), por isso ambos entram no hash.
+	Retorna None (sem GET condicional) quando há mensagens pendentes ou
+	quando a página é lida da réplica, que pode estar atrás da versão.
+	"""
+	if _has_pending_messages(request) or reading_from_replica():
+		return None
+	user_part = request.user.pk if request.user.is_authenticated else "anon"
+	csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME, "")
+	raw = "|".join(str(part) for part in (*parts, user_part, csrf_cookie))
+	return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _facet_links(request, result_facets, categories):
+	"""Transforma as contagens do resultado em itens com rótulo, total e link.
+
+	Cada link mantém os filtros atuais, aplica o valor da faceta e volta para
+	a primeira página.
+	"""
+	def link(**changes):
+		params = request.GET.copy()
+		params.pop("page", None)
+		for key, value in changes.items():
+			params[key] = value
+		return "?" + params.urlencode()
+
+	category_names = {c["id"]: c["name"] for c in categories}
+	return {
+		"categories": [
+			{"label": category_names.get(cat_id, cat_id), "count": count, "url": link(categoria=cat_id)}
+			for cat_id, count in sorted(result_facets["categories"].items(), key=lambda item: -item[1])
+		],
+		"languages": [
+			{"label": language, "count": count, "url": link(idioma=language)}
+			for language, count in result_facets["languages"]
+		],
+		"year_buckets": [
+			{
+				"label": f"{bucket['start']}–{bucket['end']}",
+				"count": bucket["count"],
+				"url": link(ano_min=bucket["start"], ano_max=bucket["end"]),
+			}
+			for bucket in result_facets["year_buckets"]
+		],
+		"available": {"count": result_facets["availability"]["available"], "url": link(disponivel="1")},
+		"unavailable": result_facets["availability"]["unavailable"],
+		"duration_ms": result_facets["duration_ms"],
+	}
+
+
+def _filtered_books(request):
+	"""Aplica ao queryset de livros a busca, os filtros e a ordenação do GET.
+
+	Só monta o queryset (nenhuma consulta é executada), por isso serve tanto
+	para `book_list` quanto para a versão assíncrona em `async_views.py`.
+	Devolve (queryset, filtros), com os filtros já normalizados.
+	"""
+	# Queryset base com a disponibilidade (empréstimos ativos e cópias separadas).
+	# Subquery (em vez de JOIN + GROUP BY) permite agrupar o resultado depois
+	# para as contagens de facetas. A disponibilidade é a mesma para todos os
+	# leitores (as facetas ficam em cache); quem tem a cópia separada é
+	# marcado à parte em `user_hold_ready`.
+	qs = circulation.with_availability(Book.objects.all())
+	if request.user.is_authenticated:
+		qs = qs.annotate(
+			user_hold_ready=Exists(
+				Hold.objects.filter(book=OuterRef("pk"), user=request.user, status=Hold.STATUS_READY)
+			)
+		)
 
 	# Termo de busca livre (campo único) OU campos individuais vindos da busca avançada
 	q = request.GET.get("q", "").strip()
@@ -73,7 +183,7 @@ def book_list(request: HttpRequest) -> HttpResponse:
 	# Filtro disponibilidade
 	show_only_available = request.GET.get("disponivel") == "1"
 	if show_only_available:
-		qs = qs.filter(active_loans__lt=F("copies_total"))
+		qs = qs.filter(available__gt=0)
 
 	# Filtro por categoria
 	categoria_id = request.GET.get("categoria")
@@ -85,6 +195,11 @@ def book_list(request: HttpRequest) -> HttpResponse:
 	if idioma:
 		qs = qs.filter(language__iexact=idioma)
 
+	# Filtro por editora
+	editora = request.GET.get("editora", "").strip()
+	if editora:
+		qs = qs.filter(publisher__iexact=editora)
+
 	# Faixa de ano
 	ano_min = request.GET.get("ano_min")
 	ano_max = request.GET.get("ano_max")
@@ -93,15 +208,204 @@ def book_list(request: HttpRequest) -> HttpResponse:
 	if ano_max and ano_max.isdigit():
 		qs = qs.filter(edition_year__lte=int(ano_max))
 
+	filters = {
+		"q": q,
+		"title": title_param,
+		"author": author_param,
+		"isbn": isbn_param,
+		"disponivel": show_only_available,
+		"categoria": categoria_id,
+		"idioma": idioma,
+		"editora": editora,
+		"ano_min": ano_min,
+		"ano_max": ano_max,
+	}
+
 	# Ordenação dinâmica (sempre crescente)
 	ordenar = request.GET.get("ordenar", "title")
 	if ordenar == "author":
 		qs = qs.order_by(Lower("author"), "title")
 	elif ordenar == "disponibilidade":
-		# ordenar por cópias disponíveis calculadas: (copies_total - active_loans)
-		qs = qs.annotate(disponiveis=F("copies_total") - F("active_loans")).order_by("disponiveis", "title")
+		# ordenar por cópias disponíveis calculadas (anotação `available`)
+		qs = qs.order_by("available", "title")
 	else:  # default título
 		qs = qs.order_by(Lower("title"))
+	filters["ordenar"] = ordenar
+	return qs, filters
+
+
+def _search_params(filters):
+	"""Filtros aplicados, sem termo livre e ordenação (histórico e chave das facetas)."""
+	return {key: value for key, value in filters.items() if key not in ("q", "ordenar")}
+
+
+def _book_list_context(request, filters, books, page_obj, result_facets, facets, reviewable):
+	"""Contexto do template `book_list.html` (compartilhado com a versão assíncrona)."""
+	return {
+		"books": books,
+		"reviewable": reviewable,
+		"page_obj": page_obj,
+		"q": filters["q"],
+		"show_only_available": filters["disponivel"],
+		"mostrar": request.GET.get("mostrar", "20"),
+		"total_count": result_facets["total"],
+		"result_facets": _facet_links(request, result_facets, facets["categories"]),
+		"ordenar": filters["ordenar"],
+		"categorias": facets["categories"],
+		"idiomas": facets["languages"],
+		"categoria_selecionada": filters["categoria"],
+		"idioma": filters["idioma"],
+		"editora": filters["editora"],
+		"ano_min": filters["ano_min"] or "",
+		"ano_max": filters["ano_max"] or "",
+		"title_param": filters["title"],
+		"author_param": filters["author"],
+		"isbn_param": filters["isbn"],
+	}
+
+
+def _book_list_etag(request):
+	return _page_etag(request, "book_list", get_catalog_version(), request.get_full_path())
+
+
+def _book_list_last_modified(request):
+	if _has_pending_messages(request) or reading_from_replica():
+		return None
+	return version_to_datetime(get_catalog_version())
+
+
+REVIEWS_PAGE_SIZE = 10
+
+
+def _book_detail_queryset(user):
+	"""Livros com tudo o que o detalhe exibe, numa única consulta.
+
+	Além da nota média e do total de avaliações, traz a disponibilidade
+	(empréstimos ativos e cópias separadas, igual para todos os leitores),
+	a fila de reservas e, para o usuário logado, o id da própria avaliação
+	(`user_review_id`). Contagens em subquery: não multiplicam as linhas do
+	JOIN com as avaliações. Se o usuário pode avaliar vem de
+	`_reviewable_books` (conjunto em cache na sessão).
+	"""
+	qs = circulation.with_availability(Book.objects.all()).annotate(
+		avg_rating=Avg("reviews__rating"),
+		review_count=Count("reviews", distinct=True),
+		holds_waiting=Coalesce(
+			Subquery(
+				Hold.objects.filter(book=OuterRef("pk"), status=Hold.STATUS_WAITING)
+				.order_by()
+				.values("book")
+				.annotate(n=Count("id"))
+				.values("n")[:1]
+			),
+			Value(0),
+		),
+	)
+	if not user.is_authenticated:
+		# output_field explícito: com o GROUP BY das agregações, Value(None) sozinho não tem tipo
+		return qs.annotate(user_review_id=Value(None, output_field=IntegerField()))
+	return qs.annotate(
+		user_review_id=Subquery(Review.objects.filter(book=OuterRef("pk"), user=user).values("id")[:1]),
+	)
+
+
+def _reviewable_books(request, books):
+	"""Ids dos livros de `books` que o usuário logado pode avaliar.
+
+	Carrega (uma vez por sessão, até o próximo empréstimo) o conjunto de
+	livros que o usuário já pegou emprestado; cada livro vira um teste de
+	pertinência em `Book.users_can_review`.
+	"""
+	circulation.borrowed_book_ids(request)
+	return Book.users_can_review(books, request.user)
+
+
+def _encode_cursor(timestamp, pk):
+	"""Cursor opaco da paginação por chave: (instante, id) do último item da página."""
+	raw = f"{timestamp.isoformat()}|{pk}"
+	return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor):
+	try:
+		raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+		timestamp, pk = raw.split("|")
+		return datetime.datetime.fromisoformat(timestamp), int(pk)
+	except ValueError:
+		raise BadRequest("Cursor de paginação inválido.")
+
+
+def _keyset_page(rows, size, cursor_of):
+	"""(itens da página, cursor da próxima ou None) a partir de `size + 1` linhas."""
+	if len(rows) > size:
+		rows = rows[:size]
+		return rows, cursor_of(rows[-1])
+	return rows, None
+
+
+def _encode_review_cursor(review):
+	return _encode_cursor(review.created_at, review.pk)
+
+
+def _reviews_after(book_id, cursor, size=REVIEWS_PAGE_SIZE):
+	"""Avaliações do livro depois do cursor (mais recentes primeiro).
+
+	Paginação por chave em vez de OFFSET: cada página é um intervalo do índice
+	`review_book_recent_idx`, com o mesmo custo na primeira página ou na
+	centésima, e não repete nem pula avaliações se outras forem criadas entre
+	um clique e outro. Busca uma linha a mais para saber se há próxima página.
+	"""
+	qs = Review.objects.filter(book_id=book_id).select_related("user").order_by("-created_at", "-id")
+	if cursor:
+		created_at, pk = _decode_cursor(cursor)
+		qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+	return qs[:size + 1]
+
+
+def _review_page(rows, size=REVIEWS_PAGE_SIZE):
+	"""(avaliações da página, cursor da próxima ou None) a partir de `_reviews_after`."""
+	return _keyset_page(rows, size, _encode_review_cursor)
+
+
+def _book_detail_etag(request, book_id):
+	return _page_etag(request, "book_detail", book_id, get_book_version(book_id))
+
+
+def _book_detail_last_modified(request, book_id):
+	if _has_pending_messages(request) or reading_from_replica():
+		return None
+	return version_to_datetime(get_book_version(book_id))
+
+
+@login_required
+@vary_on_cookie
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_book_list_etag, last_modified_func=_book_list_last_modified)
+@_timed_export("books")
+def book_list(request: HttpRequest) -> HttpResponse:
+	"""Lista livros com busca, filtros, ordenação, paginação e exportação.
+
+	Recursos suportados via parâmetros GET:
+	- q: termo de busca (título, autor ou ISBN) – destaque no template.
+	- disponivel=1: somente livros com cópias disponíveis.
+	- categoria: id da categoria.
+	- idioma: filtra campo language.
+	- editora: filtra campo publisher.
+	- ano_min / ano_max: faixa de ano de edição.
+	- ordenar: campo de ordenação (title|author|disponibilidade); sempre crescente.
+	- mostrar: '20' (padrão) ou 'todos'.
+	- export=csv: retorna CSV em vez de HTML.
+
+	Também grava histórico da busca (SearchQuery) e provê endpoint de
+	sugestões (se chamado como /?suggest=1&q=prefixo).
+
+	GET condicional: o ETag/Last-Modified vem da versão global do catálogo
+	(`versioning.py`). Se nada mudou, o navegador recebe 304 sem que a view
+	consulte o banco (uma revalidação 304 também não grava histórico de novo).
+	"""
+
+	qs, filters = _filtered_books(request)
+	q = filters["q"]
 
 	# Sugestões (autocomplete) modo simples: retorna JSON
 	if request.GET.get("suggest") == "1" and q:
@@ -111,6 +415,11 @@ def book_list(request: HttpRequest) -> HttpResponse:
 		isbns = list(qs.values_list("isbn", flat=True)[:limite])
 		return JsonResponse({"titles": titulos, "authors": autores, "isbns": isbns})
 
+	# As exportações percorrem todos os livros e mostram a categoria: um JOIN
+	# evita uma consulta de categoria por linha
+	if request.GET.get("export") in ("csv", "xlsx"):
+		qs = qs.select_related("category")
+
 	# Exportação CSV
 	if request.GET.get("export") == "csv":
 		import csv
@@ -123,7 +432,7 @@ def book_list(request: HttpRequest) -> HttpResponse:
 				b.title,
 				b.author,
 				b.isbn,
-				max(b.copies_total - b.active_loans, 0),
+				b.copies_available,
 				b.category.name if b.category else "",
 				b.language,
 				b.edition_year or "",
@@ -147,7 +456,7 @@ def book_list(request: HttpRequest) -> HttpResponse:
 				b.title,
 				b.author,
 				b.isbn,
-				max(b.copies_total - b.active_loans, 0),
+				b.copies_available,
 				b.category.name if b.category else "",
 				b.language,
 				b.edition_year or "",
@@ -159,19 +468,27 @@ def book_list(request: HttpRequest) -> HttpResponse:
 		response["Content-Disposition"] = "attachment; filename=livros.xlsx"
 		return response
 
+	# Filtros aplicados (usados no histórico e na chave de cache das facetas)
+	search_params = _search_params(filters)
+
+	# Contagens por faceta do resultado atual (uma consulta agrupada, com cache).
+	# O total da faceta também serve como contagem do resultado.
+	result_facets = get_result_facets(qs, {**search_params, "q": q})
+	total_count = result_facets["total"]
+
 	# Paginação
-	mostrar_param = request.GET.get("mostrar", "20")
-	if mostrar_param == "todos":
+	if request.GET.get("mostrar", "20") == "todos":
 		page_obj = None
 		books = qs
 	else:
 		paginator = Paginator(qs, 20)
+		paginator.count = total_count  # evita um COUNT(*) extra: já sabemos o total
 		page_number = request.GET.get("page")
 		page_obj = paginator.get_page(page_number)
 		books = page_obj.object_list
 
 	# Salva histórico da busca (apenas se algum filtro ou termo usado)
-	if any([q, title_param, author_param, isbn_param, show_only_available, categoria_id, idioma, ano_min, ano_max]):
+	if any(filters[key] for key in filters if key != "ordenar"):
 		session_key = request.session.session_key or ""
 		if not session_key:
 			request.session.create()
@@ -181,42 +498,19 @@ def book_list(request: HttpRequest) -> HttpResponse:
 				user=request.user if request.user.is_authenticated else None,
 				session_key=session_key,
 				q=q,
-				params={
-					"disponivel": show_only_available,
-					"categoria": categoria_id,
-					"idioma": idioma,
-					"ano_min": ano_min,
-					"ano_max": ano_max,
-					"ordenar": ordenar,
-					"title": title_param,
-					"author": author_param,
-					"isbn": isbn_param,
-				},
+				params={**search_params, "ordenar": filters["ordenar"]},
 			)
 		except Exception:  # pragma: no cover - não falha a página por erro no histórico
 			pass
 
-	context = {
-		"books": books,
-		"page_obj": page_obj,
-		"q": q,
-		"show_only_available": show_only_available,
-		"mostrar": mostrar_param,
-		"total_count": qs.count(),
-		"ordenar": ordenar,
-		"categorias": Category.objects.all(),
-		"categoria_selecionada": categoria_id,
-		"idioma": idioma,
-		"ano_min": ano_min or "",
-		"ano_max": ano_max or "",
-		"title_param": title_param,
-		"author_param": author_param,
-		"isbn_param": isbn_param,
-	}
+	context = _book_list_context(
+		request, filters, books, page_obj, result_facets, get_catalog_facets(), _reviewable_books(request, books)
+	)
 	return render(request, "catalog/book_list.html", context)
 
 
 @login_required
+@_timed_export("search_history")
 def search_history(request: HttpRequest) -> HttpResponse:
 	"""Lista últimas buscas do usuário (ou sessão se anônimo) com opção de exportar.
 
@@ -273,16 +567,17 @@ def advanced_search(request: HttpRequest) -> HttpResponse:
 	a lógica existente de filtros. Campos individuais (title, author, isbn)
 	são tratados em `book_list`.
 	"""
-	languages = (
-		Book.objects.exclude(language="")
-		.values_list("language", flat=True)
-		.distinct()
-		.order_by("language")
-	)
+	# Categorias, idiomas, editoras e anos (com contagens) vêm do serviço de facetas
+	facets = get_catalog_facets()
 	return render(
 		request,
 		"catalog/advanced_search.html",
-		{"categorias": Category.objects.all(), "languages": languages},
+		{
+			"categorias": facets["categories"],
+			"languages": facets["languages"],
+			"publishers": facets["publishers"],
+			"edition_years": facets["edition_years"],
+		},
 	)
 
 
@@ -310,7 +605,8 @@ def borrow_book(request: HttpRequest, book_id: int) -> HttpResponse:
 
 	- Buscamos o livro; se não existir, 404.
 	- Garantimos que a ação é POST (boas práticas REST para mudar estado).
-	- Verificamos disponibilidade: se não houver cópias, mostramos mensagem.
+	- Verificamos disponibilidade (descontando cópias separadas para a fila de
+	  reservas); sem cópias, sugerimos reservar na página do livro.
 	- Criamos o Loan com data de devolução padrão de 14 dias a partir de hoje.
 	"""
 	book = get_object_or_404(Book, id=book_id)
@@ -318,22 +614,18 @@ def borrow_book(request: HttpRequest, book_id: int) -> HttpResponse:
 	if request.method != "POST":
 		raise Http404()
 
-	# Conta quantos empréstimos do livro ainda estão ativos
-	active_loans = Loan.objects.filter(book=book, returned_at__isnull=True).count()
-	if active_loans >= book.copies_total:
-		messages.error(request, "Não há cópias disponíveis para empréstimo.")
-		return redirect("catalog:book_list")
-
-	# Padrão: 14 dias para devolver
-	due_date = timezone.localdate() + timedelta(days=14)
-	Loan.objects.create(book=book, user=request.user, due_date=due_date)
-	messages.success(request, f"Você emprestou '{book.title}'. Devolução até {due_date:%d/%m/%Y}.")
+	try:
+		loan = circulation.checkout(book, request.user)
+	except circulation.CirculationError as exc:
+		messages.error(request, f"{exc} Você pode reservar o livro e será avisado quando uma cópia voltar.")
+		return redirect("catalog:book_detail", book_id=book.id)
+	messages.success(request, f"Você emprestou '{book.title}'. Devolução até {loan.due_date:%d/%m/%Y}.")
 	return redirect("catalog:book_list")
 
 
 @login_required
 def return_book(request: HttpRequest, loan_id: int) -> HttpResponse:
-	"""Registra a devolução do livro (POST)."""
+	"""Registra a devolução do livro (POST) e passa a cópia para a fila de reservas."""
 	loan = get_object_or_404(Loan, id=loan_id, user=request.user)
 	if request.method != "POST":
 		raise Http404()
@@ -341,15 +633,115 @@ def return_book(request: HttpRequest, loan_id: int) -> HttpResponse:
 		messages.info(request, "Este empréstimo já foi devolvido.")
 	else:
 		loan.mark_returned()
+		circulation.on_copies_returned([loan.book_id])
 		messages.success(request, f"'{loan.book.title}' devolvido com sucesso.")
 	return redirect("catalog:my_loans")
 
 
+@login_required
+def renew_loan(request: HttpRequest, loan_id: int) -> HttpResponse:
+	"""Renova o empréstimo do usuário (POST), se não houver fila nem limite atingido."""
+	loan = get_object_or_404(Loan.objects.select_related("book"), id=loan_id, user=request.user)
+	if request.method != "POST":
+		raise Http404()
+	try:
+		circulation.renew_loan(loan)
+	except circulation.CirculationError as exc:
+		messages.error(request, str(exc))
+	else:
+		messages.success(request, f"'{loan.book.title}' renovado. Nova devolução: {loan.due_date:%d/%m/%Y}.")
+	return redirect("catalog:my_loans")
+
+
+@login_required
+def place_hold(request: HttpRequest, book_id: int) -> HttpResponse:
+	"""Entra na fila de reserva de um livro sem cópias disponíveis (POST)."""
+	book = get_object_or_404(Book, id=book_id)
+	if request.method != "POST":
+		raise Http404()
+	if circulation.free_copies(book, for_user=request.user) > 0:
+		messages.info(request, "Há cópias disponíveis: você pode emprestar o livro agora.")
+		return redirect("catalog:book_detail", book_id=book.id)
+	try:
+		hold = circulation.place_hold(book, request.user)
+	except circulation.CirculationError as exc:
+		messages.error(request, str(exc))
+	else:
+		if hold.status == Hold.STATUS_READY:
+			messages.success(request, f"Uma cópia de '{book.title}' foi separada para você até {hold.expires_at:%d/%m/%Y}.")
+		else:
+			position = circulation.queue_position(hold)
+			messages.success(request, f"Reserva feita: você é o {position}º da fila de '{book.title}'.")
+	return redirect("catalog:book_detail", book_id=book.id)
+
+
+@login_required
+def cancel_hold(request: HttpRequest, hold_id: int) -> HttpResponse:
+	"""Cancela uma reserva aberta do usuário (POST)."""
+	hold = get_object_or_404(Hold, id=hold_id, user=request.user, status__in=Hold.OPEN_STATUSES)
+	if request.method != "POST":
+		raise Http404()
+	circulation.cancel_hold(hold)
+	messages.success(request, "Reserva cancelada.")
+	return redirect("catalog:my_loans")
+
+
+LOAN_HISTORY_PAGE_SIZE = 20
+
+
+def _encode_loan_cursor(loan):
+	return _encode_cursor(loan.returned_at, loan.pk)
+
+
+def _loan_history(user, cursor, size=LOAN_HISTORY_PAGE_SIZE):
+	"""Empréstimos devolvidos do usuário depois do cursor (devolução mais recente primeiro).
+
+	Cada página é um intervalo do índice parcial `loan_user_history_idx`:
+	quem tem milhares de empréstimos antigos não paga por eles a cada visita.
+	"""
+	qs = (
+		Loan.objects.filter(user=user, returned_at__isnull=False)
+		.select_related("book")
+		.order_by("-returned_at", "-id")
+	)
+	if cursor:
+		returned_at, pk = _decode_cursor(cursor)
+		qs = qs.filter(Q(returned_at__lt=returned_at) | Q(returned_at=returned_at, id__lt=pk))
+	return qs[:size + 1]
+
+
 @login_required
 def my_loans(request: HttpRequest) -> HttpResponse:
-	"""Lista todos os empréstimos do usuário logado."""
-	loans = Loan.objects.filter(user=request.user).select_related("book")
-	return render(request, "catalog/my_loans.html", {"loans": loans})
+	"""Painel de empréstimos do usuário: atrasados, em andamento e histórico.
+
+	Atrasados e em andamento são consultas no índice parcial dos empréstimos
+	em aberto do usuário (`loan_user_open_idx`); o histórico vem em páginas
+	por chave (?antes=<cursor>). Os contadores do topo ficam em cache por
+	usuário (`circulation.loan_summary`), sem percorrer o histórico inteiro.
+	"""
+	today = timezone.localdate()
+	open_loans = circulation.annotate_can_renew(
+		Loan.objects.filter(user=request.user, returned_at__isnull=True).select_related("book").order_by("due_date", "id")
+	)
+	cursor = request.GET.get("antes")
+	history, next_cursor = _keyset_page(
+		list(_loan_history(request.user, cursor)), LOAN_HISTORY_PAGE_SIZE, _encode_loan_cursor
+	)
+	holds = (
+		Hold.objects.filter(user=request.user, status__in=Hold.OPEN_STATUSES)
+		.select_related("book")
+		.order_by("created_at")
+	)
+	return render(request, "catalog/my_loans.html", {
+		"summary": circulation.loan_summary(request.user, today),
+		"overdue": open_loans.filter(due_date__lt=today),
+		"active": open_loans.filter(due_date__gte=today),
+		"history": history,
+		"history_cursor": next_cursor,
+		"history_paged": bool(cursor),
+		"holds": holds,
+		"recommended": recommendations.for_user(request.user),
+	})
 
 
 @user_passes_test(_is_staff)
@@ -368,6 +760,65 @@ def admin_overdue_loans(request: HttpRequest) -> HttpResponse:
 	return render(request, "catalog/admin_overdue.html", {"loans": overdue})
 
 
+@user_passes_test(_is_staff)
+def admin_batch_checkout(request: HttpRequest) -> HttpResponse:
+	"""Balcão de empréstimos (staff): vários livros para um usuário num único POST.
+
+	GET mostra o formulário; POST empresta tudo o que for possível numa
+	transação (ver `circulation.batch_checkout`) e mostra o resultado de cada
+	item. Terminais de balcão que pedem `Accept: application/json` recebem os
+	resultados em JSON.
+	"""
+	wants_json = request.accepts("application/json") and not request.accepts("text/html")
+	form = BatchCheckoutForm(request.POST or None)
+	results = None
+	if request.method == "POST":
+		if not form.is_valid():
+			if wants_json:
+				return JsonResponse({"errors": form.errors.get_json_data()}, status=400)
+		else:
+			user = form.cleaned_data["user"]
+			results = circulation.batch_checkout(user, form.cleaned_data["books"], form.cleaned_data["due_date"])
+			borrowed = sum(1 for result in results if result["loan"])
+			if wants_json:
+				return JsonResponse({
+					"user": user.get_username(),
+					"borrowed": borrowed,
+					"results": [
+						{
+							"identifier": result["identifier"],
+							"book_id": result["book"].pk if result["book"] else None,
+							"title": result["book"].title if result["book"] else None,
+							"loan_id": result["loan"].pk if result["loan"] else None,
+							"due_date": result["loan"].due_date if result["loan"] else None,
+							"error": result["error"],
+						}
+						for result in results
+					],
+				})
+			if borrowed:
+				messages.success(request, f"{borrowed} empréstimo(s) registrado(s) para {user.get_username()}.")
+			if borrowed < len(results):
+				messages.warning(request, f"{len(results) - borrowed} item(ns) não emprestado(s); veja os motivos abaixo.")
+	return render(request, "catalog/admin_batch_checkout.html", {"form": form, "results": results})
+
+
+@user_passes_test(_is_staff)
+def admin_query_profile(request: HttpRequest) -> HttpResponse:
+	"""Estatísticas de consultas SQL por view (staff). POST zera os dados.
+
+	Só há dados com o perfil ativado (QUERY_PROFILING['ENABLED']).
+	"""
+	if request.method == "POST":
+		VIEW_STATS.clear()
+		messages.success(request, "Estatísticas de consultas zeradas.")
+		return redirect("catalog:admin_query_profile")
+	return render(request, "catalog/admin_query_profile.html", {
+		"rows": VIEW_STATS.rows(),
+		"enabled": profiling_settings()["ENABLED"],
+	})
+
+
 @user_passes_test(_is_staff)
 def admin_mark_returned(request: HttpRequest, loan_id: int) -> HttpResponse:
 	"""Ação de staff para marcar um empréstimo como devolvido (POST)."""
@@ -376,50 +827,82 @@ def admin_mark_returned(request: HttpRequest, loan_id: int) -> HttpResponse:
 		raise Http404()
 	if not loan.returned_at:
 		loan.mark_returned()
+		circulation.on_copies_returned([loan.book_id])
 		messages.success(request, f"Empréstimo de '{loan.book.title}' marcado como devolvido.")
 	return redirect("catalog:admin_overdue_loans")
 
 
+@vary_on_cookie
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_book_detail_etag, last_modified_func=_book_detail_last_modified)
 def book_detail(request, book_id):
-	"""Exibe detalhes completos de um livro com todas as avaliações públicas.
-	
-	PT-BR: página onde o usuário pode ver informações do livro e ler todas as
-	avaliações e comentários feitos por outros leitores.
+	"""Exibe detalhes de um livro e a primeira página de avaliações.
+
+	PT-BR: página onde o usuário pode ver informações do livro e ler as
+	avaliações e comentários feitos por outros leitores. As avaliações vêm
+	de `REVIEWS_PAGE_SIZE` em `REVIEWS_PAGE_SIZE`; o botão "Carregar mais"
+	busca as seguintes em `book_reviews` (fragmento HTML).
+
+	O ETag usa a versão do livro (muda com empréstimos, avaliações e edição),
+	então revisitas sem mudanças recebem 304. O bloco de informações do livro,
+	igual para todos os usuários, fica em cache de fragmento no template.
 	"""
-	# PT-BR: buscar livro com anotações de avaliação
-	book = get_object_or_404(
-		Book.objects.annotate(
-			avg_rating=Avg('reviews__rating'),
-			review_count=Count('reviews', distinct=True)
-		),
-		pk=book_id
-	)
-	
-	# PT-BR: carregar todas as avaliações ordenadas por mais recentes
-	reviews = book.reviews.select_related('user').order_by('-created_at')
-	
-	# PT-BR: verificar se usuário já avaliou
-	user_review = None
-	can_review = False
+	# PT-BR: livro, notas, disponibilidade e dados do usuário numa só consulta.
+	# Do primário: o fragmento em cache fica guardado sob a versão do livro
+	book = get_object_or_404(_book_detail_queryset(request.user).using("default"), pk=book_id)
+	reviews, next_cursor = _review_page(list(_reviews_after(book.pk, None)))
+
+	user_hold = None
 	if request.user.is_authenticated:
-		user_review = book.user_review(request.user)
-		can_review = book.user_can_review(request.user)
-	
+		user_hold = book.holds.filter(user=request.user, status__in=Hold.OPEN_STATUSES).first()
+	also_borrowed = list(recommendations.also_borrowed(book.pk))
+
 	context = {
 		'book': book,
+		'book_id': book.pk,
 		'reviews': reviews,
-		'user_review': user_review,
-		'can_review': can_review,
+		'next_cursor': next_cursor,
+		'user_review': book.user_review_id,
+		'can_review': book.pk in _reviewable_books(request, [book]),
+		'user_hold': user_hold,
+		'holds_waiting': book.holds_waiting,
+		'also_borrowed': also_borrowed,
+		# Sem histórico de empréstimos em comum: livros com metadados parecidos
+		'similar_books': [] if also_borrowed else list(recommendations.similar_books(book.pk)),
+		'book_version': get_book_version(book.pk),
 	}
 	return render(request, 'catalog/book_detail.html', context)
 
 
+def _book_reviews_etag(request, book_id):
+	return _page_etag(request, "book_reviews", book_id, get_book_version(book_id), request.get_full_path())
+
+
+@vary_on_cookie
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_book_reviews_etag, last_modified_func=_book_detail_last_modified)
+def book_reviews(request, book_id):
+	"""Fragmento HTML com a próxima página de avaliações (?after=<cursor>).
+
+	Usado pelo botão "Carregar mais" do detalhe do livro: o HTML devolvido é
+	anexado à lista já exibida e traz o próprio botão para a página seguinte.
+	"""
+	reviews, next_cursor = _review_page(list(_reviews_after(book_id, request.GET.get("after"))))
+	if not reviews and not Book.objects.filter(pk=book_id).exists():
+		raise Http404("Livro não encontrado.")
+	return render(request, 'catalog/_reviews_page.html', {
+		'book_id': book_id,
+		'reviews': reviews,
+		'next_cursor': next_cursor,
+	})
+
+
 @login_required
 def add_review(request, book_id):
 	"""Permite usuário avaliar livro que pegou emprestado."""
 	book = get_object_or_404(Book, pk=book_id)
 	
-	if not book.user_can_review(request.user):
+	if book.pk not in _reviewable_books(request, [book]):
 		messages.error(request, "Você precisa ter pego este livro emprestado para avaliá-lo.")
 		return redirect('catalog:book_detail', book_id=book_id)
 	
@@ -487,6 +970,7 @@ def report_overdue_loans(request):
 	return render(request, "catalog/reports/overdue_loans.html", {"dataset": dataset})
 
 @login_required
+@_timed_export(lambda request: request.GET.get("type"), format_param="format")
 def report_export(request):
 	_require_staff(request.user)
 	report_type = request.GET.get("type")
@@ -500,7 +984,8 @@ def report_export(request):
 		from openpyxl import Workbook
 		wb = Workbook()
 		ws = wb.active
-		ws.title = dataset["title"][:31]
+		# Títulos de planilha não aceitam / \ ? * : [ ] (a data do título tem barras)
+		ws.title = re.sub(r"[\\/?*:\[\]]", "-", dataset["title"])[:31]
 		ws.append(dataset["headers"])
 		for row in dataset["rows"]:
 			ws.append(row)
@@ -536,3 +1021,25 @@ def report_export(request):
 	c.showPage()
 	c.save()
 	return response
+
+
+def metrics_endpoint(request: HttpRequest) -> HttpResponse:
+	"""Métricas do processo no formato texto do Prometheus (`/metrics`).
+
+	Acesso com `Authorization: Bearer <METRICS_TOKEN>` (para o coletor) ou
+	como staff logado. Medidores que dependem do banco/cache (empréstimos
+	ativos, taxa de acerto) são atualizados no momento da coleta.
+	"""
+	token = settings.METRICS_TOKEN
+	authorized = token and constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}")
+	if not (authorized or _is_staff(request.user)):
+		raise Http404()
+
+	today = timezone.localdate()
+	ACTIVE_LOANS.set(Loan.objects.filter(returned_at__isnull=True).count())
+	OVERDUE_LOANS.set(Loan.objects.filter(returned_at__isnull=True, due_date__lt=today).count())
+	for prefix, stats in cache_stats().items():
+		CACHE_LOOKUPS.set(stats["hits"], prefix=prefix, result="hit")
+		CACHE_LOOKUPS.set(stats["misses"], prefix=prefix, result="miss")
+		CACHE_HIT_RATIO.set(round(stats["ratio"], 4), prefix=prefix)
+	return HttpResponse(metrics.render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from library.sqlite import sqlite_options
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,15 +47,38 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Latência e consultas por rota, expostas em /metrics (catalog/metrics.py)
+    'catalog.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Tempo para obter a conexão com o banco e saturação do pool (catalog/metrics.py)
+    'catalog.middleware.DBConnectionMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Leituras das views de consulta na réplica (quando configurada)
+    'catalog.db_routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Perfil de consultas SQL por request (só ativo com QUERY_PROFILING['ENABLED'])
+    'catalog.middleware.QueryProfilingMiddleware',
 ]
 
+# Token para o Prometheus ler /metrics (cabeçalho "Authorization: Bearer <token>").
+# Sem token, apenas usuários staff logados acessam.
+METRICS_TOKEN = os.environ.get('LIBRARY_METRICS_TOKEN', '')
+
+# Perfil de consultas (catalog/profiling.py): LIBRARY_QUERY_PROFILING=1 para ativar.
+# Resultados agregados por view em /staff/profiling/ e avisos no log 'catalog.profiling'.
+QUERY_PROFILING = {
+    'ENABLED': os.environ.get('LIBRARY_QUERY_PROFILING') == '1',
+    'SLOW_REQUEST_QUERIES': 50,
+    'SLOW_REQUEST_DB_MS': 200,
+    'SLOW_QUERY_MS': 50,
+    'DUPLICATE_THRESHOLD': 5,
+    'TOP_STATEMENTS': 5,
+}
+
 ROOT_URLCONF = 'library.urls'
 
 TEMPLATES = [
@@ -77,13 +103,185 @@ WSGI_APPLICATION = 'library.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+#
+# SQLite com perfil de ajuste por ambiente (WAL, busy_timeout, cache...):
+# LIBRARY_SQLITE_PROFILE=legacy|development|production (ver library/sqlite.py)
+SQLITE_PROFILE = os.environ.get('LIBRARY_SQLITE_PROFILE', 'development')
+
+# Reaproveitamento de conexões: cada worker mantém a conexão aberta por até
+# CONN_MAX_AGE segundos (0 = uma conexão por request) e testa se ela ainda
+# está saudável antes de reutilizá-la (CONN_HEALTH_CHECKS).
+CONN_MAX_AGE = int(os.environ.get('LIBRARY_CONN_MAX_AGE', '60'))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': sqlite_options(SQLITE_PROFILE),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# PostgreSQL (opcional): LIBRARY_DB_ENGINE=postgresql e as variáveis POSTGRES_*.
+# Com LIBRARY_DB_POOL=1 usa o pool de conexões do psycopg 3 (pip install "psycopg[pool]");
+# o Django exige CONN_MAX_AGE=0 nesse caso, pois o pool é quem reaproveita as conexões.
+if os.environ.get('LIBRARY_DB_ENGINE') == 'postgresql':
+    _use_pool = os.environ.get('LIBRARY_DB_POOL') == '1'
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('POSTGRES_DB', 'library'),
+        'USER': os.environ.get('POSTGRES_USER', 'library'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+        'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        'CONN_MAX_AGE': 0 if _use_pool else CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': not _use_pool,
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.environ.get('LIBRARY_DB_POOL_MIN', '2')),
+                'max_size': int(os.environ.get('LIBRARY_DB_POOL_MAX', '10')),
+                'timeout': int(os.environ.get('LIBRARY_DB_POOL_TIMEOUT', '10')),
+            },
+        } if _use_pool else {},
+    }
+
+# Réplica de leitura (opcional). Localmente, aponte para uma cópia do banco:
+#   LIBRARY_REPLICA_DB=replica.sqlite3 python manage.py sync_sqlite_replica
+# Em PostgreSQL, configure aqui o host da réplica com o mesmo ENGINE do primário.
+if os.environ.get('LIBRARY_REPLICA_DB'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / os.environ['LIBRARY_REPLICA_DB'],
+        'OPTIONS': sqlite_options(SQLITE_PROFILE),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        # Nos testes, a "réplica" é o próprio banco de teste do primário
+        'TEST': {'MIRROR': 'default'},
     }
+
+# Aliases usados para leitura pelo catalog.db_routers.PrimaryReplicaRouter
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['catalog.db_routers.PrimaryReplicaRouter']
+
+# Views somente leitura que podem consultar a réplica
+REPLICA_READ_VIEWS = [
+    'catalog:book_list',
+    'catalog:book_detail',
+    'catalog:book_reviews',
+    'catalog:advanced_search',
+    'catalog:report_loans',
+    'catalog:report_popular_books',
+    'catalog:report_active_users',
+    'catalog:report_overdue_loans',
+    'catalog:report_export',
+    'catalog:api_books',
+    'catalog:api_book_detail',
+    'catalog:api_book_reviews',
+    'catalog:async_book_list',
+    'catalog:async_book_detail',
+    'catalog:async_report_loans',
+    'catalog:async_report_popular_books',
+    'catalog:async_report_active_users',
+    'catalog:async_report_overdue_loans',
+]
+
+# Após uma escrita (POST), as leituras daquele navegador ficam no primário por
+# alguns segundos (tempo maior que o atraso típico de replicação)
+READ_YOUR_WRITES_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# Três aliases (ver catalog/cache_utils.py e catalog/versioning.py):
+# - 'default': memória local de cada processo (LRU limitado por MAX_ENTRIES);
+# - 'shared': visto por todos os workers, guarda os valores caros;
+# - 'versions': carimbos de versão, gravados sem expiração. Não pode descartar
+#   entradas ao acaso: um carimbo perdido volta com o instante atual e
+#   invalida tudo o que dependia dele.
+#
+# LIBRARY_SHARED_CACHE escolhe o backend de 'shared' e 'versions':
+# - redis (obrigatório em produção com vários workers/servidores): gravação
+#   O(1) e, com `maxmemory-policy volatile-lru`, o Redis só descarta chaves
+#   com expiração, nunca os carimbos. Requer o pacote `redis`
+#   (`pip install redis`) e LIBRARY_REDIS_URL;
+# - file (padrão, desenvolvimento): arquivos em LIBRARY_CACHE_DIR. O
+#   FileBasedCache lista o diretório a cada gravação para decidir o descarte
+#   (MAX_ENTRIES), caro com muitas entradas; os carimbos ficam num diretório
+#   próprio com limite que nunca é atingido;
+# - db: tabela no banco (rode `python manage.py createcachetable`);
+# - locmem: só um processo (testes, benchmark).
+_CACHE_DIR = Path(os.environ.get('LIBRARY_CACHE_DIR', str(BASE_DIR / '.cache')))
+_NEVER_CULL = {'MAX_ENTRIES': 10 ** 9}
+_SHARED_CACHE_BACKENDS = {
+    'redis': {
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('LIBRARY_REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        },
+        'versions': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('LIBRARY_REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        },
+    },
+    'file': {
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(_CACHE_DIR),
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        },
+        'versions': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(_CACHE_DIR / 'versions'),
+            'OPTIONS': _NEVER_CULL,
+        },
+    },
+    'db': {
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'library_cache',
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        },
+        'versions': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'library_cache_versions',
+            'OPTIONS': _NEVER_CULL,
+        },
+    },
+    'locmem': {
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'library-shared',
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        },
+        'versions': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'library-versions',
+            'OPTIONS': _NEVER_CULL,
+        },
+    },
+}
+_SHARED_CACHE = _SHARED_CACHE_BACKENDS[os.environ.get('LIBRARY_SHARED_CACHE', 'file')]
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'library-local',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    'shared': {**_SHARED_CACHE['shared'], 'TIMEOUT': 300},
+    'versions': {**_SHARED_CACHE['versions'], 'TIMEOUT': None},
 }
 
+# Validade (s) de um valor no nível local antes de reler o compartilhado
+CATALOG_LOCAL_CACHE_TIMEOUT = 60
+
+# Orçamento (ms) para calcular as facetas do resultado no book_list;
+# acima disso um aviso é registrado no log 'catalog.facets'
+FACETS_BUDGET_MS = 20
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -123,6 +321,8 @@ USE_TZ = True
 
 # URL base para arquivos estáticos (CSS, imagens, JS)
 STATIC_URL = 'static/'
+# Destino do `collectstatic` (arquivos com hash + variantes .gz/.br)
+STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 # Media files (uploads de usuários - ex: capas de livros)
 # MEDIA_URL: prefixo da URL para acessar arquivos enviados (ex: /media/book_covers/capa.jpg)
@@ -131,6 +331,29 @@ STATIC_URL = 'static/'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Storages: os estáticos usam manifest (nomes com hash do conteúdo) e são
+# pré-comprimidos no collectstatic (ver library/storage.py)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'library.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Servir arquivos pelo próprio Django (library/static_serving.py).
+# Em produção, prefira deixar SERVE_FILES=False e o Nginx servir as pastas, ou
+# manter True com SENDFILE_HEADER para o Django só autorizar e o servidor enviar.
+SERVE_FILES = DEBUG
+# Cache-Control: estáticos com hash são imutáveis (1 ano); capas revalidam por ETag
+STATIC_CACHE_MAX_AGE = 60 * 60 * 24 * 365
+MEDIA_CACHE_MAX_AGE = 60 * 60
+# Ex.: 'X-Accel-Redirect' (Nginx) ou 'X-Sendfile' (Apache); None = FileResponse
+SENDFILE_HEADER = None
+# Prefixo interno (location "internal" do Nginx) que aponta para MEDIA_ROOT
+SENDFILE_MEDIA_PREFIX = '/protected-media/'
+
 # Auth redirects: define URLs nomeadas usadas nos fluxos de login/logout
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'catalog:book_list'
@@ -138,6 +361,14 @@ LOGOUT_REDIRECT_URL = 'login'
 
 # E-mail: em desenvolvimento, imprimimos os e-mails no console
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+# Reservas: dias para retirar a cópia separada antes de passar ao próximo da fila
+HOLD_PICKUP_DAYS = 3
+# Renovações: quantas vezes um empréstimo pode ser renovado e quantos dias cada uma acrescenta
+LOAN_MAX_RENEWALS = 2
+LOAN_RENEWAL_DAYS = 14
+
+# Remetente dos avisos automáticos (atrasos) enviados por catalog/notifications.py
+DEFAULT_FROM_EMAIL = os.environ.get('LIBRARY_FROM_EMAIL', 'biblioteca@localhost')
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -0,0 +1,65 @@
+"""Perfis de ajuste do SQLite aplicados a cada nova conexão.
+
+O Django (5.1+) executa `OPTIONS['init_command']` logo após abrir cada conexão
+SQLite; é esse o "gancho" de inicialização que usamos para os PRAGMAs:
+
+- journal_mode=WAL: leitores não bloqueiam o escritor (e vice-versa);
+- synchronous=NORMAL: em WAL é seguro contra corrupção e bem mais rápido que FULL;
+- busy_timeout: espera (ms) por uma trava antes de falhar com "database is locked";
+- cache_size: páginas em memória por conexão (negativo = KiB);
+- mmap_size: leitura do arquivo via memória mapeada (bytes);
+- temp_store=MEMORY: tabelas/índices temporários (ORDER BY, GROUP BY) em RAM.
+
+Além disso, `transaction_mode='IMMEDIATE'` faz cada transação pegar a trava de
+escrita já no BEGIN. Sem isso, duas transações que começam lendo e depois
+escrevem podem se bloquear mutuamente, e o SQLite falha na hora (sem respeitar
+o busy_timeout).
+
+O perfil é escolhido por ambiente com a variável LIBRARY_SQLITE_PROFILE.
+"""
+
+SQLITE_PROFILES = {
+    # Comportamento padrão do SQLite (rollback journal), útil para comparação
+    'legacy': {},
+    'development': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY',
+    },
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 15000,
+        'cache_size': -64000,  # ~64 MiB
+        'mmap_size': 268435456,  # 256 MiB
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'ON',
+    },
+}
+
+
+def pragma_statements(pragmas):
+    """Converte {'journal_mode': 'WAL', ...} em ['PRAGMA journal_mode=WAL', ...]."""
+    return [f'PRAGMA {name}={value}' for name, value in pragmas.items()]
+
+
+def sqlite_options(profile='development', **overrides):
+    """Monta o dict `OPTIONS` do banco SQLite para o perfil escolhido.
+
+    `overrides` permite ajustar PRAGMAs individuais (ex.: busy_timeout=30000).
+    """
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(
+            f"Perfil SQLite desconhecido: {profile!r}. Use um de: {', '.join(SQLITE_PROFILES)}."
+        )
+    pragmas = {**SQLITE_PROFILES[profile], **overrides}
+    if not pragmas:
+        return {}
+    options = {'init_command': ';'.join(pragma_statements(pragmas))}
+    if 'busy_timeout' in pragmas:
+        # Mesmo valor para o timeout do driver (segundos) usado ao abrir a conexão
+        options['timeout'] = pragmas['busy_timeout'] / 1000
+    if pragmas.get('journal_mode', '').upper() == 'WAL':
+        options['transaction_mode'] = 'IMMEDIATE'
+    return options
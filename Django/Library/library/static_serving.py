@@ -0,0 +1,157 @@
+"""Views para servir arquivos estáticos (STATIC_ROOT) e de media (MEDIA_ROOT).
+
+Substituem o helper `static()` do Django, que não envia cabeçalhos de cache.
+Recursos:
+- GET condicional (ETag/Last-Modified): o navegador revalida a capa e recebe 304;
+- `Cache-Control: immutable` para arquivos com hash no nome (gerados pelo
+  `collectstatic` com `library.storage.CompressedManifestStaticFilesStorage`);
+- variantes pré-comprimidas `.br`/`.gz` escolhidas pelo `Accept-Encoding`;
+- resposta "zero-copy": `FileResponse` entrega o arquivo aberto ao servidor WSGI
+  (`wsgi.file_wrapper` → `sendfile`), ou, com `SENDFILE_HEADER` configurado,
+  apenas o cabeçalho `X-Accel-Redirect`/`X-Sendfile` para o Nginx/Apache enviar.
+"""
+
+import mimetypes
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+# Nome com hash do ManifestStaticFilesStorage: "arquivo.<12 hex>.ext"
+HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{12}\.[^./]+$")
+
+# Ordem de preferência das variantes pré-comprimidas
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# Sufixo do ETag de cada variante: corpos diferentes, validadores diferentes
+ETAG_SUFFIXES = {None: "", "br": "-br", "gzip": "-gz"}
+
+
+def _resolve(document_root, path):
+    """Converte o caminho da URL em arquivo real, bloqueando '../' (path traversal)."""
+    if not document_root:
+        raise Http404("Diretório não configurado.")
+    try:
+        fullpath = Path(safe_join(document_root, path))
+    except Exception:  # SuspiciousFileOperation e caminhos inválidos
+        raise Http404("Arquivo não encontrado.")
+    if not fullpath.is_file():
+        raise Http404("Arquivo não encontrado.")
+    return fullpath
+
+
+def _accepted_encodings(header):
+    """Lê o `Accept-Encoding` em {codificação: q}.
+
+    Compara tokens inteiros (não substrings) e respeita `q=0`, que o cliente usa
+    para recusar uma codificação (ex.: "gzip;q=0, *"). q inválido conta como 1.
+    """
+    accepted = {}
+    for entry in header.split(","):
+        token, *params = [part.strip() for part in entry.split(";")]
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    pass
+        accepted[token.lower()] = q
+    return accepted
+
+
+def _pick_encoding(request, fullpath):
+    """Escolhe a variante pré-comprimida aceita pelo cliente (se existir no disco)."""
+    accepted = _accepted_encodings(request.headers.get("Accept-Encoding", ""))
+    for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+        candidate = fullpath.with_name(fullpath.name + suffix)
+        # Sem menção explícita, vale o curinga "*" (se houver)
+        if accepted.get(encoding, accepted.get("*", 0)) > 0 and candidate.is_file():
+            return candidate, encoding
+    return fullpath, None
+
+
+def _apply_cache_headers(response, etag, mtime, max_age, immutable):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(mtime)
+    if immutable:
+        patch_cache_control(response, public=True, max_age=max_age, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=max_age)
+
+
+def _serve(request, path, document_root, *, max_age, immutable, precompressed, sendfile_prefix=None):
+    fullpath = _resolve(document_root, path)
+    encoding = None
+    served = fullpath
+    if precompressed:
+        served, encoding = _pick_encoding(request, fullpath)
+    stat = served.stat()
+    # ETag forte por variante (identidade, .gz, .br): bytes diferentes não podem
+    # compartilhar o validador. Muda quando mtime ou tamanho do arquivo servido mudam
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{ETAG_SUFFIXES[encoding]}"'
+
+    # GET condicional: se o cliente já tem a versão atual, devolvemos 304 sem corpo
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        if precompressed:
+            patch_vary_headers(not_modified, ("Accept-Encoding",))
+        _apply_cache_headers(not_modified, etag, stat.st_mtime, max_age, immutable)
+        return not_modified
+
+    content_type, _ = mimetypes.guess_type(str(fullpath))
+    content_type = content_type or "application/octet-stream"
+
+    sendfile_header = getattr(settings, "SENDFILE_HEADER", None)
+    if sendfile_header and sendfile_prefix:
+        # O servidor web lê o arquivo do disco; o Django só autoriza e indica o caminho
+        response = HttpResponse(content_type=content_type)
+        response[sendfile_header] = sendfile_prefix + path
+    else:
+        # FileResponse usa wsgi.file_wrapper quando disponível (sendfile do kernel)
+        response = FileResponse(served.open("rb"), content_type=content_type)
+    if encoding:
+        response["Content-Encoding"] = encoding
+    if precompressed:
+        patch_vary_headers(response, ("Accept-Encoding",))
+    _apply_cache_headers(response, etag, stat.st_mtime, max_age, immutable)
+    return response
+
+
+@require_safe
+def serve_static(request, path):
+    """Serve arquivos de STATIC_ROOT (saída do `collectstatic`).
+
+    Arquivos com hash no nome nunca mudam de conteúdo, então recebem
+    `Cache-Control: public, max-age=<1 ano>, immutable`.
+    """
+    immutable = bool(HASHED_NAME_RE.search(path))
+    return _serve(
+        request,
+        path,
+        settings.STATIC_ROOT,
+        max_age=settings.STATIC_CACHE_MAX_AGE if immutable else 0,
+        immutable=immutable,
+        precompressed=True,
+    )
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve uploads de MEDIA_ROOT (ex.: capas de livros) com revalidação por ETag."""
+    return _serve(
+        request,
+        path,
+        settings.MEDIA_ROOT,
+        max_age=settings.MEDIA_CACHE_MAX_AGE,
+        immutable=False,
+        precompressed=False,
+        sendfile_prefix=getattr(settings, "SENDFILE_MEDIA_PREFIX", None),
+    )
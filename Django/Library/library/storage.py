@@ -0,0 +1,53 @@
+"""Storage de arquivos estáticos com nomes versionados e variantes comprimidas.
+
+O `collectstatic` usa esta classe para:
+- gerar nomes com hash do conteúdo (ex.: `site.3f2a9c1b7d4e.css`) via manifest,
+  o que permite cache "eterno" no navegador (o nome muda quando o arquivo muda);
+- gravar ao lado de cada arquivo texto uma versão `.gz` (e `.br`, se a
+  biblioteca `brotli` estiver instalada), servida sem recomprimir a cada request.
+"""
+
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+# Extensões que valem a pena comprimir (imagens/fontes já são comprimidas)
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".mjs", ".map", ".svg", ".txt", ".html", ".json", ".xml")
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage que também pré-comprime os arquivos gerados.
+
+    `manifest_strict = False`: se um arquivo não estiver no manifest (ex.: testes
+    sem `collectstatic`), o `{% static %}` usa o nome original em vez de falhar.
+    """
+
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        # Comprimimos apenas as versões com hash (as que recebem cache imutável)
+        for name in self.hashed_files.values():
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self._write_compressed_variants(name)
+
+    def _write_compressed_variants(self, name):
+        with self.open(name) as original:
+            content = original.read()
+        # mtime=0 deixa o .gz determinístico entre execuções do collectstatic
+        variants = {".gz": gzip.compress(content, compresslevel=9, mtime=0)}
+        try:
+            import brotli
+        except ImportError:  # brotli é opcional
+            pass
+        else:
+            variants[".br"] = brotli.compress(content)
+        for suffix, compressed in variants.items():
+            # Só vale a pena guardar se realmente ficou menor
+            if len(compressed) >= len(content):
+                continue
+            path = self.path(name + suffix)
+            with open(path, "wb") as fh:
+                fh.write(compressed)
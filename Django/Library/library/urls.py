@@ -14,19 +14,27 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.views.generic import RedirectView
 from django.contrib.auth import views as auth_views
 from django.views.generic import TemplateView
 
+from catalog import views as catalog_views
+
+from . import static_serving
+
 urlpatterns = [
     # Redirecionamento de compatibilidade: se alguém visitar /admin/overdue/
     # (antigo caminho), enviamos para a nova rota nomeada do app.
     path('admin/overdue/', RedirectView.as_view(pattern_name='catalog:admin_overdue_loans', permanent=False)),
 
+    # Métricas no formato do Prometheus (token ou staff)
+    path('metrics', catalog_views.metrics_endpoint, name='metrics'),
+
     # Painel do Django Admin (gerenciamento de usuários, livros etc.)
     path('admin/', admin.site.urls),
 
@@ -45,11 +53,14 @@ urlpatterns = [
     # path("", catalog_views.book_list, name="home")
 ]
 
-# Servir arquivos de media em desenvolvimento
-# Quando DEBUG=True, o Django serve arquivos de MEDIA_ROOT automaticamente
-# static(): função auxiliar que adiciona a rota /media/<caminho> → arquivo físico
-# Em produção (DEBUG=False), configure o servidor web para servir media/
+# Servir arquivos de media e estáticos pelo Django
+# serve_media/serve_static (library/static_serving.py) substituem o helper static():
+# enviam ETag/Last-Modified (respostas 304), Cache-Control imutável para arquivos
+# com hash e variantes .br/.gz pré-comprimidas.
+# Em produção, o ideal é o servidor web servir as pastas diretamente.
 # Exemplo Nginx: location /media/ { alias /caminho/para/media/; }
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+if settings.SERVE_FILES:
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), static_serving.serve_media),
+        re_path(r'^%s(?P<path>.*)$' % re.escape(settings.STATIC_URL.lstrip('/')), static_serving.serve_static),
+    ]